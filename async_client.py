@@ -0,0 +1,484 @@
+"""Asynchronous client module for programmatic access to the server.
+
+This module provides the AsyncClient class, an asyncio based API exposing
+authentication, message sending, inbox fetching and server commands as
+coroutines. It has no user interaction, so services can embed it, and
+requests can be pipelined: many may be in flight on one connection, with
+replies matched to requests in the order they were sent. Messages pushed
+by the server are queued separately from replies.
+
+Lost connections are reopened with exponential backoff and random jitter,
+the session is resumed with a session token instead of a new password
+check, and requests which are safe to repeat are sent again. Idle
+connections send heartbeat pings, keeping the server from closing them, and
+a connection which received nothing for several heartbeat intervals while
+waiting for replies is considered dead.
+"""
+
+import asyncio
+import random
+from collections import deque
+from message import Message
+from connection import Connection
+from protocol import (
+    FRAME_HEADER,
+    FrameError,
+    encode_frame,
+    decode_payload,
+)
+from config import config
+
+# Requests which can be sent again after reconnecting, as repeating them has no further effect
+IDEMPOTENT_HEADERS = ("Acc_type",)
+IDEMPOTENT_COMMANDS = ("help", "uptime", "info")
+
+# Messages the server sends without a request, never matched to pending requests
+PUSH_HEADERS = ("New_message", "Shutdown")
+
+
+def is_idempotent(message: Message) -> bool:
+    """Check if a request can be safely repeated when its reply was lost."""
+    if message.header == "Command":
+        return message.text in IDEMPOTENT_COMMANDS
+    return message.header in IDEMPOTENT_HEADERS
+
+
+class AsyncClient:
+    """Asyncio client for communicating with the socket server.
+
+    The server answers requests of a connection one by one, in order, so
+    every sent request queues a future, and a background task reading
+    frames resolves them first come, first served.
+    """
+
+    def __init__(
+        self,
+        host: str = config.network.HOST,
+        port: int = config.network.PORT,
+        reconnect: bool = True,
+        heartbeat_interval: float | None = config.network.HEARTBEAT_INTERVAL,
+    ):
+        self.host = host
+        self.port = port
+        self.reconnect = reconnect
+        # Seconds without sent requests after which a ping is sent, None disables heartbeats
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_task = None
+        self.last_sent = 0.0
+        # Event loop time of the last frame of any kind received from the server
+        self.last_received = 0.0
+        self.name = ""
+        self.reader = None
+        self.writer = None
+        self.read_task = None
+        self.reconnect_task = None
+        self.closing = False
+        # Cleared while reconnecting, so new requests wait for the session to be resumed
+        self.ready = asyncio.Event()
+        self.ready.set()
+        # (future, request) pairs of sent requests, waiting for replies in sending order
+        self.pending = deque()
+        # Messages pushed by the server, e.g. new messages for the signed in user
+        self.pushes = asyncio.Queue()
+        # Messages are sent as uncompressed JSON until the server agrees otherwise
+        self.wire_format = "json"
+        self.compression = None
+        # Credentials used to resume the session after reconnecting
+        self.password = None
+        self.session_token = None
+        self.reconnects = 0
+        # Seconds over which a stopping server asked its clients to spread reconnects
+        self.reconnect_window = None
+
+    @property
+    def active(self) -> bool:
+        """True while the client is connected or trying to reconnect."""
+        return self.writer is not None or self.reconnect_task is not None
+
+    async def connect(self):
+        """Open connection to the server and negotiate wire format and compression."""
+        self.closing = False
+        await self._open()
+        if self.heartbeat_interval and self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def close(self):
+        """Close connection to the server, failing requests still waiting for replies."""
+        self.closing = True
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+            self.reconnect_task = None
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self.writer = None
+        if self.read_task is not None:
+            self.read_task.cancel()
+            try:
+                await self.read_task
+            except asyncio.CancelledError:
+                pass
+            self.read_task = None
+        self._fail_pending(ConnectionError("Connection closed"))
+        self.ready.set()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def request(self, message: Message) -> Message:
+        """Send a message and wait for the server reply to it.
+
+        Requests made while reconnecting are sent once the session is resumed.
+
+        Args:
+            message: The message to send.
+
+        Returns:
+            The decoded reply Message.
+
+        Raises:
+            ConnectionError: If the client is not connected, or the connection was
+                lost before the reply and the request is not safe to repeat.
+        """
+        if self.reconnect_task is not None:
+            await self.ready.wait()
+        if self.writer is None:
+            raise ConnectionError("Client is not connected")
+        return await self._send(message)
+
+    async def authenticate(self, login: str, password: str) -> dict:
+        """Sign in, registering the user if the login is not taken yet.
+
+        Args:
+            login: Username to sign in with.
+            password: Password of the user.
+
+        Returns:
+            Dictionary with is_registered and login_successfull flags.
+
+        Raises:
+            ValueError: If the server rejected the request.
+        """
+        text = {
+            "login": login,
+            "password": password,
+        }
+        answer = await self._authenticate(text, self.request)
+        if answer["login_successfull"]:
+            self.name = login
+            self.password = password
+        return answer
+
+    async def set_account_type(self, login: str, password: str, acc_type: str) -> bool:
+        """Set account type of a newly registered user.
+
+        Returns:
+            True if account type was successfully updated.
+        """
+        text = {
+            "login": login,
+            "password": password,
+            "acc_type": acc_type,
+        }
+        answer = await self.request(Message("Acc_type", text, "Client", "Server"))
+        return answer.header == "Account_type_update" and bool(answer.text["update_status"])
+
+    async def send_message(self, receiver: str, text: str) -> Message:
+        """Send a text message to another user.
+
+        Returns:
+            Status reply for a delivered message, or Error reply with the reason it was not.
+        """
+        return await self.request(Message("Message", text, self.name, receiver))
+
+    async def create_group(self, group: str) -> Message:
+        """Create a group, with the signed in user as owner and first member."""
+        return await self.request(Message("Group", {"action": "create", "group": group}, self.name, self.host))
+
+    async def add_group_member(self, group: str, member: str) -> Message:
+        """Add a user to a group owned by the signed in user."""
+        text = {"action": "add", "group": group, "member": member}
+        return await self.request(Message("Group", text, self.name, self.host))
+
+    async def leave_group(self, group: str) -> Message:
+        return await self.request(Message("Group", {"action": "leave", "group": group}, self.name, self.host))
+
+    async def group_members(self, group: str) -> list:
+        """Get usernames of members of a group the signed in user belongs to.
+
+        Raises:
+            ValueError: If the group does not exist or the user is not a member.
+        """
+        text = {"action": "members", "group": group}
+        answer = await self.request(Message("Group", text, self.name, self.host))
+        if answer.header != "Group_members":
+            raise ValueError(answer.text)
+        return answer.text["members"]
+
+    async def send_group_message(self, group: str, text: str) -> Message:
+        """Send a text message to every other member of a group.
+
+        Returns:
+            Status reply with numbers of pushed and stored copies and members whose inbox
+            was full, or Error reply with the reason the message was not sent.
+        """
+        return await self.request(Message("Group_message", text, self.name, group))
+
+    async def broadcast(self, text: str) -> Message:
+        """Send a text message to every registered user, the signed in user must be an admin.
+
+        Returns:
+            Status reply with numbers of pushed and stored copies, or Error reply
+            with the reason the message was not sent.
+        """
+        return await self.command(f"broadcast {text}")
+
+    async def stats(self) -> dict:
+        """Get server load statistics, the signed in user must be an admin.
+
+        Returns:
+            Dictionary with uptime, request rates and latencies by header, Argon2,
+            connection and database pool statistics.
+
+        Raises:
+            ValueError: If the server refused the request.
+        """
+        answer = await self.command("stats")
+        if answer.header != "Stats":
+            raise ValueError(answer.text)
+        return answer.text
+
+    async def fetch_inbox(self) -> list:
+        """Fetch messages from the inbox of the signed in user.
+
+        Returns:
+            List of message dictionaries with Sender, Text and Datetime, empty if the inbox is empty.
+        """
+        answer = await self.command("inbox")
+        if answer.header != "Inbox_message":
+            return []
+        return answer.text
+
+    async def list_online(self, after: str | None = None) -> dict:
+        """Get a page of online users.
+
+        Args:
+            after: Cursor returned with the previous page, None for the first page.
+
+        Returns:
+            Dictionary with users on the page, next page cursor (None on the last page)
+            and total number of online users.
+        """
+        answer = await self.command(f"online {after}" if after else "online")
+        if answer.header != "Online_users":
+            raise ValueError(answer.text)
+        return answer.text
+
+    async def receive_push(self) -> Message:
+        """Wait for the next message pushed by the server.
+
+        Returns:
+            The pushed Message, e.g. New_message with Sender, Text and Datetime.
+        """
+        return await self.pushes.get()
+
+    async def command(self, name: str) -> Message:
+        """Run a server command, e.g. help, uptime or info.
+
+        Returns:
+            The server reply to the command.
+        """
+        return await self.request(Message("Command", name, self.name, self.host))
+
+    async def _open(self):
+        """Open a connection, start reading replies and negotiate wire format and compression."""
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        Connection.set_keepalive(self.writer.get_extra_info("socket"))
+        self.wire_format = "json"
+        self.compression = None
+        self.last_received = asyncio.get_running_loop().time()
+        self.read_task = asyncio.create_task(self._read_replies(self.reader))
+
+        text = {
+            "formats": list(config.message.WIRE_FORMATS),
+            "compression": list(config.network.COMPRESSION_METHODS),
+        }
+        answer = await self._send(Message("Handshake", text, self.name, "Server"))
+        if answer.header == "Handshake_answer":
+            self.wire_format = answer.text["format"]
+            self.compression = answer.text.get("compression")
+
+    async def _authenticate(self, text: dict, send) -> dict:
+        """Send authentication request, keeping the session token from a successful answer."""
+        answer = await send(Message("Authentication", text, "Authenticator", "Server"))
+        if answer.header != "Authentication_answer":
+            raise ValueError(answer.text)
+        if answer.text["login_successfull"]:
+            self.session_token = answer.text.get("session_token")
+        return answer.text
+
+    async def _resume_session(self):
+        """Sign in again on a new connection, with the session token if the server accepts it."""
+        if not self.name:
+            return
+        if self.session_token:
+            answer = await self._authenticate({"login": self.name, "token": self.session_token}, self._send)
+            if answer["login_successfull"]:
+                return
+        if self.password is not None:
+            await self._authenticate({"login": self.name, "password": self.password}, self._send)
+
+    async def _send(self, message: Message) -> Message:
+        """Write a request and wait for its reply, without waiting for reconnection."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((future, message))
+        self._write(message)
+        try:
+            await self.writer.drain()
+        except (ConnectionError, OSError):
+            # The reader notices the lost connection, then repeats or fails the request
+            pass
+        return await future
+
+    def _write(self, message: Message):
+        payload = message.encode_message(self.wire_format)
+        self.writer.write(encode_frame(payload, compression=self.compression))
+        self.last_sent = asyncio.get_running_loop().time()
+
+    async def _heartbeat(self):
+        """Ping the server whenever no request was sent for a heartbeat interval.
+
+        Pings are answered only after requests the server is still handling,
+        so their replies are not waited for. Instead, a connection waiting for
+        replies which received nothing at all for HEARTBEAT_MISSES intervals
+        is considered dead, and aborted, which starts reconnecting.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if self.writer is None or self.reconnect_task is not None:
+                continue
+            now = loop.time()
+            silence = now - self.last_received
+            if self.pending and silence >= self.heartbeat_interval * config.network.HEARTBEAT_MISSES:
+                print(f"[ERROR] Nothing received from server for {silence:.1f}s, reconnecting")
+                self.writer.transport.abort()
+                continue
+            if now - self.last_sent >= self.heartbeat_interval:
+                self._ping()
+
+    def _ping(self):
+        """Send a heartbeat ping without waiting for its reply."""
+        ping = Message("Ping", "Ping", self.name, "Server")
+        future = asyncio.get_running_loop().create_future()
+        # The reply is matched like any other, but its result or error is never needed
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.pending.append((future, ping))
+        self._write(ping)
+
+    async def _read_replies(self, reader: asyncio.StreamReader):
+        """Read reply frames and hand them to waiting requests in order."""
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                length, flags = FRAME_HEADER.unpack(header)
+                if length > config.network.MAX_FRAME_SIZE:
+                    raise FrameError(f"Frame of {length} bytes exceeds maximum frame size")
+                payload = decode_payload(flags, await reader.readexactly(length))
+                self.last_received = asyncio.get_running_loop().time()
+
+                reply = Message()
+                if not reply.decode_message(payload, self.wire_format):
+                    # Later replies cannot be matched to requests once one is lost
+                    error = ConnectionError("Received a message which could not be decoded")
+                    if reader is self.reader:
+                        self._fail_pending(error)
+                    self._connection_lost(reader, error)
+                    return
+                if reply.header == "Shutdown":
+                    self.reconnect_window = reply.text.get("retry_after")
+                if reply.header in PUSH_HEADERS:
+                    self.pushes.put_nowait(reply)
+                elif self.pending:
+                    future, _ = self.pending.popleft()
+                    if not future.done():
+                        future.set_result(reply)
+        except asyncio.IncompleteReadError:
+            self._connection_lost(reader, ConnectionError("Connection closed by server"))
+        except (FrameError, ConnectionError, OSError) as e:
+            print(f"[ERROR] {e}")
+            self._connection_lost(reader, ConnectionError(str(e)))
+
+    def _connection_lost(self, reader: asyncio.StreamReader, error: Exception):
+        """Start reconnecting, or fail waiting requests if the client does not reconnect."""
+        if reader is not self.reader:
+            # Reader of a connection which was already replaced
+            return
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.closing or not self.reconnect or self.reconnect_task is not None:
+            # Failing requests of a reconnect attempt lets the next attempt start
+            self._fail_pending(error)
+            return
+        self.ready.clear()
+        self.reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        """Reopen the connection with exponential backoff and jitter, then resume the session."""
+        in_flight = list(self.pending)
+        self.pending.clear()
+
+        for attempt in range(config.network.RECONNECT_ATTEMPTS):
+            # Random delays keep clients from reconnecting all at once after a server restart
+            delay = min(config.network.RECONNECT_MAX_DELAY, config.network.RECONNECT_BASE_DELAY * 2**attempt)
+            if self.reconnect_window:
+                # Clients of a stopping server spread over the window it asked for
+                delay = max(delay, self.reconnect_window)
+                self.reconnect_window = None
+            await asyncio.sleep(random.uniform(0, delay))
+            try:
+                await self._open()
+                await self._resume_session()
+                break
+            except (ConnectionError, OSError, ValueError) as e:
+                print(f"[ERROR] Reconnect attempt {attempt + 1} failed: {e}")
+                if self.writer is not None:
+                    self.writer.close()
+                    self.writer = None
+        else:
+            for future, _ in in_flight:
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection lost, reconnecting failed"))
+            self.reconnect_task = None
+            self.ready.set()
+            return
+
+        for future, message in in_flight:
+            if future.done():
+                continue
+            if is_idempotent(message):
+                self.pending.append((future, message))
+                self._write(message)
+            else:
+                future.set_exception(ConnectionError("Connection lost, request was not repeated"))
+        self.reconnects += 1
+        self.reconnect_task = None
+        self.ready.set()
+
+    def _fail_pending(self, error: Exception):
+        """Fail every request still waiting for a reply."""
+        while self.pending:
+            future, _ = self.pending.popleft()
+            if not future.done():
+                future.set_exception(error)
@@ -1,14 +1,16 @@
 """Client module for socket-based communication with the server.
 
-This module provides the Client class that handles user authentication,
-command processing, and communication with the server.
+This module provides the Client class, an interactive shell handling
+user prompts for authentication and commands. Communication with the
+server is done by the AsyncClient API.
 """
 
+import asyncio
 import sys
 import maskpass  # pip install maskpass
 from datetime import datetime
 from message import Message, ErrorMessage
-from connection import Connection
+from async_client import AsyncClient
 from config import config
 
 
@@ -24,6 +26,9 @@ class Client:
         self.login = False
         self.client_host = config.network.HOST
         self.client_port = config.network.PORT
+        self.api = None
+        # Cursor of the next page of online users
+        self.online_cursor = None
 
     def start_client(self):
         """Start the client and handle the main communication loop.
@@ -31,32 +36,51 @@ class Client:
         Establishes connection to server, handles authentication,
         and processes user commands until disconnection.
         """
-        connection = Connection()
+        asyncio.run(self.run())
 
-        with connection.create_connection() as s:
-            s.connect((self.client_host, self.client_port))
+    async def run(self):
+        """Run the interactive session on top of the asynchronous client API.
 
+        Prompts are read in a worker thread, so the event loop keeps
+        reading server frames while the user types. Lost connections are
+        reopened by the API, the session ends once reconnecting fails.
+        """
+        self.api = AsyncClient(self.client_host, self.client_port)
+        await self.api.connect()
+        push_task = None
+        try:
             while not self.login:
-                self.user_auth(s)
+                await self.user_auth()
 
             print(config.ui.HELP_TEXT)
+            push_task = asyncio.create_task(self.show_pushed_messages())
 
             while True:
-                command = input(f"{self.name}>: ")
+                command = await asyncio.to_thread(input, f"{self.name}>: ")
 
-                sender_message = self.check_input_command(command)
+                sender_message = await asyncio.to_thread(self.check_input_command, command)
                 if isinstance(sender_message, ErrorMessage):
                     print("[Error] " + sender_message.text)
                     continue
 
-                sender_message_json = sender_message.encode_message()
-                s.send(sender_message_json)
-
-                received_bytes = s.recv(1024).decode("utf-8")
-                received_message = Message()
-                received_message.decode_message(received_bytes)
+                try:
+                    received_message = await self.api.request(sender_message)
+                except ConnectionError as e:
+                    print(f"[ERROR] {e}")
+                    if not self.api.active:
+                        return
+                    continue
 
                 self.check_return_msg(received_message)
+        finally:
+            if push_task is not None:
+                push_task.cancel()
+            await self.api.close()
+
+    async def show_pushed_messages(self):
+        """Print messages pushed by the server as soon as they arrive."""
+        while True:
+            self.check_return_msg(await self.api.receive_push())
 
     def check_input_command(self, command: str) -> Message | ErrorMessage:
         """Process user input commands and create appropriate messages.
@@ -90,9 +114,55 @@ class Client:
                 return Message("Command", "stop", self.name, self.client_host)
             case "!inbox":
                 return Message("Command", "inbox", self.name, self.client_host)
+            case "!group":
+                return self.create_group_request()
+            case "!broadcast":
+                text = input(f"{self.name}>: Please type your message to all users: ")
+                if len(text) > config.message.MAX_MESSAGE_LENGTH - len("broadcast "):
+                    return ErrorMessage(
+                        f"Message cannot be longar than {
+                            config.message.MAX_MESSAGE_LENGTH - len('broadcast ')} characters",
+                        "Client",
+                    )
+                return Message("Command", f"broadcast {text}", self.name, self.client_host)
+            case "!online":
+                return Message("Command", "online", self.name, self.client_host)
+            case "!stats":
+                return Message("Command", "stats", self.name, self.client_host)
+            case "!online next":
+                if self.online_cursor is None:
+                    return ErrorMessage("No more online users to list", "Client")
+                return Message("Command", f"online {self.online_cursor}", self.name, self.client_host)
             case _:
                 return ErrorMessage("Wrong command, try again!", "Server")
 
+    def create_group_request(self) -> Message | ErrorMessage:
+        """Prompt for a group action and create the matching request.
+
+        Returns:
+            A Group or Group_message Message, or ErrorMessage for invalid input.
+        """
+        action = input(f"{self.name}>: Group action (create/add/leave/members/send): ").lower()
+        group = input(f"{self.name}>: Group name: ")
+        match action:
+            case "create" | "leave" | "members":
+                return Message("Group", {"action": action, "group": group}, self.name, self.client_host)
+            case "add":
+                member = input(f"{self.name}>: Username of the new member: ")
+                text = {"action": action, "group": group, "member": member}
+                return Message("Group", text, self.name, self.client_host)
+            case "send":
+                text = input(f"{self.name}>: Please type your message: ")
+                if len(text) > config.message.MAX_MESSAGE_LENGTH:
+                    return ErrorMessage(
+                        f"Message cannot be longar than {
+                            config.message.MAX_MESSAGE_LENGTH} characters",
+                        "Client",
+                    )
+                return Message("Group_message", text, self.name, group)
+            case _:
+                return ErrorMessage("Wrong group action, try again!", "Client")
+
     def check_return_msg(self, rec_message: Message):
         """Process and display server responses.
 
@@ -107,12 +177,56 @@ class Client:
             case "Status":
                 if rec_message.text:
                     print("Operation finished successfully")
+                    if isinstance(rec_message.text, dict) and rec_message.text.get("inbox_full"):
+                        print(f"Inbox full, not delivered to: {', '.join(rec_message.text['inbox_full'])}")
+                    if isinstance(rec_message.text, dict) and "pushed" in rec_message.text:
+                        print(
+                            f"Delivered to {rec_message.text['pushed']} online users, "
+                            f"stored for {rec_message.text['stored']} users"
+                        )
                 else:
                     print("Operation failed")
 
             case "Stop":
                 sys.exit()
 
+            case "Shutdown":
+                print("\nServer is restarting, reconnecting shortly")
+
+            case "New_message":
+                group = rec_message.text.get("Group")
+                source = f"{rec_message.text['Sender']} in {group}" if group else rec_message.text["Sender"]
+                print(f"\nNew message from {source}: \n{rec_message.text['Text']}")
+
+            case "Group_members":
+                print(f"Members of {rec_message.text['group']} (owner: {rec_message.text['owner']}):")
+                for member in rec_message.text["members"]:
+                    print(member)
+
+            case "Stats":
+                stats = rec_message.text
+                print(f"Uptime: {stats['uptime']:.0f}s")
+                for header, request in stats["requests"].items():
+                    print(
+                        f"{header}: {request['count']} requests, {request['rate']:.1f}/s, "
+                        f"p50 {request['p50'] * 1000:.1f} ms, p99 {request['p99'] * 1000:.1f} ms"
+                    )
+                argon2 = stats["argon2"]
+                print(
+                    f"Argon2: {argon2['count']} hashes, {argon2['in_progress']} in progress, "
+                    f"p99 {argon2['p99'] * 1000:.1f} ms"
+                )
+                for section in ("connections", "pool"):
+                    print(f"{section.capitalize()}: " + ", ".join(f"{key} {value}" for key, value in stats[section].items()))
+
+            case "Online_users":
+                print(f"Online users ({rec_message.text['total']}):")
+                for user in rec_message.text["users"]:
+                    print(user)
+                self.online_cursor = rec_message.text["next"]
+                if self.online_cursor is not None:
+                    print("Type !online next for more")
+
             case "Inbox_message":
                 for message in rec_message.text:
                     dt_object = datetime.fromisoformat(message["Datetime"])
@@ -129,19 +243,16 @@ class Client:
             case _:
                 print("Empty server answer")
 
-    def user_auth(self, connection: Connection):
+    async def user_auth(self):
         """Handle user authentication process.
 
         Manages login for existing users and registration for new users,
         including account type selection.
-
-        Args:
-            connection: The connection object for communicating with server.
         """
         print(config.ui.WELCOME_MESSAGE)
 
         while True:
-            self.name = input("Username: ")
+            self.name = await asyncio.to_thread(input, "Username: ")
             if (
                 len(self.name) < config.security.MIN_USERNAME_LENGTH
                 or len(self.name) > config.security.MAX_USERNAME_LENGTH
@@ -153,7 +264,7 @@ class Client:
                 )
                 continue
 
-            password = maskpass.askpass("Password: ")
+            password = await asyncio.to_thread(maskpass.askpass, "Password: ")
             # password = input("Password: ")
             if len(password) < config.security.PASSWORD_MIN_LENGTH:
                 print(
@@ -169,21 +280,14 @@ class Client:
                 print("Empty password, try again.")
                 continue
 
-            text = {
-                "login": self.name,
-                "password": password,
-            }
-            message = Message("Authentication", text, "Authenticator", "Server")
-            json_message = message.encode_message()
-
-            connection.send(json_message)
-
-            auth_answer = connection.recv(config.network.BUFFER_SIZE).decode("utf-8")
-            auth_message = Message()
-            auth_message.decode_message(auth_answer)
+            try:
+                auth_answer = await self.api.authenticate(self.name, password)
+            except ValueError as e:
+                print(f"[ERROR] {e}")
+                continue
 
-            if auth_message.text["is_registered"]:
-                if auth_message.text["login_successfull"]:
+            if auth_answer["is_registered"]:
+                if auth_answer["login_successfull"]:
                     print("Sign in successfull, welcome back!")
                     self.login = True
                     return
@@ -191,42 +295,29 @@ class Client:
                     print("Wrong password, try again!")
             else:
                 while True:
-                    if self.set_account_type(password, connection):
+                    if await self.set_account_type(password):
                         self.login = True
                         return
 
-    def set_account_type(self, password: str, connection):
+    async def set_account_type(self, password: str):
         """Set account type for newly registered users.
 
         Args:
             password: The user's password.
-            connection: The connection object for server communication.
 
         Returns:
             True if account type was successfully set, False otherwise.
         """
-        acc_type = input("New user registered, please add account type: admin/user: ")
+        acc_type = await asyncio.to_thread(
+            input, "New user registered, please add account type: admin/user: "
+        )
         if acc_type not in config.message.VALID_ACCOUNT_TYPES or not isinstance(
             acc_type, str
         ):
             print("[ERROR] Wrong account type")
             return False
 
-        text = {
-            "login": self.name,
-            "password": password,
-            "acc_type": acc_type,
-        }
-
-        message = Message("Acc_type", text, "Client", "Server")
-        json_message = message.encode_message()
-        connection.send(json_message)
-
-        acc_type_answer = connection.recv(1024).decode("utf-8")
-        decoded_message = Message()
-        decoded_message.decode_message(acc_type_answer)
-
-        if decoded_message.text["update_status"]:
+        if await self.api.set_account_type(self.name, password, acc_type):
             print("Account type updated successfully")
             return True
         else:
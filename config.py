@@ -5,6 +5,7 @@ the application, providing a centralized place for configuration management.
 All commented lines are not being used at the moment, but might be implemented in the future.
 """
 
+import os
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -16,8 +17,39 @@ class NetworkConfig:
     HOST: str = "127.0.0.1"
     PORT: int = 65432
     BUFFER_SIZE: int = 1024
+    MAX_FRAME_SIZE: int = 1_048_576  # bytes
+    # Frame compression offered during handshake, applied to payloads above the threshold
+    COMPRESSION_METHODS = ("zlib",)
+    COMPRESSION_THRESHOLD: int = 1024  # bytes
+    COMPRESSION_LEVEL: int = 6
     MAX_CONNECTIONS: int = 5
+    # Pending connections queued by the listening socket, every accepted client gets its own thread
+    LISTEN_BACKLOG: int = 128
+    # Connections without any frame from the client for this long are closed by the server
     CONNECTION_TIMEOUT: int = 30  # seconds
+    # Idle clients send a heartbeat ping this often, so live connections are not closed
+    HEARTBEAT_INTERVAL: float = 10.0  # seconds
+    # Intervals a client waits for replies without receiving anything before it drops the connection
+    HEARTBEAT_MISSES: int = 3
+    # Resolution of the timer wheel closing idle connections
+    REAPER_TICK: float = 1.0  # seconds
+    # TCP keepalive probes, detecting peers which vanished without closing the connection
+    TCP_KEEPALIVE: bool = True
+    TCP_KEEPALIVE_IDLE: int = 60  # seconds
+    TCP_KEEPALIVE_INTERVAL: int = 10  # seconds
+    TCP_KEEPALIVE_COUNT: int = 5
+    # Bytes queued for a client above which the server stops reading its requests,
+    # reading resumes once the queue drains below the low water mark
+    OUTBOUND_HIGH_WATER: int = 256 * 1024
+    OUTBOUND_LOW_WATER: int = 64 * 1024
+    # Queued bytes above which further messages to a client are refused
+    OUTBOUND_QUEUE_LIMIT: int = 1024 * 1024
+    # Seconds a client may stay above the high water mark before it is disconnected
+    SLOW_CONSUMER_GRACE: float = 10.0
+    # Client reconnect backoff, every delay is drawn at random up to the exponential bound
+    RECONNECT_ATTEMPTS: int = 8
+    RECONNECT_BASE_DELAY: float = 0.5  # seconds
+    RECONNECT_MAX_DELAY: float = 30.0  # seconds
 
 
 @dataclass(frozen=True)
@@ -29,6 +61,8 @@ class DatabaseConfig:
     DB_PASSWORD: str = "postgres"
     DB_PORT: int = 5432
     MAX_INBOX_SIZE: int = 5
+    MAX_GROUP_MEMBERS: int = 100
+    MAX_GROUP_NAME_LENGTH: int = 32
     
     # Table creation queries (separate from index creation)
     CREATE_USER_TABLE_QUERY = """CREATE TABLE IF NOT EXISTS users(
@@ -50,6 +84,44 @@ class DatabaseConfig:
     
     CREATE_MESSAGE_INDEX_QUERY = """CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver_id)"""
 
+    CREATE_GROUP_TABLE_QUERY = """CREATE TABLE IF NOT EXISTS groups(
+        id INTEGER PRIMARY KEY,
+        name        TEXT            NOT NULL UNIQUE,
+        owner_id    INTEGER         NOT NULL REFERENCES users(id) ON DELETE RESTRICT
+        )"""
+
+    CREATE_GROUP_MEMBER_TABLE_QUERY = """CREATE TABLE IF NOT EXISTS group_members(
+        group_id    INTEGER         NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+        user_id     INTEGER         NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        PRIMARY KEY (group_id, user_id)
+        )"""
+
+    CREATE_GROUP_MEMBER_INDEX_QUERY = """CREATE INDEX IF NOT EXISTS idx_group_members_user ON group_members(user_id)"""
+
+
+@dataclass(frozen=True)
+class ConnectionPoolConfig:
+    """Database connection pool configuration."""
+
+    MIN_CONNECTIONS: int = 5
+    MAX_CONNECTIONS: int = 100
+    GROWTH_STEP: int = 5
+    CLEANUP_INTERVAL: int = 10  # seconds
+    IDLE_TIMEOUT: int = 30  # seconds
+    CHECKOUT_TIMEOUT: int = 10  # seconds
+    # Debug mode records checkout stacks of connections held longer than the threshold
+    DEBUG: bool = False
+    LEAK_THRESHOLD: int = 5  # seconds
+    # Thread affinity binds a connection to each worker thread for the thread's lifetime
+    THREAD_AFFINITY: bool = False
+    # Adaptive mode moves MIN_CONNECTIONS and GROWTH_STEP within the bounds below,
+    # based on checkout waits and in-use peaks seen between two reaper runs
+    ADAPTIVE: bool = False
+    ADAPTIVE_MIN_FLOOR: int = 2
+    ADAPTIVE_MAX_FLOOR: int = 50
+    ADAPTIVE_MAX_GROWTH_STEP: int = 20
+    ADAPTIVE_WAIT_THRESHOLD: float = 0.005  # seconds
+
 
 @dataclass(frozen=True)
 class MessageConfig:
@@ -57,6 +129,12 @@ class MessageConfig:
 
     MAX_MESSAGE_LENGTH: int = 255
 
+    # Wire formats accepted during handshake, from the most preferred one. Only JSON:
+    # with orjson it encodes and decodes faster than any pure Python binary codec
+    WIRE_FORMATS = ("json",)
+    # JSON implementation: "auto" uses orjson when installed, "json" forces the standard library
+    JSON_BACKEND: str = "auto"
+
     # Valid account types
     VALID_ACCOUNT_TYPES = ("admin", "user")
 
@@ -66,8 +144,48 @@ class SecurityConfig:
     """Security related configuration."""
 
     PASSWORD_MIN_LENGTH: int = 4
+    # Longer passwords are rejected before hashing
+    MAX_PASSWORD_LENGTH: int = 128
+    # Key signing session tokens used to resume sessions without a password check. When
+    # empty, a random key is generated once and kept in the secret file, so tokens survive
+    # server restarts and reconnecting clients do not all fall back to password checks
+    SESSION_SECRET: str = os.environ.get("CHAT_SESSION_SECRET", "")
+    SESSION_SECRET_FILE: str = os.environ.get("CHAT_SESSION_SECRET_FILE", "cs_session_secret")
+    SESSION_TOKEN_TTL: int = 3600  # seconds
     MAX_USERNAME_LENGTH: int = 15
     MIN_USERNAME_LENGTH: int = 3
+    # Token bucket limits as (header, requests per second, burst), headers not listed are not limited.
+    # Requests are counted for the user signed in on the connection, never for a claimed sender or login
+    USER_RATE_LIMITS = (
+        ("Authentication", 0.2, 5),
+        ("Acc_type", 0.2, 5),
+        ("Message", 5.0, 20),
+        ("Group_message", 2.0, 10),
+        ("Group", 2.0, 10),
+        ("Command", 5.0, 20),
+    )
+    # Limits per source address, higher as many users may share one. Requests of clients
+    # not signed in yet, e.g. sign ins, are limited by their source address only
+    ADDRESS_RATE_LIMITS = (
+        ("Authentication", 2.0, 20),
+        ("Acc_type", 2.0, 20),
+        ("Message", 50.0, 200),
+        ("Group_message", 20.0, 100),
+        ("Group", 20.0, 100),
+        ("Command", 50.0, 200),
+    )
+    # Source addresses not limited by ADDRESS_RATE_LIMITS, comma separated, e.g. the address of
+    # a load generator opening many connections: CHAT_RATE_LIMIT_EXEMPT=127.0.0.1
+    RATE_LIMIT_EXEMPT_ADDRESSES = tuple(
+        address.strip() for address in os.environ.get("CHAT_RATE_LIMIT_EXEMPT", "").split(",") if address.strip()
+    )
+    # Failed sign ins allowed for a login as (attempts per second, burst). Once they are used up,
+    # every sign in to the login waits until the next attempt is allowed, at most LOGIN_BACKOFF_MAX
+    # seconds. Password guessing is slowed down, but nobody can lock the real user out
+    LOGIN_FAILURE_LIMIT = (0.2, 5)
+    LOGIN_BACKOFF_MAX: float = 2.0
+    # Buckets kept in memory by each limiter, the least recently used are evicted
+    RATE_LIMIT_MAX_BUCKETS: int = 100000
     # SESSION_TIMEOUT_MINUTES: int = 30
     # MAX_LOGIN_ATTEMPTS: int = 3
 
@@ -86,6 +204,10 @@ class UIConfig:
         "Check your inbox: Type !inbox\n"
         "Access server information: Type !info\n"
         "Check uptime: Type !uptime\n"
+        "List online users: Type !online, then !online next for more\n"
+        "Group conversations: Type !group\n"
+        "Message all users (admins only): Type !broadcast\n"
+        "Server statistics (admins only): Type !stats\n"
         "Stop server: Type !stop\n"
         "Need help? Type !help"
     )
@@ -102,6 +224,27 @@ class ServerConfig:
     """Server application configuration."""
 
     SERVER_VERSION: str = "1.2.0"
+    # Seconds a cached uptime reply is reused, uptime is reported with one second precision
+    UPTIME_CACHE_TTL: float = 1.0
+    # Number of users listed on a single page of the !online command
+    ONLINE_PAGE_SIZE: int = 50
+    # Threads pushing group messages to online members in parallel
+    PUSH_WORKERS: int = 8
+    # Users a broadcast is pushed to or stored for at once, with a pause between
+    # batches so other clients are not locked out of the database
+    BROADCAST_BATCH_SIZE: int = 1000
+    BROADCAST_PAUSE: float = 0.02
+    # Seconds a stopping server waits for in-flight requests and queued replies before closing connections
+    SHUTDOWN_DEADLINE: float = 20.0
+    # Seconds over which clients of a stopped server spread their reconnects
+    RECONNECT_WINDOW: float = 10.0
+    # Seconds between checks for a requested stop while waiting for new connections
+    ACCEPT_POLL_INTERVAL: float = 0.5
+    # Minimum number of seconds request rates of the !stats command are averaged over
+    STATS_RATE_WINDOW: float = 10.0
+    # Port of the HTTP endpoint serving metrics in Prometheus text format, 0 disables it
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = int(os.environ.get("CHAT_METRICS_PORT", "0"))
 
 
 @dataclass(frozen=True)
@@ -119,6 +262,7 @@ class AppConfig:
 
     network: NetworkConfig = NetworkConfig()
     database: DatabaseConfig = DatabaseConfig()
+    pool: ConnectionPoolConfig = ConnectionPoolConfig()
     message: MessageConfig = MessageConfig()
     security: SecurityConfig = SecurityConfig()
     ui: UIConfig = UIConfig()
@@ -140,6 +284,21 @@ class AppConfig:
                     self.network.BUFFER_SIZE}"
             )
 
+        # Connection pool validation
+        if not (0 < self.pool.MIN_CONNECTIONS <= self.pool.MAX_CONNECTIONS):
+            raise ValueError(
+                "Pool min connections must be positive and not greater than max connections"
+            )
+
+        if not (
+            0 < self.pool.ADAPTIVE_MIN_FLOOR
+            <= self.pool.ADAPTIVE_MAX_FLOOR
+            <= self.pool.MAX_CONNECTIONS
+        ):
+            raise ValueError(
+                "Pool adaptive floor bounds must be positive, ordered and within max connections"
+            )
+
         # Message validation
         if self.message.MAX_MESSAGE_LENGTH <= 0:
             raise ValueError("Max message length must be positive")
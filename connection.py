@@ -5,6 +5,7 @@ and configuration for both client and server connections.
 """
 
 import socket
+from config import config
 
 
 class Connection:
@@ -34,11 +35,34 @@ class Connection:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             if is_server:
                 self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.set_keepalive(self.socket)
             return self.socket
         except socket.error as s:
             print(f"[SOCKET ERROR]: {s}")
             return None
 
+    @staticmethod
+    def set_keepalive(sock):
+        """Enable TCP keepalive probes on a socket, if enabled in the configuration.
+
+        Probe timing options are only set where the platform supports them.
+
+        Args:
+            sock: The socket to configure.
+        """
+        if not config.network.TCP_KEEPALIVE:
+            return
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # macOS names the idle time option TCP_KEEPALIVE
+        idle_option = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+        for option, value in (
+            (idle_option, config.network.TCP_KEEPALIVE_IDLE),
+            (getattr(socket, "TCP_KEEPINTVL", None), config.network.TCP_KEEPALIVE_INTERVAL),
+            (getattr(socket, "TCP_KEEPCNT", None), config.network.TCP_KEEPALIVE_COUNT),
+        ):
+            if option is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
     def close(self):
         """Close the socket connection if it exists."""
         if self.socket:
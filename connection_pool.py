@@ -3,15 +3,69 @@
 This module provides a connection pool, which:
 - allocated 5 open connections to databaseat the start;
 - if necessary, opens and closes additional ones, as per demand (limited to 100 active connections at once);
-- regularly checking if there are unused connections which can be closed;
+- runs a background reaper, closing connections which stay idle for too long;
+- hands connections to waiting threads in FIFO order, giving up after a checkout timeout;
+- in debug mode, records where long-held (possibly leaked) connections were checked out;
+- records metrics (wait/hold times, peak usage, churn) available through a snapshot;
+- in adaptive mode, tunes its warm floor and growth step to the observed demand;
+- in thread-affine mode, keeps one connection bound to each worker thread until it exits;
+- once closed, refuses new checkouts and closes connections as they are returned;
 """
 
 import sqlite3
 import time
+import traceback
+import weakref
+from collections import deque
+from contextlib import contextmanager
 from config import config
+from metrics import Histogram
 import threading
 
 
+class PoolTimeoutError(Exception):
+    """Raised when no database connection becomes available before the checkout deadline"""
+
+
+class PoolClosedError(Exception):
+    """Raised when a database connection is requested from a closed pool"""
+
+
+class _Waiter:
+    """Thread waiting in the checkout queue for a connection to be handed over"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.connection = None
+
+
+class PoolMetrics:
+    """Counters and histograms describing connection pool usage.
+
+    All updates happen while the pool lock is held, so the values stay
+    consistent with each other.
+    """
+
+    def __init__(self):
+        self.wait_time = Histogram()
+        self.hold_time = Histogram()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.peak_in_use = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.failure_closes = 0
+
+
+class _ThreadBinding:
+    """Connection bound to a single worker thread in thread-affine mode"""
+
+    def __init__(self, db_conn, db_cursor):
+        self.connection = db_conn
+        self.cursor = db_cursor
+        self.finalizer = None
+
+
 class ConnectionPool:
 
     DB_FILE = config.database.DB_FILE
@@ -19,23 +73,67 @@ class ConnectionPool:
     DB_PASSWORD = config.database.DB_PASSWORD
     DB_PORT = config.database.DB_PORT
 
-    def __init__(self):
-        """Create connection pool and prepare for operations"""
+    def __init__(
+        self,
+        idle_timeout=config.pool.IDLE_TIMEOUT,
+        cleanup_interval=config.pool.CLEANUP_INTERVAL,
+        checkout_timeout=config.pool.CHECKOUT_TIMEOUT,
+        debug=config.pool.DEBUG,
+        adaptive=config.pool.ADAPTIVE,
+        thread_affinity=config.pool.THREAD_AFFINITY,
+    ):
+        """Create connection pool and prepare for operations
+
+        Args:
+            idle_timeout: Seconds after which an unused extra connection gets closed.
+            cleanup_interval: Seconds between two runs of the background reaper.
+            checkout_timeout: Default number of seconds get_connection waits for a connection.
+            debug: Whether to record checkout stacks for leak detection.
+            adaptive: Whether the reaper should resize the pool based on observed demand.
+            thread_affinity: Whether each thread keeps its connection until the thread exits.
+        """
         self.lock = threading.Lock()
-        self.min_connections = 5
-        self.max_connections = 100
-        self.semaphore = threading.Semaphore(value=self.max_connections)
-        self.cleanup_interval = 10
-        self.open_connections = []
+        self.min_connections = config.pool.MIN_CONNECTIONS
+        self.max_connections = config.pool.MAX_CONNECTIONS
+        self.growth_step = config.pool.GROWTH_STEP
+        self.cleanup_interval = cleanup_interval
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.debug = debug
+        self.leak_threshold = config.pool.LEAK_THRESHOLD
+        self.adaptive = adaptive
+        self.thread_affinity = thread_affinity
+        # Per-thread storage holding the connection bound in thread-affine mode
+        self.local = threading.local()
+        # Demand observed since the last adaptive resize
+        self.window_peak_in_use = 0
+        self.window_slow_checkouts = 0
+        # Idle connections are kept as a LIFO stack of (connection, cursor, last_used)
+        # entries, so the most recently returned (and cache-warm) connection is
+        # handed out first and the bottom of the stack is always the longest idle
+        self.open_connections = deque()
+        # Checked out connections are tracked by identity for O(1) returns, mapped
+        # to their (checkout_time, checkout_stack) record
+        self.checked_out = {}
+        # Threads waiting for a connection, served first come, first served
+        self.waiters = deque()
         self.used_connection = 0
+        self.closed = False
+        self.metrics = PoolMetrics()
         self.last_cleanup_time = time.time()
         self.allocate_db_connections(self.min_connections)
 
+        self.reaper_stop = threading.Event()
+        self.reaper_thread = None
+        self.start_reaper()
+
     def allocate_db_connections(self, no_of_connections):
         """Allocate X database connections at the start"""
+        now = time.monotonic()
         for _ in range(no_of_connections):
             db_connection, db_cursor = self.create_new_connection()
-            self.open_connections.append((db_connection, db_cursor))
+            self.open_connections.append((db_connection, db_cursor, now))
+            self.metrics.connections_created += 1
 
     def create_new_connection(self):
         """Creating new connection if required"""
@@ -47,64 +145,377 @@ class ConnectionPool:
 
         return db_connection, db_cursor
 
-    def get_connection(self):
-        """Sharing allocated connections with database peration methods"""
-        # If pool is empty, create a new connection directly
-        self.semaphore.acquire()
-        try:
-            with self.lock:
-                available_slots = self.max_connections - self.used_connection
-                if len(self.open_connections) == 0:
-                    if available_slots > 0:
-                        connections_to_create = min(5, available_slots)
-                        self.allocate_db_connections(connections_to_create)
-                    else:
-                        self.semaphore.release()
-                        raise Exception("Maximum number of database connections reached")
-
-                connection_tuple = self.open_connections[0]
-                self.open_connections.pop(0)
-                self.used_connection += 1
-                return connection_tuple[0], connection_tuple[1]
-        except Exception as e:
-            self.semaphore.release()
-            print(f"[ERROR] Exception: {e}")
-            raise e
+    def get_connection(self, timeout=None):
+        """Sharing allocated connections with database peration methods
+
+        In thread-affine mode a thread which already has a bound connection gets
+        it back without taking the pool lock; otherwise the checked out connection
+        gets bound to the calling thread.
+
+        Args:
+            timeout: Maximum number of seconds to wait for a connection,
+                     defaults to the pool checkout timeout.
+
+        Returns:
+            Tuple of (connection, cursor).
+
+        Raises:
+            PoolTimeoutError: If no connection became available before the deadline.
+            PoolClosedError: If the pool is closed.
+        """
+        if not self.thread_affinity:
+            return self._checkout(timeout)
+
+        binding = getattr(self.local, "binding", None)
+        if binding is not None:
+            return binding.connection, binding.cursor
+
+        db_conn, db_cursor = self._checkout(timeout)
+        binding = _ThreadBinding(db_conn, db_cursor)
+        # Thread local storage is dropped when the thread exits, which returns the connection
+        binding.finalizer = weakref.finalize(binding, self._give_back, db_conn, db_cursor)
+        binding.finalizer.atexit = False
+        self.local.binding = binding
+        return db_conn, db_cursor
 
     def return_connection(self, db_conn, db_cursor):
+        """Put checked out connection back on top of the idle stack
+
+        In thread-affine mode the calling thread's bound connection stays checked out.
+        """
+        if self.thread_affinity:
+            binding = getattr(self.local, "binding", None)
+            if binding is not None and binding.connection is db_conn:
+                return
+        self._give_back(db_conn, db_cursor)
+
+    def release_thread_connection(self):
+        """Give the connection bound to the calling thread back to the pool"""
+        binding = self._unbind_thread()
+        if binding is not None:
+            self._give_back(binding.connection, binding.cursor)
+
+    def _unbind_thread(self):
+        """Detach the connection bound to the calling thread, if there is one"""
+        binding = getattr(self.local, "binding", None)
+        if binding is None:
+            return None
+        binding.finalizer.detach()
+        self.local.binding = None
+        return binding
+
+    def _checkout(self, timeout):
+        """Check out a connection from the shared pool, waiting in line if required"""
+        if timeout is None:
+            timeout = self.checkout_timeout
+
+        wait_start = time.monotonic()
+        with self.lock:
+            if self.closed:
+                raise PoolClosedError("Connection pool is closed")
+            # Only skip the queue if nobody is waiting, to keep checkouts fair
+            if not self.waiters:
+                connection = self._take_connection()
+                if connection is not None:
+                    self.metrics.wait_time.observe(0.0)
+                    return connection
+            waiter = _Waiter()
+            self.waiters.append(waiter)
+
+        waiter.event.wait(timeout)
+
+        with self.lock:
+            wait_time = time.monotonic() - wait_start
+            self.metrics.wait_time.observe(wait_time)
+            if wait_time > config.pool.ADAPTIVE_WAIT_THRESHOLD:
+                self.window_slow_checkouts += 1
+            if waiter.connection is None and self.closed:
+                # The waiter was already dropped from the queue by close
+                raise PoolClosedError("Connection pool closed while waiting for a connection")
+            if waiter.connection is None:
+                self.waiters.remove(waiter)
+                self.metrics.checkout_timeouts += 1
+                raise PoolTimeoutError(self._timeout_message(timeout))
+            if self.debug:
+                db_conn = waiter.connection[0]
+                self.checked_out[db_conn] = (self.checked_out[db_conn][0], self._checkout_stack())
+            return waiter.connection
+
+    def _give_back(self, db_conn, db_cursor):
+        """Give a connection back to the shared pool, or to the longest waiting thread
+
+        Connections returned to a closed pool are closed instead.
+        """
         with self.lock:
-            if (db_conn, db_cursor) not in self.open_connections:
-                self.open_connections.append((db_conn, db_cursor))
-                self.used_connection -= 1
-            self.semaphore.release()
+            # Ignore connections which are not checked out (e.g. returned twice)
+            if db_conn not in self.checked_out:
+                return
+            self._check_in(db_conn)
+
+            if self.closed:
+                db_cursor.close()
+                db_conn.close()
+                self.metrics.connections_closed += 1
+            elif self.waiters:
+                self._hand_over(db_conn, db_cursor)
+            else:
+                self.open_connections.append((db_conn, db_cursor, time.monotonic()))
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the duration of a 'with' block
+
+        The connection is always given back: returned to the pool when the block
+        finishes, or closed as failing when the block raises an exception.
+
+        Args:
+            timeout: Maximum number of seconds to wait for a connection.
+
+        Yields:
+            Tuple of (connection, cursor).
+        """
+        db_conn, db_cursor = self.get_connection(timeout)
+        try:
+            yield db_conn, db_cursor
+        except BaseException:
+            self.close_failing_connection(db_conn, db_cursor)
+            raise
+        else:
+            self.return_connection(db_conn, db_cursor)
+
+    def find_leaked_connections(self, threshold=None):
+        """List connections checked out for longer than the leak threshold
+
+        Args:
+            threshold: Number of seconds after which a connection is reported,
+                       defaults to the pool leak threshold.
+
+        Returns:
+            List of (held_for_seconds, checkout_stack) tuples, longest held first.
+            Checkout stacks are only recorded in debug mode, otherwise they are None.
+        """
+        if threshold is None:
+            threshold = self.leak_threshold
+        now = time.monotonic()
+        with self.lock:
+            records = list(self.checked_out.values())
+        leaks = [
+            (now - checkout_time, stack)
+            for checkout_time, stack in records
+            if now - checkout_time > threshold
+        ]
+        return sorted(leaks, key=lambda leak: leak[0], reverse=True)
+
+    def report_leaked_connections(self):
+        """Print checkout stacks of connections held for longer than the leak threshold"""
+        for held_for, stack in self.find_leaked_connections():
+            print(f"[WARNING] Database connection held for {held_for:.1f}s, checked out at:\n{stack}")
+
+    def _take_connection(self):
+        """Check out an idle connection, growing the pool if required (lock must be held)
+
+        Returns:
+            Tuple of (connection, cursor), or None if the pool is exhausted.
+        """
+        if not self.open_connections:
+            available_slots = self.max_connections - self.used_connection
+            if available_slots <= 0:
+                return None
+            self.allocate_db_connections(min(self.growth_step, available_slots))
+
+        db_conn, db_cursor, _ = self.open_connections.pop()
+        self._check_out(db_conn)
+        return db_conn, db_cursor
+
+    def _check_out(self, db_conn):
+        """Record connection as checked out (lock must be held)"""
+        stack = self._checkout_stack() if self.debug else None
+        self.checked_out[db_conn] = (time.monotonic(), stack)
+        self.used_connection += 1
+        self.metrics.checkouts += 1
+        if self.used_connection > self.metrics.peak_in_use:
+            self.metrics.peak_in_use = self.used_connection
+        if self.used_connection > self.window_peak_in_use:
+            self.window_peak_in_use = self.used_connection
+
+    def _check_in(self, db_conn):
+        """Record connection as no longer checked out (lock must be held)"""
+        checkout_time, _ = self.checked_out.pop(db_conn)
+        self.used_connection -= 1
+        self.metrics.hold_time.observe(time.monotonic() - checkout_time)
+
+    def _hand_over(self, db_conn, db_cursor):
+        """Give connection directly to the longest waiting thread (lock must be held)"""
+        waiter = self.waiters.popleft()
+        self._check_out(db_conn)
+        waiter.connection = (db_conn, db_cursor)
+        waiter.event.set()
+
+    def _checkout_stack(self):
+        """Format the stack of the calling code, without the pool's own frames"""
+        frames = [
+            frame for frame in traceback.extract_stack()
+            if frame.filename != __file__ and not frame.filename.endswith("contextlib.py")
+        ]
+        return "".join(traceback.format_list(frames))
+
+    def _timeout_message(self, timeout):
+        """Build error message describing pool state at checkout timeout (lock must be held)"""
+        message = (
+            f"No database connection available within {timeout}s "
+            f"({self.used_connection}/{self.max_connections} in use, {len(self.waiters)} waiting)"
+        )
+        if self.debug and self.checked_out:
+            checkout_time, stack = min(self.checked_out.values(), key=lambda record: record[0])
+            message += (
+                f"\nLongest held connection ({time.monotonic() - checkout_time:.1f}s) "
+                f"was checked out at:\n{stack}"
+            )
+        return message
 
     def close_all_connections(self):
         """Closing all connections inside the pool"""
-        for conn, cursor in self.open_connections:
+        self.stop_reaper()
+        with self.lock:
+            self._close_idle()
+
+    def close(self):
+        """Close the pool for good
+
+        New checkouts raise PoolClosedError, threads waiting for a connection are
+        woken up with PoolClosedError, idle connections are closed right away and
+        checked out connections are closed when they are returned.
+        """
+        self.stop_reaper()
+        with self.lock:
+            self.closed = True
+            while self.waiters:
+                self.waiters.popleft().event.set()
+            self._close_idle()
+
+    def _close_idle(self):
+        """Close every idle connection (lock must be held)"""
+        for conn, cursor, _ in self.open_connections:
             cursor.close()
             conn.close()
+        self.metrics.connections_closed += len(self.open_connections)
         self.open_connections.clear()
 
     def check_for_cleanup(self):
         """Checking if it's time for connection cleanup"""
         current_time = time.time()
         if current_time - self.last_cleanup_time > self.cleanup_interval:
-            # print("Connections cleanup")
-            self.close_extra_connections()
+            self.close_idle_connections()
             self.last_cleanup_time = time.time()
 
+    def start_reaper(self):
+        """Start the background daemon thread closing idle connections"""
+        if self.reaper_thread is not None and self.reaper_thread.is_alive():
+            return
+        self.reaper_stop.clear()
+        self.reaper_thread = threading.Thread(
+            target=self._reap_idle_connections, name="ConnectionPoolReaper", daemon=True
+        )
+        self.reaper_thread.start()
+
+    def stop_reaper(self):
+        """Stop the background reaper thread, if it is running"""
+        self.reaper_stop.set()
+        if self.reaper_thread is not None and self.reaper_thread is not threading.current_thread():
+            self.reaper_thread.join(timeout=1)
+        self.reaper_thread = None
+
+    def _reap_idle_connections(self):
+        """Reaper thread loop, waking up every cleanup interval until stopped"""
+        while not self.reaper_stop.wait(self.cleanup_interval):
+            if self.adaptive:
+                self.adjust_pool_size()
+            self.close_idle_connections()
+            self.last_cleanup_time = time.time()
+            if self.debug:
+                self.report_leaked_connections()
+
+    def adjust_pool_size(self):
+        """Move warm floor and growth step towards the demand seen since the last call
+
+        When checkouts had to wait or the in-use peak reached the floor, the floor is
+        raised above the peak (and the growth step doubled on waits), then missing
+        idle connections are pre-warmed. When the peak stayed well below the floor,
+        both are lowered, so the reaper can release the extra idle connections.
+        All changes stay within the adaptive bounds from the configuration.
+        """
+        with self.lock:
+            peak = self.window_peak_in_use
+            slow_checkouts = self.window_slow_checkouts
+            self.window_peak_in_use = self.used_connection
+            self.window_slow_checkouts = 0
+
+            growing = slow_checkouts > 0 or peak >= self.min_connections
+            if slow_checkouts:
+                self.growth_step = min(self.growth_step * 2, config.pool.ADAPTIVE_MAX_GROWTH_STEP)
+            if growing:
+                target = peak + self.growth_step
+            elif peak < self.min_connections // 2:
+                self.growth_step = max(self.growth_step // 2, 1)
+                # Halve the distance to the peak, so short lulls do not drop the whole floor
+                target = self.min_connections - (self.min_connections - peak) // 2
+            else:
+                return
+
+            self.min_connections = max(
+                config.pool.ADAPTIVE_MIN_FLOOR,
+                min(target, config.pool.ADAPTIVE_MAX_FLOOR, self.max_connections),
+            )
+
+            if not growing:
+                return
+
+            # Pre-warm idle connections up to the new floor, within the pool limit
+            total_connections = self.used_connection + len(self.open_connections)
+            missing = min(
+                self.min_connections - len(self.open_connections),
+                self.max_connections - total_connections,
+            )
+            if missing > 0:
+                self.allocate_db_connections(missing)
+
+    def close_idle_connections(self):
+        """Close extra connections idle for longer than idle timeout, down to the minimum
+
+        Returns:
+            Number of closed connections.
+        """
+        closed = 0
+        now = time.monotonic()
+        with self.lock:
+            # Stack bottom is the longest idle, so stop at the first recently used one
+            while (
+                len(self.open_connections) > self.min_connections
+                and now - self.open_connections[0][2] > self.idle_timeout
+            ):
+                conn, cursor, _ = self.open_connections.popleft()
+                cursor.close()
+                conn.close()
+                closed += 1
+            self.metrics.connections_closed += closed
+        return closed
+
     def close_extra_connections(self):
         """Close all unused extra connections over the starting 5"""
-        print(f"Number of available connections BEFORE cleanup: {len(self.open_connections)}")
         with self.lock:
+            # The bottom of the stack holds the least recently used connections
             while len(self.open_connections) > self.min_connections:
-                conn, cursor = self.open_connections.pop()
+                conn, cursor, _ = self.open_connections.popleft()
                 cursor.close()
                 conn.close()
-        print(f"Number of available connections AFTER cleanup: {len(self.open_connections)}")
+                self.metrics.connections_closed += 1
 
     def close_failing_connection(self, db_conn, db_cursor):
         """Close connection in case of error/exception and create new one"""
+        binding = getattr(self.local, "binding", None)
+        if binding is not None and binding.connection is db_conn:
+            self._unbind_thread()
+
         try:
             if db_cursor:
                 db_cursor.close()
@@ -118,5 +529,66 @@ class ConnectionPool:
             pass
 
         with self.lock:
-            self.used_connection -= 1
-            self.semaphore.release()
+            if db_conn not in self.checked_out:
+                return
+            self._check_in(db_conn)
+            self.metrics.connections_closed += 1
+            self.metrics.failure_closes += 1
+
+            # The freed slot goes to the longest waiting thread, if there is one
+            if self.waiters and not self.closed:
+                try:
+                    new_conn, new_cursor = self.create_new_connection()
+                except sqlite3.Error as e:
+                    print(f"[ERROR] Error replacing failing connection: {e}")
+                    return
+                self.metrics.connections_created += 1
+                self._hand_over(new_conn, new_cursor)
+
+    def get_counters(self) -> dict:
+        """Return pool usage without taking the pool lock, for frequent scraping
+
+        Every value is read on its own, so checkouts are never delayed, at the
+        cost of values possibly being one checkout apart from each other.
+
+        Returns:
+            Dictionary with current usage gauges, churn counters and checkout
+            wait time / hold time histogram snapshots.
+        """
+        return {
+            "in_use": self.used_connection,
+            "idle": len(self.open_connections),
+            "waiting": len(self.waiters),
+            "max_connections": self.max_connections,
+            "checkouts": self.metrics.checkouts,
+            "checkout_timeouts": self.metrics.checkout_timeouts,
+            "connections_created": self.metrics.connections_created,
+            "connections_closed": self.metrics.connections_closed,
+            "failure_closes": self.metrics.failure_closes,
+            "wait_time": self.metrics.wait_time.snapshot(),
+            "hold_time": self.metrics.hold_time.snapshot(),
+        }
+
+    def get_metrics(self) -> dict:
+        """Return a snapshot of pool usage metrics
+
+        Returns:
+            Dictionary with current and peak usage, connection churn counters
+            and checkout wait time / hold time histogram snapshots.
+        """
+        with self.lock:
+            return {
+                "in_use": self.used_connection,
+                "idle": len(self.open_connections),
+                "waiting": len(self.waiters),
+                "peak_in_use": self.metrics.peak_in_use,
+                "min_connections": self.min_connections,
+                "max_connections": self.max_connections,
+                "checkouts": self.metrics.checkouts,
+                "checkout_timeouts": self.metrics.checkout_timeouts,
+                "connections_created": self.metrics.connections_created,
+                "connections_closed": self.metrics.connections_closed,
+                "failure_closes": self.metrics.failure_closes,
+                "wait_time": self.metrics.wait_time.snapshot(),
+                "hold_time": self.metrics.hold_time.snapshot(),
+            }
@@ -5,6 +5,7 @@ database system. It handles user authentication, message storage, and data persi
 """
 
 import sqlite3
+import time
 from config import config
 from connection_pool import ConnectionPool
 
@@ -51,6 +52,12 @@ class Database:
             db_connection.commit()
             db_cursor.execute(config.database.CREATE_MESSAGE_INDEX_QUERY)
             db_connection.commit()
+            db_cursor.execute(config.database.CREATE_GROUP_TABLE_QUERY)
+            db_connection.commit()
+            db_cursor.execute(config.database.CREATE_GROUP_MEMBER_TABLE_QUERY)
+            db_connection.commit()
+            db_cursor.execute(config.database.CREATE_GROUP_MEMBER_INDEX_QUERY)
+            db_connection.commit()
         except Exception as e:
             print(f"Error initializing databse: {e}")
             if db_connection and db_cursor:
@@ -125,6 +132,64 @@ class Database:
                 self.close_db(db_connection, db_cursor)
             return result
 
+    def get_account_type(self, username: str) -> str | None:
+        """Retrieve the account type of a given username.
+
+        Args:
+            username: The username to get the account type for.
+
+        Returns:
+            The account type of the user, or None if the user does not exist or has no type set.
+        """
+        db_connection = None
+        db_cursor = None
+        get_account_type_query = """SELECT account_type FROM users WHERE username = ?;"""
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return None
+            db_cursor.execute(get_account_type_query, (username,))
+            row = db_cursor.fetchone()
+        except Exception as e:
+            print(f"[ERROR] Error getting user account type: {e}")
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            return None
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return row[0] if row else None
+
+    def check_account_type_in_db(self, account_type: str) -> bool:
+        """Check if any user has the given account type.
+
+        Args:
+            account_type: The account type to look for.
+
+        Returns:
+            True if at least one user has the account type, False otherwise or on errors.
+        """
+        db_connection = None
+        db_cursor = None
+        account_type_query = """SELECT 1 FROM users WHERE account_type = ? LIMIT 1;"""
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return False
+            db_cursor.execute(account_type_query, (account_type,))
+            row = db_cursor.fetchone()
+        except Exception as e:
+            print(f"[ERROR] Error checking account types: {e}")
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            return False
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return row is not None
+
     def add_user_to_db(self, login, password, type=None):
         """Add a new user to the database.
 
@@ -264,6 +329,288 @@ class Database:
                 self.close_db(db_connection, db_cursor)
             return True
 
+    def add_msgs_to_inboxes(self, receivers, sender, message) -> list:
+        """Add a message to inboxes of many users in a single transaction.
+
+        Inbox sizes of all receivers are counted with one query and the
+        messages are inserted in one batch, instead of separate checks and
+        commits for every receiver.
+
+        Args:
+            receivers: Usernames of the message recipients.
+            sender: The sender's username.
+            message: The message content.
+
+        Returns:
+            Usernames of receivers whose inbox is full, or who do not exist,
+            so the message was not stored for them.
+        """
+        db_connection = None
+        db_cursor = None
+        sender_query = """SELECT id FROM users WHERE username = ?;"""
+        add_msg_query = """INSERT INTO messages (sender_id, receiver_id, content) VALUES (?, ?, ?);"""
+        # Stays below the SQLite limit of query parameters
+        chunk_size = 500
+        receivers = list(dict.fromkeys(receivers))
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return receivers
+            # Write lock is taken up front, so inbox sizes cannot change before the inserts
+            db_cursor.execute("BEGIN IMMEDIATE;")
+            db_cursor.execute(sender_query, (sender,))
+            sender_row = db_cursor.fetchone()
+            if sender_row is None:
+                raise ValueError(f"Sender '{sender}' does not exist")
+
+            rows = []
+            stored = set()
+            for start in range(0, len(receivers), chunk_size):
+                chunk = receivers[start:start + chunk_size]
+                placeholders = ", ".join("?" * len(chunk))
+                inbox_size_query = f"""SELECT users.id, users.username, COUNT(messages.id) FROM users
+                                        LEFT JOIN messages ON messages.receiver_id = users.id
+                                        WHERE users.username IN ({placeholders})
+                                        GROUP BY users.id;"""
+                db_cursor.execute(inbox_size_query, chunk)
+                for receiver_id, username, inbox_size in db_cursor.fetchall():
+                    if inbox_size < config.database.MAX_INBOX_SIZE:
+                        rows.append((sender_row[0], receiver_id, message))
+                        stored.add(username)
+
+            db_cursor.executemany(add_msg_query, rows)
+            db_connection.commit()
+        except Exception as e:
+            print(f"[ERROR] Error adding messages to database: {e}")
+            if db_connection:
+                db_connection.rollback()
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            raise Exception(f"Unexpected error during database modification: {e}")
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return [receiver for receiver in receivers if receiver not in stored]
+
+    def broadcast_message(self, sender, message, skip=(), chunk_size=1000, pause=0.0) -> int:
+        """Add a message to inboxes of all users except the sender.
+
+        Messages are copied with set based INSERT ... SELECT statements over
+        ranges of user ids, each range in its own short transaction, so other
+        writers get the database between chunks. Users with a full inbox are
+        skipped.
+
+        Args:
+            sender: The sender's username.
+            message: The message content.
+            skip: Usernames which should not get the message, e.g. because it was pushed to them.
+            chunk_size: Number of user ids covered by one transaction.
+            pause: Seconds to wait between chunks.
+
+        Returns:
+            Number of inboxes the message was stored in.
+        """
+        db_connection = None
+        db_cursor = None
+        sender_query = """SELECT id FROM users WHERE username = ?;"""
+        broadcast_query = """INSERT INTO messages (sender_id, receiver_id, content)
+                            SELECT ?, users.id, ? FROM users
+                            WHERE users.id > ? AND users.id <= ? AND users.id != ?
+                            AND users.username NOT IN (SELECT username FROM temp.broadcast_skip)
+                            AND (SELECT COUNT(*) FROM messages WHERE messages.receiver_id = users.id) < ?;"""
+        stored = 0
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return 0
+            db_cursor.execute(sender_query, (sender,))
+            sender_row = db_cursor.fetchone()
+            if sender_row is None:
+                raise ValueError(f"Sender '{sender}' does not exist")
+            db_cursor.execute("""SELECT COALESCE(MAX(id), 0) FROM users;""")
+            max_id = db_cursor.fetchone()[0]
+
+            # Skipped users are joined from a temporary table, as their number is not limited
+            db_cursor.execute("""CREATE TEMP TABLE IF NOT EXISTS broadcast_skip (username TEXT PRIMARY KEY);""")
+            db_cursor.execute("""DELETE FROM temp.broadcast_skip;""")
+            db_cursor.executemany(
+                """INSERT OR IGNORE INTO temp.broadcast_skip (username) VALUES (?);""",
+                ((username,) for username in skip),
+            )
+            db_connection.commit()
+
+            for low in range(0, max_id, chunk_size):
+                if low and pause:
+                    time.sleep(pause)
+                db_cursor.execute("BEGIN IMMEDIATE;")
+                db_cursor.execute(
+                    broadcast_query,
+                    (sender_row[0], message, low, low + chunk_size, sender_row[0], config.database.MAX_INBOX_SIZE),
+                )
+                stored += db_cursor.rowcount
+                db_connection.commit()
+
+            db_cursor.execute("""DELETE FROM temp.broadcast_skip;""")
+            db_connection.commit()
+        except Exception as e:
+            print(f"[ERROR] Error broadcasting message: {e}")
+            if db_connection:
+                db_connection.rollback()
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            raise Exception(f"Unexpected error during database modification: {e}")
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return stored
+
+    def create_group(self, name, owner) -> bool:
+        """Create a group, with its owner as the first member.
+
+        Args:
+            name: Name of the new group.
+            owner: Username of the user creating the group.
+
+        Returns:
+            True if the group was created, False if the name is taken or the owner does not exist.
+        """
+        db_connection = None
+        db_cursor = None
+        add_group_query = """INSERT INTO groups (name, owner_id) VALUES (?, (SELECT id FROM users WHERE username = ?));"""
+        add_member_query = """INSERT INTO group_members (group_id, user_id) VALUES (?, (SELECT id FROM users WHERE username = ?));"""
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return False
+            db_cursor.execute(add_group_query, (name, owner))
+            db_cursor.execute(add_member_query, (db_cursor.lastrowid, owner))
+            db_connection.commit()
+        except Exception as e:
+            print(f"[ERROR] Error creating group: {e}")
+            if db_connection:
+                db_connection.rollback()
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            return False
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return True
+
+    def add_group_member(self, name, username) -> bool:
+        """Add a user to a group, if the group is not full.
+
+        Args:
+            name: Name of the group.
+            username: Username of the new member.
+
+        Returns:
+            True if the user is a member of the group, False if the group is full
+            or the group or user does not exist.
+        """
+        db_connection = None
+        db_cursor = None
+        count_members_query = """SELECT COUNT(*) FROM group_members WHERE group_id = (SELECT id FROM groups WHERE name = ?);"""
+        add_member_query = """INSERT OR IGNORE INTO group_members (group_id, user_id) VALUES (
+                            (SELECT id FROM groups WHERE name = ?),
+                            (SELECT id FROM users WHERE username = ?)
+                            );"""
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return False
+            db_cursor.execute("BEGIN IMMEDIATE;")
+            db_cursor.execute(count_members_query, (name,))
+            if db_cursor.fetchone()[0] >= config.database.MAX_GROUP_MEMBERS:
+                db_connection.rollback()
+                result = False
+            else:
+                db_cursor.execute(add_member_query, (name, username))
+                db_connection.commit()
+                result = True
+        except Exception as e:
+            print(f"[ERROR] Error adding group member: {e}")
+            if db_connection:
+                db_connection.rollback()
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            return False
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return result
+
+    def remove_group_member(self, name, username) -> bool:
+        """Remove a user from a group.
+
+        Returns:
+            True if the user was a member of the group and got removed.
+        """
+        db_connection = None
+        db_cursor = None
+        remove_member_query = """DELETE FROM group_members
+                                WHERE group_id = (SELECT id FROM groups WHERE name = ?)
+                                AND user_id = (SELECT id FROM users WHERE username = ?);"""
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return False
+            db_cursor.execute(remove_member_query, (name, username))
+            result = db_cursor.rowcount > 0
+            db_connection.commit()
+        except Exception as e:
+            print(f"[ERROR] Error removing group member: {e}")
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            return False
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            return result
+
+    def get_group(self, name) -> dict | None:
+        """Get owner and members of a group.
+
+        Args:
+            name: Name of the group.
+
+        Returns:
+            Dictionary with owner username and list of member usernames, or None if the group does not exist.
+        """
+        db_connection = None
+        db_cursor = None
+        get_group_query = """SELECT owner.username, member.username FROM groups
+                            JOIN users AS owner ON owner.id = groups.owner_id
+                            LEFT JOIN group_members ON group_members.group_id = groups.id
+                            LEFT JOIN users AS member ON member.id = group_members.user_id
+                            WHERE groups.name = ?;"""
+        try:
+            db_connection, db_cursor = self.open_db()
+            if db_connection is None:
+                print("Database connection unavailable - rejecting operation")
+                return None
+            db_cursor.execute(get_group_query, (name,))
+            rows = db_cursor.fetchall()
+        except Exception as e:
+            print(f"[ERROR] Error reading group from database: {e}")
+            if db_connection and db_cursor:
+                self.CONNECTION_POOL.close_failing_connection(db_connection, db_cursor)
+            return None
+        else:
+            if db_connection and db_cursor:
+                self.close_db(db_connection, db_cursor)
+            if not rows:
+                return None
+            return {
+                "owner": rows[0][0],
+                "members": [member for _, member in rows if member is not None],
+            }
+
     def read_msg_from_inbox(self, username) -> list[str, str]:
         """Read and remove the first message from a user's inbox.
 
@@ -381,7 +728,7 @@ class Database:
         try:
             return self.CONNECTION_POOL.get_connection()
         except Exception as e:
-            print("Maximum number of database connections reached")
+            print(f"[ERROR] {e}")
             return None, None
 
     def close_db(self, connection, cursor):
@@ -466,6 +813,44 @@ class DbHelper:
         """
         return self.db.add_msg_to_db(receiver, sender, message)
 
+    def add_msgs_to_inboxes(self, receivers, sender, message):
+        """Add a message to inboxes of many receivers at once.
+
+        Returns:
+            Usernames of receivers the message could not be stored for.
+        """
+        return self.db.add_msgs_to_inboxes(receivers, sender, message)
+
+    def broadcast_message(self, sender, message, skip=()):
+        """Add a message to inboxes of all users except the sender and skipped users.
+
+        Returns:
+            Number of inboxes the message was stored in.
+        """
+        return self.db.broadcast_message(
+            sender, message, skip, config.server.BROADCAST_BATCH_SIZE, config.server.BROADCAST_PAUSE
+        )
+
+    def get_account_type(self, login):
+        return self.db.get_account_type(login)
+
+    def admin_exists(self):
+        """Check if at least one user has an admin account."""
+        return self.db.check_account_type_in_db("admin")
+
+    def create_group(self, name, owner):
+        return self.db.create_group(name, owner)
+
+    def add_group_member(self, name, login):
+        return self.db.add_group_member(name, login)
+
+    def remove_group_member(self, name, login):
+        return self.db.remove_group_member(name, login)
+
+    def get_group(self, name):
+        """Get a group with its owner and member usernames, or None if it does not exist."""
+        return self.db.get_group(name)
+
     def check_recv_inbox(self, login):
         """Check if a user's inbox has space for new messages.
 
@@ -479,3 +864,11 @@ class DbHelper:
         if inbox_size < config.database.MAX_INBOX_SIZE:
             return True
         return False
+
+    def get_pool_metrics(self):
+        """Get usage metrics of the database connection pool.
+
+        Returns:
+            Dictionary with connection pool metrics snapshot.
+        """
+        return self.db.CONNECTION_POOL.get_metrics()
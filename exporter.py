@@ -0,0 +1,153 @@
+"""Metrics exporter module for monitoring the server with Prometheus.
+
+This module provides a small HTTP endpoint, listening on its own port and
+served by its own threads, which renders server metrics in the Prometheus
+text exposition format at /metrics. Values are read from counters and
+histograms the server already keeps, while requests keep being handled:
+a scrape only briefly takes the metrics lock, which request threads take
+when they record for the first time, and never the connection pool lock.
+
+Usage:
+    CHAT_METRICS_PORT=9108 python main.py
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (pool counter key, metric name, metric type, description) of connection pool metrics
+POOL_METRICS = (
+    ("in_use", "chat_pool_connections_in_use", "gauge", "Database connections checked out."),
+    ("idle", "chat_pool_connections_idle", "gauge", "Open database connections waiting in the pool."),
+    ("waiting", "chat_pool_waiting_threads", "gauge", "Threads waiting for a database connection."),
+    ("max_connections", "chat_pool_max_connections", "gauge", "Maximum number of database connections."),
+    ("checkouts", "chat_pool_checkouts_total", "counter", "Database connections checked out."),
+    ("checkout_timeouts", "chat_pool_checkout_timeouts_total", "counter", "Checkouts given up after the timeout."),
+    ("connections_created", "chat_pool_connections_created_total", "counter", "Database connections opened."),
+    ("connections_closed", "chat_pool_connections_closed_total", "counter", "Database connections closed."),
+    ("failure_closes", "chat_pool_failure_closes_total", "counter", "Database connections closed after errors."),
+)
+
+
+def format_labels(labels: dict) -> str:
+    """Format metric labels, escaping characters Prometheus treats specially."""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsWriter:
+    """Collects metric families and renders them in the text exposition format."""
+
+    def __init__(self):
+        self.lines = []
+        self.families = set()
+
+    def family(self, name: str, metric_type: str, description: str):
+        """Write HELP and TYPE lines of a metric family, once per family."""
+        if name in self.families:
+            return
+        self.families.add(name)
+        self.lines.append(f"# HELP {name} {description}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def sample(self, name: str, value, labels: dict | None = None):
+        self.lines.append(f"{name}{format_labels(labels)} {value}")
+
+    def histogram(self, name: str, snapshot: dict, labels: dict | None = None):
+        """Write buckets, sum and count of a Histogram snapshot."""
+        labels = labels or {}
+        for bound, cumulative in snapshot["buckets"].items():
+            self.sample(f"{name}_bucket", cumulative, {**labels, "le": bound})
+        self.sample(f"{name}_bucket", snapshot["count"], {**labels, "le": "+Inf"})
+        self.sample(f"{name}_sum", snapshot["sum"], labels)
+        self.sample(f"{name}_count", snapshot["count"], labels)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(server) -> str:
+    """Render metrics of a running server.
+
+    Args:
+        server: The Server to report on.
+
+    Returns:
+        Metrics in the Prometheus text exposition format.
+    """
+    writer = MetricsWriter()
+    totals = server.metrics.collect()
+
+    writer.family("chat_uptime_seconds", "gauge", "Seconds since the server started.")
+    writer.sample("chat_uptime_seconds", time.monotonic() - server.metrics.start_time)
+
+    writer.family("chat_request_duration_seconds", "histogram", "Time spent handling requests, by header.")
+    for header, histogram in sorted(totals.requests.items()):
+        writer.histogram("chat_request_duration_seconds", histogram.snapshot(), {"header": header})
+
+    writer.family("chat_argon2_duration_seconds", "histogram", "Time spent hashing and verifying passwords.")
+    writer.histogram("chat_argon2_duration_seconds", totals.hashes.snapshot())
+    writer.family("chat_argon2_in_progress", "gauge", "Password hashes being computed.")
+    writer.sample("chat_argon2_in_progress", totals.hashes_started - totals.hashes.count)
+
+    # Sizes of collections are read without their locks, which is safe for a single len()
+    writer.family("chat_connections_active", "gauge", "Connected clients.")
+    writer.sample("chat_connections_active", len(server.client_sessions))
+    writer.family("chat_signed_in_users", "gauge", "Users signed in on at least one connection.")
+    writer.sample("chat_signed_in_users", server.sessions.online_count())
+
+    pool = server.db_helper.db.CONNECTION_POOL.get_counters()
+    for key, name, metric_type, description in POOL_METRICS:
+        writer.family(name, metric_type, description)
+        writer.sample(name, pool[key])
+    writer.family("chat_pool_wait_seconds", "histogram", "Time waited for a database connection.")
+    writer.histogram("chat_pool_wait_seconds", pool["wait_time"])
+    writer.family("chat_pool_hold_seconds", "histogram", "Time database connections were held.")
+    writer.histogram("chat_pool_hold_seconds", pool["hold_time"])
+
+    return writer.render()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves rendered metrics at /metrics."""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics(self.server.chat_server).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the server output
+        pass
+
+
+def start_exporter(chat_server, host: str, port: int) -> ThreadingHTTPServer:
+    """Start serving metrics of a server in a background thread.
+
+    Args:
+        chat_server: The Server to report on.
+        host: Address to listen on.
+        port: Port to listen on, 0 picks a free one.
+
+    Returns:
+        The running HTTP server, stopped with its shutdown() method.
+    """
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpd.daemon_threads = True
+    httpd.chat_server = chat_server
+    threading.Thread(target=httpd.serve_forever, name="MetricsExporter", daemon=True).start()
+    print(f"Metrics available at http://{host}:{httpd.server_address[1]}/metrics")
+    return httpd
@@ -0,0 +1,319 @@
+"""Load generator for capacity planning against a running server.
+
+This module opens many real protocol connections, one per simulated user,
+and drives a weighted mix of register, login, send and inbox requests at a
+target aggregate rate. At the end it reports throughput, error rates and
+latency percentiles per operation.
+
+Load is open-loop: requests are sent on a fixed arrival schedule, whether
+or not earlier ones were answered, and latency is measured from the time a
+request was due. A slow server therefore cannot lower the offered rate,
+and time requests spend queued behind slow replies shows in the results.
+
+Simulated users are stored in the server database like real ones, so it
+should be pointed at a server with a disposable database. All users
+connect from one address, which the server per-address rate limits
+(config.security.ADDRESS_RATE_LIMITS) would throttle like a single abusive
+client, so the server is started with the generator address exempt.
+
+Usage:
+    CHAT_RATE_LIMIT_EXEMPT=127.0.0.1 python main.py
+    python loadgen.py --users 1000 --rate 500 --duration 60 \\
+        --mix register=1,login=2,send=5,inbox=2
+"""
+
+import argparse
+import asyncio
+import random
+import secrets
+import time
+from async_client import AsyncClient
+from metrics import Histogram
+from config import config
+
+OPERATIONS = ("register", "login", "send", "inbox")
+DEFAULT_MIX = "register=1,login=2,send=5,inbox=2"
+PASSWORD = "loadgen-password"
+
+
+def parse_mix(text: str) -> dict:
+    """Parse operation weights given as comma separated name=weight pairs.
+
+    Args:
+        text: Mix description, e.g. "login=1,send=4".
+
+    Returns:
+        Dictionary of operation name to weight, operations left out have weight 0.
+
+    Raises:
+        ValueError: If an operation is unknown, a weight is negative or all weights are 0.
+    """
+    mix = dict.fromkeys(OPERATIONS, 0.0)
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in mix:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name] = float(weight)
+        if mix[name] < 0:
+            raise ValueError(f"Weight of {name} cannot be negative")
+    if not any(mix.values()):
+        raise ValueError("At least one operation needs a positive weight")
+    return mix
+
+
+class LoadStats:
+    """Latency histograms and error counts of operations, by operation name."""
+
+    def __init__(self):
+        self.latency = {operation: Histogram() for operation in OPERATIONS}
+        self.errors = dict.fromkeys(OPERATIONS, 0)
+
+    def record(self, operation: str, seconds: float, success: bool):
+        """Record a finished operation.
+
+        Args:
+            operation: Name of the operation.
+            seconds: Time from the operation being due to receiving its last reply.
+            success: Whether the server handled the operation successfully.
+        """
+        self.latency[operation].observe(seconds)
+        if not success:
+            self.errors[operation] += 1
+
+    def report(self, elapsed: float) -> str:
+        """Format results as a table.
+
+        Args:
+            elapsed: Duration of the measured run, in seconds.
+
+        Returns:
+            Multi-line report with count, throughput, error rate and latency percentiles per operation.
+        """
+        lines = [
+            f"{'operation':<10}{'count':>8}{'ops/s':>10}{'errors':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        ]
+        total_count = 0
+        total_errors = 0
+        for operation in OPERATIONS:
+            snapshot = self.latency[operation].snapshot()
+            count = snapshot["count"]
+            if not count:
+                continue
+            total_count += count
+            total_errors += self.errors[operation]
+            lines.append(
+                f"{operation:<10}{count:>8}{count / elapsed:>10.1f}"
+                f"{self.errors[operation] / count:>8.1%} "
+                f"{snapshot['p50'] * 1000:>8.1f}{snapshot['p95'] * 1000:>9.1f}"
+                f"{snapshot['p99'] * 1000:>9.1f}{snapshot['max'] * 1000:>9.1f}"
+            )
+        error_rate = total_errors / total_count if total_count else 0.0
+        lines.append(
+            f"Total: {total_count} operations in {elapsed:.1f}s, "
+            f"{total_count / elapsed:.1f} ops/s, {error_rate:.1%} errors"
+        )
+        return "\n".join(lines)
+
+
+class SimulatedUser:
+    """A user with its own connection, sending requests of the generator mix."""
+
+    def __init__(self, generator, name: str):
+        self.generator = generator
+        self.name = name
+        self.client = AsyncClient(generator.host, generator.port, reconnect=False)
+        # Register and login change the user signed in on the shared connection,
+        # so one of them must finish before the other starts
+        self.identity_lock = asyncio.Lock()
+
+    async def start(self):
+        """Connect and register the user, before measurements start.
+
+        Raises:
+            ValueError: If the user could not be registered.
+        """
+        await self.client.connect()
+        if not await self.register(self.name):
+            raise ValueError("registration failed")
+
+    async def run(self, start: float, until: float, rate: float):
+        """Send requests at random intervals averaging the per user rate until the deadline.
+
+        Requests are pipelined on the user connection, each one is sent when
+        it is due without waiting for replies to earlier ones. Requests still
+        in flight at the deadline are awaited.
+        """
+        operations = [operation for operation in OPERATIONS if self.generator.mix[operation]]
+        weights = [self.generator.mix[operation] for operation in operations]
+        in_flight = set()
+        scheduled = start
+        while True:
+            # Exponential gaps make arrivals a Poisson process, like independent real users
+            scheduled += random.expovariate(rate)
+            if scheduled >= until:
+                break
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            operation = random.choices(operations, weights)[0]
+            task = asyncio.create_task(self.generator.timed(operation, getattr(self, operation)(), scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    async def close(self):
+        await self.client.close()
+
+    async def register(self, name: str | None = None) -> bool:
+        """Register a new user and set its account type, continuing as the new user."""
+        name = name or self.generator.new_username()
+        async with self.identity_lock:
+            answer = await self.client.authenticate(name, PASSWORD)
+            if answer["is_registered"] or not answer["login_successfull"]:
+                return False
+            if not await self.client.set_account_type(name, PASSWORD, "user"):
+                return False
+            self.name = name
+        self.generator.usernames.append(name)
+        return True
+
+    async def login(self) -> bool:
+        async with self.identity_lock:
+            answer = await self.client.authenticate(self.name, PASSWORD)
+        return answer["login_successfull"]
+
+    async def send(self) -> bool:
+        receiver = random.choice(self.generator.usernames)
+        reply = await self.client.send_message(receiver, "Load test message")
+        return reply.header == "Status" and bool(reply.text)
+
+    async def inbox(self) -> bool:
+        reply = await self.client.command("inbox")
+        return reply.header == "Inbox_message" or reply.text == "Inbox empty"
+
+
+class LoadGenerator:
+    """Drives simulated users against a server and collects their results.
+
+    Users are connected and registered first, with a bounded number of
+    connection attempts in flight, then all of them send requests until
+    the run duration passes.
+    """
+
+    def __init__(
+        self,
+        host: str = config.network.HOST,
+        port: int = config.network.PORT,
+        users: int = 100,
+        rate: float = 100.0,
+        duration: float = 30.0,
+        mix: dict | None = None,
+        connect_concurrency: int = 50,
+    ):
+        self.host = host
+        self.port = port
+        self.users = users
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix or parse_mix(DEFAULT_MIX)
+        self.connect_concurrency = connect_concurrency
+        # Short random prefix keeps usernames of separate runs apart
+        self.run_id = secrets.token_hex(2)
+        self.registered = 0
+        self.usernames = []
+        self.stats = LoadStats()
+
+    def new_username(self) -> str:
+        self.registered += 1
+        return f"lg{self.run_id}u{self.registered}"
+
+    async def timed(self, operation: str, request, scheduled: float | None = None) -> bool:
+        """Await an operation coroutine, recording its latency and outcome.
+
+        Args:
+            operation: Name of the operation.
+            request: Coroutine performing the operation.
+            scheduled: time.monotonic() time the operation was due, latency is measured
+                from it instead of from now if given.
+
+        Returns:
+            True if the server handled the operation successfully.
+        """
+        start = time.monotonic() if scheduled is None else scheduled
+        try:
+            success = await request
+        except (ConnectionError, OSError, ValueError):
+            success = False
+        self.stats.record(operation, time.monotonic() - start, success)
+        return success
+
+    async def run(self) -> tuple[LoadStats, float]:
+        """Connect all users, generate load for the configured duration and disconnect them.
+
+        Returns:
+            Tuple of (collected statistics, measured duration in seconds).
+        """
+        semaphore = asyncio.Semaphore(self.connect_concurrency)
+        users = [SimulatedUser(self, self.new_username()) for _ in range(self.users)]
+
+        async def start_user(user):
+            async with semaphore:
+                try:
+                    await user.start()
+                    return user
+                except (ConnectionError, OSError, ValueError) as e:
+                    print(f"[ERROR] User {user.name} could not start: {e}")
+                    await user.close()
+                    return None
+
+        start = time.monotonic()
+        connected = [user for user in await asyncio.gather(*map(start_user, users)) if user]
+        print(f"Connected {len(connected)} of {self.users} users in {time.monotonic() - start:.1f}s")
+        if not connected:
+            return self.stats, 0.0
+
+        start = time.monotonic()
+        until = start + self.duration
+        per_user_rate = self.rate / len(connected)
+        await asyncio.gather(*(user.run(start, until, per_user_rate) for user in connected))
+        elapsed = time.monotonic() - start
+
+        await asyncio.gather(*(user.close() for user in connected))
+        return self.stats, elapsed
+
+
+def main(argv=None):
+    """Parse command line arguments, run the load and print the report."""
+    parser = argparse.ArgumentParser(
+        description="Generate load against a running chat server.",
+        epilog="Start the server with CHAT_RATE_LIMIT_EXEMPT set to the address of this generator, "
+        "e.g. CHAT_RATE_LIMIT_EXEMPT=127.0.0.1, otherwise per-address rate limits reject most requests.",
+    )
+    parser.add_argument("--host", default=config.network.HOST)
+    parser.add_argument("--port", type=int, default=config.network.PORT)
+    parser.add_argument("--users", type=int, default=100, help="number of simulated users, one connection each")
+    parser.add_argument("--rate", type=float, default=100.0, help="target requests per second for all users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after users connected")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. login=1,send=4")
+    parser.add_argument(
+        "--connect-concurrency", type=int, default=50, help="connection attempts in flight while starting users"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    generator = LoadGenerator(
+        args.host, args.port, args.users, args.rate, args.duration, mix, args.connect_concurrency
+    )
+    stats, elapsed = asyncio.run(generator.run())
+    if elapsed:
+        print(stats.report(elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,10 @@ This module starts the server and handles the main application flow.
 """
 
 import pathlib
+import signal
 
 from server import Server
+from exporter import start_exporter
 from config import config
 
 PATH = pathlib.Path.cwd() / config.database.DB_FILE
@@ -14,7 +16,14 @@ PATH = pathlib.Path.cwd() / config.database.DB_FILE
 def main():
     """Start the server application."""
     server = Server()
+    # Rolling restarts stop the server with SIGTERM, clients are drained before it exits
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.request_stop())
+    exporter = None
+    if config.server.METRICS_PORT:
+        exporter = start_exporter(server, config.server.METRICS_HOST, config.server.METRICS_PORT)
     server.start_server()
+    if exporter is not None:
+        exporter.shutdown()
 
 
 if __name__ == "__main__":
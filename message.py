@@ -1,11 +1,24 @@
 """Message handling module for client-server communication.
 
 This module provides Message and ErrorMessage classes for encoding,
-decoding, and managing messages exchanged between client and server.
+decoding, and managing messages exchanged between client and server,
+together with the JSON codec used on the wire.
+JSON is handled by orjson when it is installed, otherwise by the standard library.
 """
 
 import json
 from datetime import datetime
+from config import config
+
+try:
+    import orjson  # pip install orjson (optional, faster JSON backend)
+except ImportError:
+    orjson = None
+
+
+# Errors codecs raise on malformed input, e.g. a JSON array instead of an object,
+# missing fields or too deeply nested values
+DECODE_ERRORS = (ValueError, TypeError, KeyError, IndexError, OverflowError, RecursionError)
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -20,13 +33,122 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+class StdlibJsonSerializer:
+    """JSON serializer built on the standard library json module."""
+
+    name = "json"
+
+    def __init__(self):
+        # A single encoder instance avoids creating one on every dumps call
+        self.encoder = DateTimeEncoder()
+
+    def dumps(self, obj) -> bytes:
+        return self.encoder.encode(obj).encode("utf-8")
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    """JSON serializer built on orjson, which writes UTF-8 bytes directly.
+
+    Datetimes are serialized natively to the same ISO format the standard
+    library encoder produces.
+    """
+
+    name = "orjson"
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+def get_json_serializer(backend: str = "auto"):
+    """Create a JSON serializer for the requested backend.
+
+    Args:
+        backend: "orjson", "json" or "auto" to pick the fastest installed one.
+
+    Returns:
+        Serializer object with dumps() returning bytes and loads() accepting bytes.
+
+    Raises:
+        ValueError: If the requested backend is unknown or not installed.
+    """
+    if backend == "auto":
+        backend = "orjson" if orjson is not None else "json"
+    if backend == "orjson":
+        if orjson is None:
+            raise ValueError("JSON backend 'orjson' is not installed")
+        return OrjsonSerializer()
+    if backend == "json":
+        return StdlibJsonSerializer()
+    raise ValueError(f"Unknown JSON backend: {backend}")
+
+
+class JsonCodec:
+    """Encodes message fields as a JSON object with named fields."""
+
+    def __init__(self, serializer=None):
+        self.serializer = serializer or get_json_serializer(config.message.JSON_BACKEND)
+
+    def encode(self, header, text, sender, receiver) -> bytes:
+        text_message = {
+            "Header": header,
+            "Message": text,
+            "Sender": sender,
+            "Receiver": receiver,
+        }
+        return self.serializer.dumps(text_message)
+
+    def encode_value(self, value) -> bytes:
+        return self.serializer.dumps(value)
+
+    def decode(self, data) -> tuple:
+        text_message = self.serializer.loads(data)
+        return (
+            text_message["Header"],
+            text_message["Message"],
+            text_message["Sender"],
+            text_message["Receiver"],
+        )
+
+
+# Codecs by wire format name
+CODECS = {
+    "json": JsonCodec(),
+}
+
+
+def negotiate_format(offered_formats) -> str:
+    """Pick the most preferred wire format supported by both peers.
+
+    Args:
+        offered_formats: Wire format names supported by the peer.
+
+    Returns:
+        Name of the agreed wire format, JSON if there is no better match.
+    """
+    for wire_format in config.message.WIRE_FORMATS:
+        if wire_format in offered_formats and wire_format in CODECS:
+            return wire_format
+    return "json"
+
+
 class Message:
     """Represents a message for client-server communication.
 
     Handles encoding and decoding of messages to/from JSON format
-    for transmission over socket connections.
+    for transmission over socket connections. Messages are slot-based
+    records, as one is created for every request and reply.
     """
 
+    __slots__ = ("header", "text", "sender", "receiver")
+
     def __init__(self, header=None, text=None, sender=None, receiver=None):
         """Initialize a message with optional parameters.
 
@@ -41,41 +163,81 @@ class Message:
         self.sender = sender
         self.receiver = receiver
 
-    def encode_message(self) -> bytes:
-        """Encode the message to JSON bytes for transmission.
+    def encode_message(self, wire_format: str = "json") -> bytes:
+        """Encode the message to bytes for transmission.
+
+        Args:
+            wire_format: Name of the codec to use, see CODECS.
 
         Returns:
-            UTF-8 encoded JSON bytes representing the message.
+            Bytes representing the message in the requested wire format.
         """
-        text_message = {
-            "Header": self.header,
-            "Message": self.text,
-            "Sender": self.sender,
-            "Receiver": self.receiver,
-        }
-        json_message = json.dumps(text_message, cls=DateTimeEncoder).encode("utf-8")
-        return json_message
+        return CODECS[wire_format].encode(self.header, self.text, self.sender, self.receiver)
 
-    def decode_message(self, json_text) -> bool:
-        """Decode a JSON message and populate message attributes.
+    def decode_message(self, json_text, wire_format: str = "json") -> bool:
+        """Decode an encoded message and populate message attributes.
 
         Args:
-            json_text: JSON string to decode into message components.
+            json_text: JSON string, or encoded bytes/memoryview frame payload to decode
+                       into message components.
+            wire_format: Name of the codec the message was encoded with.
 
         Returns:
-            1 for successful decoding, or error tuple for JSON decode errors.
+            True for successful decoding, False for malformed input of any kind.
         """
         try:
-            text_message = json.loads(json_text)
-            self.header = text_message["Header"]
-            self.text = text_message["Message"]
-            self.sender = text_message["Sender"]
-            self.receiver = text_message["Receiver"]
-
+            self.header, self.text, self.sender, self.receiver = CODECS[wire_format].decode(
+                json_text
+            )
             return True
         except json.JSONDecodeError:
             print("[JSON ERROR]: Invalid JSON format.")
             return False
+        except DECODE_ERRORS as e:
+            print(f"[DECODE ERROR]: Invalid {wire_format} message: {e!r}")
+            return False
+
+
+class PreEncodedMessage(Message):
+    """Message encoded from cached templates, patched only with its receiver.
+
+    Templates hold the encoded bytes before and after the receiver field for
+    each wire format. They are built once, on first use of a format, and
+    shared by every message created from the same template dictionary.
+    """
+
+    __slots__ = ("templates",)
+
+    # Placeholder marking where the receiver goes in the encoded message
+    RECEIVER_PLACEHOLDER = "\x00receiver\x00"
+
+    def __init__(self, header, text, sender, receiver, templates: dict):
+        super().__init__(header, text, sender, receiver)
+        self.templates = templates
+
+    def encode_message(self, wire_format: str = "json") -> bytes:
+        template = self.templates.get(wire_format)
+        if template is None:
+            template = self._build_template(wire_format)
+            self.templates[wire_format] = template
+        if not template:
+            return super().encode_message(wire_format)
+        prefix, suffix = template
+        return prefix + CODECS[wire_format].encode_value(self.receiver) + suffix
+
+    def _build_template(self, wire_format: str) -> tuple:
+        """Split the message encoded with a placeholder receiver into prefix and suffix.
+
+        Returns:
+            Tuple of (prefix, suffix), or an empty tuple if the placeholder
+            cannot be located unambiguously (the message is then encoded in full).
+        """
+        codec = CODECS[wire_format]
+        encoded = codec.encode(self.header, self.text, self.sender, self.RECEIVER_PLACEHOLDER)
+        parts = encoded.split(codec.encode_value(self.RECEIVER_PLACEHOLDER))
+        if len(parts) != 2:
+            return ()
+        return parts[0], parts[1]
 
 
 class ErrorMessage(Message):
@@ -85,11 +247,13 @@ class ErrorMessage(Message):
     with predefined header and no receiver.
     """
 
+    __slots__ = ()
+
     def __init__(self, text: str, sender: str):
         super().__init__(header="Error", text=text, sender=sender, receiver=None)
 
-    def encode_message(self) -> bytes:
-        return super().encode_message()
+    def encode_message(self, wire_format: str = "json") -> bytes:
+        return super().encode_message(wire_format)
 
-    def decode_message(self, json_text) -> tuple[str, str, str, str]:
-        return super().decode_message(json_text)
+    def decode_message(self, json_text, wire_format: str = "json") -> bool:
+        return super().decode_message(json_text, wire_format)
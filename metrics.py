@@ -0,0 +1,253 @@
+"""Metrics module with lightweight instrumentation primitives.
+
+This module provides a fixed-size histogram used to record latency-like
+values (in seconds) without keeping every sample in memory, and the
+ServerMetrics class collecting request and password hashing statistics of
+the server.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+class Histogram:
+    """Fixed-bucket histogram for durations measured in seconds.
+
+    Every observed value is counted in the first bucket whose upper bound
+    is not lower than the value, so memory use does not grow with the
+    number of samples. Percentiles are estimated as bucket upper bounds.
+    """
+
+    DEFAULT_BUCKETS = (
+        0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+        0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    )
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # Last slot counts values greater than the highest bucket bound
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """Record a single value in the histogram.
+
+        Args:
+            value: The observed value, in seconds.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        """Add observations of another histogram with the same buckets to this one.
+
+        The other histogram may keep recording meanwhile: its bucket counts are
+        copied in one step and the count is derived from the copy, so count and
+        buckets always agree.
+        """
+        counts = list(other.counts)
+        for index, bucket_count in enumerate(counts):
+            self.counts[index] += bucket_count
+        self.count += sum(counts)
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+
+    def percentile(self, percent: float) -> float:
+        """Estimate the value below which given percent of observations fall.
+
+        Args:
+            percent: Percentile to estimate, between 0 and 100.
+
+        Returns:
+            Upper bound of the bucket holding the percentile, or the maximum
+            observed value if it falls above the highest bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = percent / 100 * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        """Return a copy of histogram state, safe to use after recording continues.
+
+        Returns:
+            Dictionary with count, sum, mean, max, p50/p95/p99 estimates and
+            cumulative counts per bucket upper bound.
+        """
+        copy = Histogram(self.buckets)
+        copy.merge(self)
+        buckets = {}
+        cumulative = 0
+        for bound, bucket_count in zip(copy.buckets, copy.counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+
+        return {
+            "count": copy.count,
+            "sum": copy.total,
+            "mean": copy.total / copy.count if copy.count else 0.0,
+            "max": copy.max,
+            "p50": copy.percentile(50),
+            "p95": copy.percentile(95),
+            "p99": copy.percentile(99),
+            "buckets": buckets,
+        }
+
+
+class MetricsShard:
+    """Metrics recorded by a single thread, never written to by other threads."""
+
+    def __init__(self):
+        # header -> Histogram of handling times
+        self.requests = {}
+        self.hashes = Histogram()
+        self.hashes_started = 0
+
+    def merge(self, other: "MetricsShard"):
+        """Add metrics of another shard to this one."""
+        for header, histogram in list(other.requests.items()):
+            self.requests.setdefault(header, Histogram()).merge(histogram)
+        self.hashes.merge(other.hashes)
+        self.hashes_started += other.hashes_started
+
+
+class ServerMetrics:
+    """Request and password hashing statistics of a running server.
+
+    Every thread records into its own shard, so recording takes no lock
+    and threads serving clients never wait for each other or for readers.
+    Readers merge the shards. Shards of finished threads are folded into
+    a single retired shard, so their number follows the number of live
+    threads.
+    """
+
+    def __init__(self, rate_window: float = 10.0):
+        """Initialize empty metrics.
+
+        Args:
+            rate_window: Minimum number of seconds request rates are averaged over.
+        """
+        self.local = threading.local()
+        # Taken only when a thread records for the first time and by readers
+        self.lock = threading.Lock()
+        # (thread, shard) pairs of threads which recorded metrics
+        self.shards = []
+        self.retired = MetricsShard()
+        self.start_time = time.monotonic()
+        self.rate_window = rate_window
+        # Older and newer (time, request counts) points, rates are measured from the older one
+        self.rate_points = [(self.start_time, {}), (self.start_time, {})]
+
+    def record_request(self, header: str, seconds: float):
+        """Record a handled request.
+
+        Args:
+            header: Header of the request.
+            seconds: Time spent handling the request.
+        """
+        requests = self._shard().requests
+        histogram = requests.get(header)
+        if histogram is None:
+            histogram = requests[header] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def hashing(self):
+        """Context manager measuring a password hash or verification."""
+        shard = self._shard()
+        shard.hashes_started += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            shard.hashes.observe(time.perf_counter() - start)
+
+    def collect(self) -> MetricsShard:
+        """Merge metrics of all threads.
+
+        The lock is held only to read the retired shard and the list of live
+        shards, which keep recording while they are merged.
+
+        Returns:
+            A new shard with totals of everything recorded so far.
+        """
+        totals = MetricsShard()
+        with self.lock:
+            totals.merge(self.retired)
+            shards = [shard for _, shard in self.shards]
+        for shard in shards:
+            totals.merge(shard)
+        return totals
+
+    def snapshot(self) -> dict:
+        """Summarize recorded metrics.
+
+        Returns:
+            Dictionary with uptime in seconds, count, recent rate per second and
+            latency percentiles of requests by header, and count, latency
+            percentiles and number of in progress Argon2 hashes.
+        """
+        totals = self.collect()
+        now = time.monotonic()
+        counts = {header: histogram.count for header, histogram in totals.requests.items()}
+        with self.lock:
+            older, newer = self.rate_points
+            if now - newer[0] >= self.rate_window:
+                self.rate_points = [newer, (now, counts)]
+        since, older_counts = older
+        elapsed = now - since
+
+        requests = {}
+        for header, histogram in sorted(totals.requests.items()):
+            requests[header] = {
+                "count": histogram.count,
+                "rate": (histogram.count - older_counts.get(header, 0)) / elapsed if elapsed else 0.0,
+                **self._latency(histogram),
+            }
+        return {
+            "uptime": now - self.start_time,
+            "requests": requests,
+            "argon2": {
+                "count": totals.hashes.count,
+                "in_progress": totals.hashes_started - totals.hashes.count,
+                **self._latency(totals.hashes),
+            },
+        }
+
+    def _shard(self) -> MetricsShard:
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = MetricsShard()
+            with self.lock:
+                # Finished threads never record again, their shards can be merged safely
+                live = []
+                for thread, thread_shard in self.shards:
+                    if thread.is_alive():
+                        live.append((thread, thread_shard))
+                    else:
+                        self.retired.merge(thread_shard)
+                live.append((threading.current_thread(), shard))
+                self.shards = live
+        return shard
+
+    @staticmethod
+    def _latency(histogram: Histogram) -> dict:
+        return {
+            "p50": histogram.percentile(50),
+            "p95": histogram.percentile(95),
+            "p99": histogram.percentile(99),
+            "max": histogram.max,
+        }
@@ -0,0 +1,201 @@
+"""Protocol module for framing messages exchanged over sockets.
+
+Every message is sent as a frame: a 4-byte big-endian payload length,
+a 1-byte flags field describing how the payload is encoded, and the
+payload itself. Large payloads can be compressed, if both peers agreed
+on it during handshake. Peers sending bare JSON messages (without a frame
+header) are still understood, and are answered the same way.
+"""
+
+import struct
+import zlib
+from config import config
+
+FRAME_HEADER = struct.Struct("!IB")
+
+# Flags sent on the wire
+FLAG_COMPRESSED = 0x02
+
+# Local marker for bare JSON received from a peer that does not use frames,
+# never sent on the wire
+FLAG_LEGACY = 0x80
+
+# Bare JSON messages always start with an opening brace, which as the first
+# byte of a frame header would mean a payload far above MAX_FRAME_SIZE
+LEGACY_JSON_START = ord("{")
+
+
+class FrameError(Exception):
+    """Raised when a peer sends a frame which cannot be accepted"""
+
+
+def pack_frame(payload: bytes, flags: int = 0) -> bytes:
+    """Prepend frame header to an encoded message.
+
+    Args:
+        payload: The encoded message.
+        flags: Flags describing the payload encoding.
+
+    Returns:
+        Frame bytes ready to be sent, or the bare payload for legacy peers.
+    """
+    if flags & FLAG_LEGACY:
+        return payload
+    return FRAME_HEADER.pack(len(payload), flags) + payload
+
+
+def encode_frame(payload: bytes, flags: int = 0, compression: str | None = None) -> bytes:
+    """Build a frame, compressing payloads above the threshold if compression was agreed.
+
+    Args:
+        payload: The encoded message.
+        flags: Flags describing the payload encoding.
+        compression: Compression method agreed with the peer, or None.
+
+    Returns:
+        Frame bytes ready to be sent.
+    """
+    if (
+        compression == "zlib"
+        and not flags & FLAG_LEGACY
+        and len(payload) >= config.network.COMPRESSION_THRESHOLD
+    ):
+        compressed = zlib.compress(payload, config.network.COMPRESSION_LEVEL)
+        # Already compact payloads are sent as they are
+        if len(compressed) < len(payload):
+            return pack_frame(compressed, flags | FLAG_COMPRESSED)
+    return pack_frame(payload, flags)
+
+
+def decode_payload(flags: int, payload):
+    """Get the encoded message from a frame payload, decompressing it if required.
+
+    Args:
+        flags: Flags of the received frame.
+        payload: Payload of the received frame.
+
+    Returns:
+        The encoded message.
+
+    Raises:
+        FrameError: If the payload cannot be decompressed, is truncated or inflates past
+            the maximum frame size.
+    """
+    if not flags & FLAG_COMPRESSED:
+        return payload
+    decompressor = zlib.decompressobj()
+    try:
+        message = decompressor.decompress(payload, config.network.MAX_FRAME_SIZE)
+    except zlib.error as e:
+        raise FrameError(f"Invalid compressed frame: {e}")
+    if decompressor.unconsumed_tail:
+        raise FrameError("Decompressed frame exceeds maximum frame size")
+    if not decompressor.eof:
+        raise FrameError("Truncated compressed frame")
+    if decompressor.unused_data:
+        raise FrameError("Unexpected trailing bytes in compressed frame")
+    return message
+
+
+def negotiate_compression(offered_methods) -> str | None:
+    """Pick a compression method supported by both peers.
+
+    Args:
+        offered_methods: Compression method names supported by the peer.
+
+    Returns:
+        Name of the agreed compression method, or None to send frames uncompressed.
+    """
+    for method in config.network.COMPRESSION_METHODS:
+        if method in offered_methods:
+            return method
+    return None
+
+
+class FrameReader:
+    """Reads complete frames from a socket-like object into a reusable buffer.
+
+    Bytes are received straight into a preallocated buffer with recv_into,
+    and frames are returned as memoryview slices of that buffer, so reading
+    a frame does not allocate new bytes objects. A returned payload is only
+    valid until the next read_frame call. Bytes received past the end of a
+    frame are kept for the next read.
+    """
+
+    def __init__(self, sock, buffer_size: int = config.network.BUFFER_SIZE):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        # Unread bytes are kept in buffer[start:end]
+        self.start = 0
+        self.end = 0
+
+    def read_frame(self) -> tuple[int, memoryview] | None:
+        """Read the next frame from the socket.
+
+        Returns:
+            Tuple of (flags, payload), or None if the peer closed the connection.
+
+        Raises:
+            FrameError: If the announced frame size exceeds the allowed maximum.
+        """
+        if self.start == self.end:
+            self.start = self.end = 0
+            if not self._receive():
+                return None
+            if self.buffer[0] == LEGACY_JSON_START:
+                # Bare JSON peers send one message per packet
+                payload = self.view[:self.end]
+                self.start = self.end
+                return FLAG_LEGACY, payload
+
+        if not self._fill(FRAME_HEADER.size):
+            return None
+        length, flags = FRAME_HEADER.unpack_from(self.buffer, self.start)
+        if length > config.network.MAX_FRAME_SIZE:
+            raise FrameError(f"Frame of {length} bytes exceeds maximum frame size")
+
+        frame_size = FRAME_HEADER.size + length
+        if not self._fill(frame_size):
+            return None
+        payload = self.view[self.start + FRAME_HEADER.size:self.start + frame_size]
+        self.start += frame_size
+        return flags, payload
+
+    def _fill(self, size: int) -> bool:
+        """Receive until at least size unread bytes are buffered, returning False on end of stream."""
+        while self.end - self.start < size:
+            if self.start + size > len(self.buffer):
+                self._make_room(size)
+            if not self._receive():
+                return False
+        return True
+
+    def _make_room(self, size: int):
+        """Move unread bytes to the buffer start, growing the buffer if a frame does not fit."""
+        unread = self.end - self.start
+        if size > len(self.buffer):
+            # Payloads returned earlier keep pointing at the old buffer
+            new_buffer = bytearray(max(size, 2 * len(self.buffer)))
+            new_buffer[:unread] = self.view[self.start:self.end]
+            self.buffer = new_buffer
+            self.view = memoryview(new_buffer)
+        else:
+            self.buffer[:unread] = self.buffer[self.start:self.end]
+        self.start = 0
+        self.end = unread
+
+    def _receive(self) -> bool:
+        """Receive available bytes into the free part of the buffer, returning False on end of stream."""
+        free_space = self.view[self.end:]
+        if hasattr(self.sock, "recv_into"):
+            received = self.sock.recv_into(free_space)
+        else:
+            # Socket-like objects without recv_into, e.g. test doubles
+            chunk = self.sock.recv(len(free_space))
+            received = len(chunk)
+            free_space[:received] = chunk
+        if not received:
+            return False
+        self.end += received
+        return True
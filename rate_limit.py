@@ -0,0 +1,91 @@
+"""Rate limiting module protecting the server from abusive clients.
+
+This module provides the RateLimiter class, keeping a token bucket per
+client identity and message header. Buckets refill continuously at a fixed
+rate up to their capacity, every request takes one token, and requests
+finding their bucket empty are rejected. Only a bucket's token count and
+last refill time are stored, and the least recently used buckets are
+evicted once their number reaches a limit.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Thread-safe token bucket rate limiter.
+
+    Limits are set per message header, headers without a limit are never
+    throttled. Identities, e.g. usernames or source addresses, each get
+    their own bucket for every limited header.
+    """
+
+    def __init__(self, limits, max_buckets: int = 100000):
+        """Initialize the limiter.
+
+        Args:
+            limits: Iterable of (header, rate, burst) tuples, where rate is the number of
+                requests per second and burst the number of requests allowed at once.
+            max_buckets: Maximum number of buckets kept in memory.
+        """
+        self.limits = {header: (rate, burst) for header, rate, burst in limits}
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+        # (identity, header) -> [tokens, updated_at], least recently used first
+        self.buckets = OrderedDict()
+
+    def allow(self, identity, header: str) -> bool:
+        """Take a token from the bucket of an identity for a header.
+
+        Args:
+            identity: Client the request is counted for.
+            header: Header of the request.
+
+        Returns:
+            True if the request is within the limit, False if it should be rejected.
+        """
+        limit = self.limits.get(header)
+        if limit is None:
+            return True
+        rate, burst = limit
+        key = (identity, header)
+        now = time.monotonic()
+
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                # Evicted buckets were idle the longest, so they are most likely full again
+                if len(self.buckets) >= self.max_buckets:
+                    self.buckets.popitem(last=False)
+                bucket = self.buckets[key] = [float(burst), now]
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def delay(self, identity, header: str) -> float:
+        """Get the time until a request of an identity for a header is allowed, without taking a token.
+
+        Args:
+            identity: Client the request would be counted for.
+            header: Header of the request.
+
+        Returns:
+            Seconds until the bucket holds a token, 0.0 if a request is allowed now.
+        """
+        limit = self.limits.get(header)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        with self.lock:
+            bucket = self.buckets.get((identity, header))
+            if bucket is None:
+                return 0.0
+            tokens = min(burst, bucket[0] + (time.monotonic() - bucket[1]) * rate)
+        return max(0.0, (1 - tokens) / rate)
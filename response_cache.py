@@ -0,0 +1,51 @@
+"""Response cache module for replies which rarely change.
+
+This module provides the ResponseCache class that keeps replies to static
+commands pre-encoded, so answering them only patches the receiver field
+instead of building and serializing the whole message again.
+"""
+
+import time
+from message import PreEncodedMessage
+
+
+class ResponseCache:
+    """Cache of pre-encoded replies, keyed by name.
+
+    Entries without a time-to-live stay valid for the server lifetime,
+    entries with one are rebuilt once they expire.
+    """
+
+    def __init__(self):
+        # key -> (expires_at, header, text, sender, templates)
+        self.entries = {}
+
+    def get(self, key: str, receiver, build, ttl: float | None = None) -> PreEncodedMessage:
+        """Get a cached reply for the receiver, building it if missing or expired.
+
+        Args:
+            key: Name of the cached reply.
+            receiver: Receiver of this copy of the reply.
+            build: Function returning the Message to cache, called on cache miss.
+            ttl: Number of seconds the reply stays valid, None to never expire.
+
+        Returns:
+            A PreEncodedMessage sharing encoded templates with other copies of the reply.
+        """
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is None or (entry[0] is not None and entry[0] <= now):
+            message = build()
+            expires_at = now + ttl if ttl is not None else None
+            entry = (expires_at, message.header, message.text, message.sender, {})
+            self.entries[key] = entry
+
+        _, header, text, sender, templates = entry
+        return PreEncodedMessage(header, text, sender, receiver, templates)
+
+    def invalidate(self, key: str | None = None):
+        """Drop a single cached reply, or all of them if no key is given."""
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
@@ -6,12 +6,28 @@ for user management and message storage.
 """
 
 import errno
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from argon2 import PasswordHasher  # pip install argon2-cffi
 from argon2.exceptions import VerifyMismatchError
-from message import Message
-from datetime import datetime
+from message import Message, negotiate_format
+from datetime import datetime, timezone
 from connection import Connection
+from protocol import (
+    FrameReader,
+    FrameError,
+    decode_payload,
+    negotiate_compression,
+    FLAG_LEGACY,
+)
 from db import DbHelper
+from response_cache import ResponseCache
+from validation import validate_message, SCHEMAS
+from metrics import ServerMetrics
+from session_tokens import SessionTokens
+from rate_limit import RateLimiter
+from sessions import ClientSession, OutboundQueueFull, SessionRegistry, IdleReaper
 from config import config
 
 
@@ -29,63 +45,238 @@ class Server:
         self.db_helper = DbHelper()
         self.server_host = config.network.HOST
         self.server_port = config.network.PORT
+        # Replies to static commands, pre-encoded once per wire format
+        self.response_cache = ResponseCache()
+        self.session_tokens = SessionTokens()
+        # Signed in users with live connections, messages to them are pushed
+        self.sessions = SessionRegistry()
+        self.push_executor = ThreadPoolExecutor(max_workers=config.server.PUSH_WORKERS)
+        # Closes connections of clients silent for longer than the connection timeout
+        self.reaper = IdleReaper(config.network.CONNECTION_TIMEOUT, config.network.REAPER_TICK)
+        # Request and password hashing statistics, reported by the stats command
+        self.metrics = ServerMetrics(config.server.STATS_RATE_WINDOW)
+        # Set to stop accepting clients and drain the connected ones
+        self.stopping = threading.Event()
+        self.clients_lock = threading.Lock()
+        self.client_threads = set()
+        self.client_sessions = set()
+        # Over-limit requests are rejected before reaching handlers
+        self.user_limiter = RateLimiter(config.security.USER_RATE_LIMITS, config.security.RATE_LIMIT_MAX_BUCKETS)
+        self.address_limiter = RateLimiter(
+            config.security.ADDRESS_RATE_LIMITS, config.security.RATE_LIMIT_MAX_BUCKETS
+        )
+        self.rate_limit_exempt = frozenset(config.security.RATE_LIMIT_EXEMPT_ADDRESSES)
+        # Failed sign ins by login, slowing down later sign ins to the login once used up
+        self.login_failures = RateLimiter(
+            [("Authentication", *config.security.LOGIN_FAILURE_LIMIT)], config.security.RATE_LIMIT_MAX_BUCKETS
+        )
 
     def start_server(self):
         """Start the server and listen for client connections.
 
-        Creates socket connection, binds to address, and handles
-        incoming client connections and messages.
+        Creates socket connection, binds to address, and serves every
+        accepted client in its own thread. Once a stop is requested, new
+        connections are refused and connected clients are drained.
         """
         connection = Connection()
         with connection.create_connection(is_server=True) as s:
             s.bind((self.server_host, self.server_port))
-            s.listen(config.network.MAX_CONNECTIONS)
+            s.listen(config.network.LISTEN_BACKLOG)
+            # Waiting for clients wakes up regularly to notice a requested stop
+            s.settimeout(config.server.ACCEPT_POLL_INTERVAL)
+            threading.Thread(target=self.reaper.run, daemon=True).start()
             print("Server online")
 
-            conn, addr = s.accept()
-            with conn:
-                print(f"Client connected: {addr}")
+            while not self.stopping.is_set():
+                try:
+                    conn, addr = s.accept()
+                except TimeoutError:
+                    continue
+                connection.set_keepalive(conn)
+                client_thread = threading.Thread(
+                    target=self.handle_client, args=(conn, addr, connection), daemon=True
+                )
+                with self.clients_lock:
+                    self.client_threads.add(client_thread)
+                client_thread.start()
+
+        self.drain(config.server.SHUTDOWN_DEADLINE)
+
+    def request_stop(self):
+        """Ask the server to stop, safe to call from signal handlers and client threads."""
+        self.stopping.set()
+
+    def drain(self, deadline: float):
+        """Finish serving connected clients and release server resources.
+
+        Clients are told the server is stopping and get the reply to the
+        request in progress, then their connections are closed once queued
+        replies and pushes are sent. Database work in progress finishes in
+        the threads serving the clients, so the connection pool is closed
+        after them; connections still checked out by clients disconnected
+        at the deadline are closed when they are returned. Pushes still
+        queued at the deadline are cancelled.
+
+        Args:
+            deadline: Seconds after which clients still connected are disconnected.
+        """
+        end = time.monotonic() + deadline
+        self.stopping.set()
+        print("Server stopping")
+        with self.clients_lock:
+            sessions = list(self.client_sessions)
+            threads = list(self.client_threads)
+
+        notice = Message("Shutdown", {"retry_after": config.server.RECONNECT_WINDOW}, self.server_host, None)
+        for session in sessions:
+            if not session.legacy:
+                try:
+                    session.send(notice)
+                except OSError:
+                    pass
+            session.stop_reading()
+
+        for thread in threads:
+            thread.join(max(0.0, end - time.monotonic()))
+        with self.clients_lock:
+            remaining = list(self.client_sessions)
+        for session in remaining:
+            print(f"[ERROR] Disconnecting client after shutdown deadline: {session.addr}")
+            session.disconnect()
+
+        self.push_executor.shutdown(wait=False, cancel_futures=True)
+        self.db_helper.db.CONNECTION_POOL.close()
+        print("Server stopped")
+
+    def handle_client(self, conn, addr, connection: Connection):
+        """Receive and answer messages of a single client until it disconnects.
+
+        Args:
+            conn: Socket of the accepted client.
+            addr: Address of the client.
+            connection: The connection object for server details.
+        """
+        session = ClientSession(conn, addr, on_undelivered=self.store_undelivered)
+        session.start_writer()
+        self.reaper.add(session)
+        with self.clients_lock:
+            self.client_sessions.add(session)
+            # Clients accepted right before a stop are not read from either
+            if self.stopping.is_set():
+                session.stop_reading()
+        # Seconds to wait for queued replies to be sent after the client is done
+        flush_timeout = config.network.SLOW_CONSUMER_GRACE
+        with conn:
+            print(f"Client connected: {addr}")
+            reader = FrameReader(conn)
+            try:
                 while True:
-                    rec_mess = conn.recv(config.network.BUFFER_SIZE).decode("utf-8")
-                    if not rec_mess:
+                    # Requests of a client not reading its replies wait until they drain
+                    if not session.wait_writable(config.network.SLOW_CONSUMER_GRACE):
+                        print(f"[ERROR] Disconnecting slow client: {addr}")
+                        flush_timeout = 0.0
+                        break
+                    try:
+                        frame = reader.read_frame()
+                        if frame is None:
+                            break
+                        flags, payload = frame
+                        payload = decode_payload(flags, payload)
+                    except (FrameError, ConnectionError) as e:
+                        print(f"[ERROR] {e}")
                         break
+                    session.touch()
+                    # Clients sending bare JSON get bare JSON replies
+                    session.legacy = bool(flags & FLAG_LEGACY)
                     recv_message = Message()
-                    recv_message.decode_message(rec_mess)
 
                     try:
-                        sending_msg = self.process_message(recv_message, connection)
-                        json_answer = sending_msg.encode_message()
-                        conn.send(json_answer)
+                        if not recv_message.decode_message(payload, session.wire_format):
+                            self.metrics.record_request("Unknown", 0.0)
+                            session.send(
+                                Message("Error", "Invalid message format", self.server_host, None),
+                                session.legacy,
+                            )
+                            continue
+
+                        start = time.perf_counter()
+                        sending_msg = self.process_message(recv_message, connection, session)
+                        # Unknown headers are counted together, so clients cannot add metrics
+                        header = recv_message.header
+                        if not isinstance(header, str) or header not in SCHEMAS:
+                            header = "Unknown"
+                        self.metrics.record_request(header, time.perf_counter() - start)
+                        session.send(sending_msg, session.legacy)
+
+                        if sending_msg.header == "Handshake_answer":
+                            session.wire_format = sending_msg.text["format"]
+                            session.compression = sending_msg.text["compression"]
 
                     except IOError as e:
                         if e.errno == errno.EPIPE:
                             print("[ERROR] Broken pipe error")
-                            break
-
-    def process_message(self, message: Message, connection: Connection) -> Message:
+                        else:
+                            print(f"[ERROR] {e}")
+                        break
+            finally:
+                self.reaper.remove(session)
+                self.sessions.unregister(session)
+                session.close(flush_timeout)
+                with self.clients_lock:
+                    self.client_sessions.discard(session)
+                    self.client_threads.discard(threading.current_thread())
+
+    def process_message(
+        self, message: Message, connection: Connection, session: ClientSession | None = None
+    ) -> Message:
         """Process incoming messages and generate appropriate responses.
 
-        Routes different message types to appropriate handlers and returns
-        the corresponding response message.
+        Validates the message against the schema of its header, then routes
+        it to the appropriate handler and returns the corresponding response.
 
         Args:
             message: The incoming message to process.
             connection: The connection object for server details.
+            session: Session of the client connection the message came from, if any.
 
         Returns:
             A response Message object.
         """
+        # Malformed requests are rejected before any database or hashing work
+        error = validate_message(message)
+        if error:
+            return Message(
+                "Error", f"Invalid {message.header} message: {error}", self.server_host, message.sender
+            )
+        if not self.check_rate_limit(message, session):
+            return Message(
+                "Error", f"Too many {message.header} requests, try again later", self.server_host, message.sender
+            )
+
         if message.header == "Command":
-            return self.handle_command(message, connection)
+            return self.handle_command(message, connection, session)
+
+        elif message.header == "Handshake":
+            return self.handle_handshake(message, connection)
+
+        elif message.header == "Ping":
+            # Heartbeat of an idle client, receiving it already kept the connection open
+            return Message("Pong", "Pong", self.server_host, message.sender)
 
         elif message.header == "Authentication":
-            return self.handle_authentication(message, connection)
+            return self.handle_authentication(message, connection, session)
 
         elif message.header == "Acc_type":
-            return self.handle_account_type(message, connection)
+            return self.handle_account_type(message, connection, session)
 
         elif message.header == "Message":
-            return self.handle_sending_message(message, connection)
+            return self.handle_sending_message(message, connection, session)
+
+        elif message.header == "Group":
+            return self.handle_group(message, connection, session)
+
+        elif message.header == "Group_message":
+            return self.handle_group_message(message, connection, session)
 
         else:
             message = Message(
@@ -93,37 +284,59 @@ class Server:
             )
             return message
 
-    def handle_command(self, message: Message, connection: Connection) -> Message:
+    def check_rate_limit(self, message: Message, session: ClientSession | None = None) -> bool:
+        """Check a request against the rate limits of its source address and signed in user.
+
+        Senders and logins named in requests are chosen by the client, so
+        they are never used as keys: otherwise a client could dodge limits by
+        changing them, or use up the limits of another user. Clients not
+        signed in are only limited by their source address.
+
+        Args:
+            message: The incoming, already validated message.
+            session: Session of the client connection the message came from, if any.
+
+        Returns:
+            True if the request may be handled, False if a limit was exceeded.
+        """
+        if session is None:
+            return True
+        address = session.addr[0]
+        if address not in self.rate_limit_exempt and not self.address_limiter.allow(address, message.header):
+            return False
+        if session.login and not self.user_limiter.allow(session.login, message.header):
+            return False
+        return True
+
+    def handle_command(
+        self, message: Message, connection: Connection, session: ClientSession | None = None
+    ) -> Message:
         """Handle server commands from clients.
 
-        Processes commands like help, uptime, info, inbox, stop,
-        and message sending. Returns appropriate responses.
+        Processes commands like help, uptime, info, inbox, online, broadcast,
+        stop, and message sending. Returns appropriate responses.
         """
-        match message.text.lower():
+        command, _, argument = message.text.partition(" ")
+        match command.lower():
             case "help":
-                comm_dict = {
-                    "HELP": config.ui.HELP_TEXT,
-                }
-
-                return Message("Command", comm_dict, self.server_host, message.sender)
+                return self.response_cache.get("help", message.sender, self.build_help_reply)
 
             case "uptime":
-                days, hours, minutes, seconds = self.calc_uptime()
-                uptime_dict = {
-                    "Server uptime": f"Server is active for {days} days. {hours} hours, {minutes} minutes and {seconds} seconds"
-                }
-                return Message("Command", uptime_dict, self.server_host, message.sender)
+                return self.response_cache.get(
+                    "uptime",
+                    message.sender,
+                    self.build_uptime_reply,
+                    ttl=config.server.UPTIME_CACHE_TTL,
+                )
 
             case "info":
-                info_dict = {
-                    "Server version": config.server.SERVER_VERSION,
-                    "Server start date": f"{self.start_time}",
-                }
-
-                return Message("Command", info_dict, self.server_host, message.sender)
+                return self.response_cache.get("info", message.sender, self.build_info_reply)
 
             case "inbox":
-                messages = self.db_helper.get_msg_from_inbox(message.sender)
+                # Reading empties the inbox, so only its signed in owner may do it
+                if session is None or session.login is None:
+                    return Message("Error", "Sign in to read your inbox", self.server_host, message.sender)
+                messages = self.db_helper.get_msg_from_inbox(session.login)
 
                 for msg in messages:
                     if msg["Text"] == "EMPTY":
@@ -135,41 +348,171 @@ class Server:
                             "Inbox_message", messages, self.server_host, message.sender
                         )
 
+            case "online":
+                users, cursor = self.sessions.list_online(
+                    argument or None, config.server.ONLINE_PAGE_SIZE
+                )
+                online_dict = {
+                    "users": users,
+                    "next": cursor,
+                    "total": self.sessions.online_count(),
+                }
+                return Message("Online_users", online_dict, self.server_host, message.sender)
+
+            case "broadcast":
+                return self.handle_broadcast(message, argument, session)
+
+            case "stats":
+                if not self.is_admin(message, session):
+                    return Message("Error", "Only admins can view server statistics", self.server_host, message.sender)
+                return Message("Stats", self.get_stats(), self.server_host, message.sender)
+
             case "stop":
+                # Admins stop the server, other users only their own client
+                if self.is_admin(message, session):
+                    print(f"Stop requested by {message.sender}")
+                    self.request_stop()
                 return Message("Stop", "Stop", self.server_host, message.sender)
 
+            case _:
+                return Message("Error", f"Unknown command: {command}", self.server_host, message.sender)
+
+    def is_admin(self, message: Message, session: ClientSession | None = None) -> bool:
+        """Check if the sender of a message is an admin signed in on the session it came from.
+
+        Admin rights are checked for the signed in user, not the claimed sender.
+        """
+        return (
+            session is not None
+            and session.login == message.sender
+            and self.db_helper.get_account_type(message.sender) == "admin"
+        )
+
+    def get_stats(self) -> dict:
+        """Get a snapshot of server load statistics.
+
+        Returns:
+            Dictionary with uptime, request counts, rates and latencies by header,
+            Argon2 hashing statistics, numbers of connections and database
+            connection pool usage.
+        """
+        stats = self.metrics.snapshot()
+        with self.clients_lock:
+            active = len(self.client_sessions)
+        stats["connections"] = {
+            "active": active,
+            "signed_in_users": self.sessions.online_count(),
+        }
+        pool = self.db_helper.get_pool_metrics()
+        stats["pool"] = {key: value for key, value in pool.items() if not isinstance(value, dict)}
+        for key in ("wait_time", "hold_time"):
+            stats["pool"][f"{key}_p95"] = pool[key]["p95"]
+        return stats
+
+    def handle_handshake(self, message: Message, connection: Connection) -> Message:
+        """Handle wire format and compression negotiation with a newly connected client.
+
+        Picks the most preferred wire format and compression method offered by
+        the client. The answer is sent in the format of the handshake request,
+        later messages use the agreed format and compression.
+
+        Args:
+            message: The incoming handshake message with offered formats.
+
+        Returns:
+            A response Message object with the agreed wire format.
+        """
+        offers = message.text if isinstance(message.text, dict) else {}
+        handshake_dict = {
+            "format": negotiate_format(offers.get("formats", [])),
+            "compression": negotiate_compression(offers.get("compression", [])),
+        }
+        return Message("Handshake_answer", handshake_dict, self.server_host, message.sender)
+
     def handle_authentication(
-        self, message: Message, connection: Connection
+        self, message: Message, connection: Connection, session: ClientSession | None = None
     ) -> Message:
         """Handle user authentication and registration.
 
         Verifies user credentials or registers new users with hashed passwords.
+        Reconnecting clients may present a session token instead of the
+        password, which skips the password hash check. Successful sign in
+        answers carry a fresh session token, and register the session to
+        receive pushed messages. Failed sign ins slow down later password
+        checks of the same login.
 
         Args:
             message: The incoming authentication message.
+            session: Session of the client connection, if any.
 
         Returns:
             A response Message object with authentication status.
         """
-        authenticator = UserAuthenticator(message.text)
-        auth_dict = authenticator.verify_login()
+        credentials = message.text
+        if "token" in credentials:
+            resumed = self.session_tokens.verify(credentials["login"], credentials["token"])
+            auth_dict = {
+                "is_registered": resumed,
+                "login_successfull": resumed,
+            }
+        elif "password" in credentials:
+            # Logins with many recent failures are answered slowly instead of refused
+            backoff = self.login_failures.delay(credentials["login"], "Authentication")
+            if backoff:
+                time.sleep(min(backoff, config.security.LOGIN_BACKOFF_MAX))
+            authenticator = UserAuthenticator(credentials, self.metrics)
+            auth_dict = authenticator.verify_login()
+        else:
+            return Message(
+                "Error", "Authentication requires password or token", self.server_host, message.sender
+            )
+
+        if auth_dict["login_successfull"]:
+            auth_dict["session_token"] = self.session_tokens.issue(credentials["login"])
+            if session is not None:
+                self.sessions.register(credentials["login"], session)
+        else:
+            self.login_failures.allow(credentials["login"], "Authentication")
 
         message = Message(
             "Authentication_answer", auth_dict, self.server_host, message.sender
         )
         return message
 
-    def handle_account_type(self, message: Message, connection: Connection) -> Message:
+    def handle_account_type(
+        self, message: Message, connection: Connection, session: ClientSession | None = None
+    ) -> Message:
         """Handle account type updates for users.
 
-        Updates the account type for a user based on the provided message.
+        The client must be signed in, and confirm the change with the
+        password of the signed in user. Users change the type of their own
+        account, admins of any account. Only admins grant admin rights,
+        except to the first admin, who makes themselves one.
 
         Args:
             message: The incoming message containing account type information.
+            session: Session of the client connection the message came from, if any.
 
         Returns:
             A response Message object with the update status.
         """
+        login = session.login if session is not None else None
+        if login is None:
+            return Message("Error", "Sign in to change account types", self.server_host, message.sender)
+
+        authenticator = UserAuthenticator(message.text, self.metrics)
+        stored_password = self.db_helper.get_stored_password(login)
+        if not stored_password or not authenticator.verify_password(message.text["password"], stored_password):
+            return Message("Error", "Wrong password", self.server_host, message.sender)
+
+        is_admin = self.db_helper.get_account_type(login) == "admin"
+        if message.text["login"] != login and not is_admin:
+            return Message(
+                "Error", "Only admins can change account types of other users", self.server_host, message.sender
+            )
+        if message.text["acc_type"] == "admin" and not is_admin and self.db_helper.admin_exists():
+            return Message("Error", "Only admins can grant admin rights", self.server_host, message.sender)
+
         update_status = self.db_helper.add_account_type(message.text)
         acc_update_dict = {
             "update_status": update_status,
@@ -181,23 +524,32 @@ class Server:
         return message
 
     def handle_sending_message(
-        self, message: Message, connection: Connection
+        self, message: Message, connection: Connection, session: ClientSession | None = None
     ) -> Message:
         """Handle sending messages between users.
 
-        Checks if the receiver exists and if their inbox is not full,
-        then stores the message in the database.
+        Checks if the receiver exists, then pushes the message to the live
+        connections of an online receiver. Messages which could not be
+        pushed are stored in the database, if the receiver inbox is not full.
+        The message is sent as the user signed in on the session.
 
         Args:
-            message: The incoming message containing sender, receiver, and text.
+            message: The incoming message containing receiver and text.
+            session: Session of the client connection the message came from, if any.
 
         Returns:
             A response Message object with the status of the operation.
         """
+        login = session.login if session is not None else None
+        if login is None:
+            return Message("Error", "Sign in to send messages", self.server_host, message.sender)
         if self.db_helper.check_if_registered(message.receiver):
+            if self.push_message(message, login):
+                return Message("Status", True, self.server_host, message.sender)
+
             if self.db_helper.check_recv_inbox(message.receiver):
                 status = self.db_helper.add_msg_to_db(
-                    message.receiver, message.sender, message.text
+                    message.receiver, login, message.text
                 )
 
                 message = Message("Status", status, self.server_host, message.sender)
@@ -213,6 +565,265 @@ class Server:
             message = Message("Error", status, self.server_host, message.sender)
             return message
 
+    def handle_broadcast(self, message: Message, text: str, session: ClientSession | None = None) -> Message:
+        """Handle an admin sending a message to every registered user.
+
+        Online users get the message pushed and the rest stored in their
+        inboxes, both in batches with a short pause in between, so a large
+        broadcast does not hold the database or push threads for long.
+
+        Args:
+            message: The incoming broadcast command.
+            text: The message content to broadcast.
+            session: Session the command came from, the sender must be signed in on it.
+
+        Returns:
+            A response Message object with numbers of pushed and stored copies.
+        """
+        # Admin rights are checked for the signed in user, not the claimed sender
+        if session is None or session.login != message.sender:
+            return Message("Error", "Sign in to broadcast messages", self.server_host, message.sender)
+        if not self.is_admin(message, session):
+            return Message("Error", "Only admins can broadcast messages", self.server_host, message.sender)
+        if not text:
+            return Message("Error", "Broadcast message cannot be empty", self.server_host, message.sender)
+
+        online, _ = self.sessions.list_online(limit=self.sessions.online_count())
+        receivers = [login for login in online if login != message.sender]
+        pushed = set()
+        batch_size = config.server.BROADCAST_BATCH_SIZE
+        for start in range(0, len(receivers), batch_size):
+            if start:
+                time.sleep(config.server.BROADCAST_PAUSE)
+            pushed |= self.push_to_users(receivers[start:start + batch_size], message.sender, text)
+        stored = self.db_helper.broadcast_message(message.sender, text, pushed)
+
+        status_dict = {
+            "pushed": len(pushed),
+            "stored": stored,
+        }
+        return Message("Status", status_dict, self.server_host, message.sender)
+
+    def handle_group(
+        self, message: Message, connection: Connection, session: ClientSession | None = None
+    ) -> Message:
+        """Handle group management requests.
+
+        Any user can create a group and becomes its owner, only the owner
+        adds members, members can leave the group and list its members.
+        Actions are taken as the user signed in on the session, never as
+        the claimed sender.
+
+        Args:
+            message: The incoming message with action, group name and optional member.
+            session: Session of the client connection the message came from, if any.
+
+        Returns:
+            A response Message object with the result of the action.
+        """
+        login = session.login if session is not None else None
+        if login is None:
+            return Message("Error", "Sign in to use groups", self.server_host, message.sender)
+        action = message.text["action"]
+        name = message.text["group"]
+
+        if action == "create":
+            created = self.db_helper.create_group(name, login)
+            if not created:
+                return Message("Error", "Group name already taken", self.server_host, message.sender)
+            return Message("Status", True, self.server_host, message.sender)
+
+        group = self.db_helper.get_group(name)
+        if group is None:
+            return Message("Error", "Group not existing in database", self.server_host, message.sender)
+
+        if action == "add":
+            member = message.text.get("member")
+            if group["owner"] != login:
+                return Message("Error", "Only the group owner can add members", self.server_host, message.sender)
+            if not member or not self.db_helper.check_if_registered(member):
+                return Message("Error", "Member not existing in database", self.server_host, message.sender)
+            status = self.db_helper.add_group_member(name, member)
+            if not status:
+                return Message("Error", "Group is full", self.server_host, message.sender)
+            return Message("Status", status, self.server_host, message.sender)
+
+        if login not in group["members"]:
+            return Message("Error", "You are not a member of this group", self.server_host, message.sender)
+
+        if action == "leave":
+            status = self.db_helper.remove_group_member(name, login)
+            return Message("Status", status, self.server_host, message.sender)
+
+        members_dict = {
+            "group": name,
+            "owner": group["owner"],
+            "members": group["members"],
+        }
+        return Message("Group_members", members_dict, self.server_host, message.sender)
+
+    def handle_group_message(
+        self, message: Message, connection: Connection, session: ClientSession | None = None
+    ) -> Message:
+        """Handle sending a message to every member of a group.
+
+        Online members get the message pushed in parallel, it is stored for
+        the remaining members in a single batched transaction. The message
+        is sent as the user signed in on the session.
+
+        Args:
+            message: The incoming message with group name as receiver.
+            session: Session of the client connection the message came from, if any.
+
+        Returns:
+            A response Message object with numbers of pushed and stored copies,
+            and members whose inbox was full.
+        """
+        login = session.login if session is not None else None
+        if login is None:
+            return Message("Error", "Sign in to use groups", self.server_host, message.sender)
+        group = self.db_helper.get_group(message.receiver)
+        if group is None:
+            return Message("Error", "Group not existing in database", self.server_host, message.sender)
+        if login not in group["members"]:
+            return Message("Error", "You are not a member of this group", self.server_host, message.sender)
+
+        receivers = [member for member in group["members"] if member != login]
+        pushed = self.push_to_users(receivers, login, message.text, group=message.receiver)
+        offline = [member for member in receivers if member not in pushed]
+        inbox_full = self.db_helper.add_msgs_to_inboxes(offline, login, message.text) if offline else []
+
+        status_dict = {
+            "pushed": len(pushed),
+            "stored": len(offline) - len(inbox_full),
+            "inbox_full": inbox_full,
+        }
+        return Message("Status", status_dict, self.server_host, message.sender)
+
+    def push_message(self, message: Message, sender: str) -> bool:
+        """Push a message to every live connection of its receiver.
+
+        Args:
+            message: The message sent by a user.
+            sender: Username of the signed in user who sent the message.
+
+        Returns:
+            True if at least one connection of the receiver got the message.
+        """
+        return bool(self.push_to_users([message.receiver], sender, message.text))
+
+    def push_to_users(self, receivers, sender: str, text: str, group: str | None = None) -> set:
+        """Push a message to live connections of the receivers, in parallel for several connections.
+
+        Args:
+            receivers: Usernames of the message recipients.
+            sender: Username of the message sender.
+            text: The message content.
+            group: Name of the group the message was sent to, if any.
+
+        Returns:
+            Usernames of receivers who got the message queued on at least one connection.
+            Queued messages a connection fails to write are stored by store_undelivered.
+            Connections with a full outbound queue stay signed in, but do not count.
+        """
+        targets = [
+            (login, session)
+            for login in receivers
+            for session in self.sessions.get_sessions(login)
+            if not session.legacy
+        ]
+        if not targets:
+            return set()
+
+        push_dict = {
+            "Sender": sender,
+            "Text": text,
+            # Same UTC time stored for inbox messages
+            "Datetime": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        if group is not None:
+            push_dict["Group"] = group
+
+        def deliver(target):
+            login, session = target
+            try:
+                session.send(Message("New_message", push_dict, self.server_host, login))
+                return login
+            except OutboundQueueFull:
+                # The client is alive but behind, the message goes to the inbox instead
+                return None
+            except OSError as e:
+                print(f"[ERROR] Push to {login} failed: {e}")
+                self.sessions.unregister(session)
+                return None
+
+        if len(targets) == 1:
+            return {login for login in [deliver(targets[0])] if login is not None}
+
+        futures = []
+        for target in targets:
+            try:
+                futures.append(self.push_executor.submit(deliver, target))
+            except RuntimeError:
+                # Executor was shut down at the drain deadline, the rest go to the inbox
+                break
+        pushed = set()
+        for future in futures:
+            try:
+                login = future.result()
+            except CancelledError:
+                continue
+            if login is not None:
+                pushed.add(login)
+        return pushed
+
+    def store_undelivered(self, messages):
+        """Store pushed messages a connection failed to write in the inboxes of their receivers.
+
+        Called by the writer thread of a session closed with messages still
+        queued. Pushes count as delivered once queued, so they are stored
+        here instead of lost, even if another connection of the receiver got
+        them too.
+
+        Args:
+            messages: Queued messages which were not written, replies among them are skipped.
+        """
+        for message in messages:
+            if message.header != "New_message":
+                continue
+            try:
+                full = self.db_helper.add_msgs_to_inboxes(
+                    [message.receiver], message.text["Sender"], message.text["Text"]
+                )
+            except Exception as e:
+                print(f"[ERROR] Storing undelivered message to {message.receiver} failed: {e}")
+                continue
+            if full:
+                print(f"[ERROR] Undelivered message to {message.receiver} dropped, inbox is full")
+
+    def build_help_reply(self) -> Message:
+        """Build reply to the help command, cached for the server lifetime."""
+        comm_dict = {
+            "HELP": config.ui.HELP_TEXT,
+        }
+        return Message("Command", comm_dict, self.server_host, None)
+
+    def build_uptime_reply(self) -> Message:
+        """Build reply to the uptime command, cached for UPTIME_CACHE_TTL seconds."""
+        days, hours, minutes, seconds = self.calc_uptime()
+        uptime_dict = {
+            "Server uptime": f"Server is active for {days} days. {hours} hours, {minutes} minutes and {seconds} seconds"
+        }
+        return Message("Command", uptime_dict, self.server_host, None)
+
+    def build_info_reply(self) -> Message:
+        """Build reply to the info command, cached for the server lifetime."""
+        info_dict = {
+            "Server version": config.server.SERVER_VERSION,
+            "Server start date": f"{self.start_time}",
+        }
+        return Message("Command", info_dict, self.server_host, None)
+
     def calc_uptime(self) -> tuple[int, int, int, int]:
         """Calculate server uptime since startup.
 
@@ -236,9 +847,11 @@ class UserAuthenticator:
     registration with secure password storage.
     """
 
-    def __init__(self, message):
+    def __init__(self, message, metrics: ServerMetrics | None = None):
         self.text = message
         self.db_helper = DbHelper()
+        # Argon2 timings are recorded in the server metrics
+        self.metrics = metrics or ServerMetrics()
 
     def verify_login(self) -> dict:
         """Verify user login credentials or register new user.
@@ -283,7 +896,8 @@ class UserAuthenticator:
         """
         ph = PasswordHasher()
         try:
-            ph.verify(stored_pass, input_pass)
+            with self.metrics.hashing():
+                ph.verify(stored_pass, input_pass)
             return True
         except VerifyMismatchError:
             return False
@@ -301,5 +915,6 @@ class UserAuthenticator:
             The hashed password string.
         """
         ph = PasswordHasher()  # removing argon2 for iPad
-        return ph.hash(password)  # removing argon2 for iPad
+        with self.metrics.hashing():
+            return ph.hash(password)  # removing argon2 for iPad
         # return password
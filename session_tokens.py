@@ -0,0 +1,109 @@
+"""Session token module for resuming authenticated sessions.
+
+This module provides the SessionTokens class, issuing signed tokens to
+users who signed in with a password. A reconnecting client presents its
+token instead of the password, and the server verifies the signature
+with a single HMAC instead of an expensive Argon2 password check.
+Without a configured secret, the signing key is generated once and kept
+in a file, so tokens stay valid across server restarts.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from config import config
+
+
+def load_secret(path: str) -> bytes:
+    """Read the token signing key from a file, creating the file with a random key if missing.
+
+    Args:
+        path: Path of the secret file, created readable by its owner only.
+
+    Returns:
+        The signing key.
+
+    Raises:
+        ValueError: If the secret file exists but is empty.
+        OSError: If the secret file cannot be read or created.
+    """
+    if not os.path.exists(path):
+        # The key is written to a temporary file first and linked in place, so servers
+        # starting together agree on a single key and never read a partly written one
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as secret_file:
+                secret_file.write(secrets.token_hex(32).encode("ascii"))
+            os.link(temp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+
+    with open(path, "rb") as secret_file:
+        key = secret_file.read().strip()
+    if not key:
+        raise ValueError(f"Session secret file {path} is empty")
+    return key
+
+
+class SessionTokens:
+    """Issues and verifies HMAC signed session tokens.
+
+    Tokens have the form "login:expires_at:signature" and hold no server
+    side state, so any server sharing the secret can verify them.
+    """
+
+    def __init__(
+        self,
+        secret: str = config.security.SESSION_SECRET,
+        ttl: int = config.security.SESSION_TOKEN_TTL,
+        secret_file: str = config.security.SESSION_SECRET_FILE,
+    ):
+        """Set up token signing.
+
+        Args:
+            secret: Signing key, read from (or generated into) secret_file when empty.
+            ttl: Seconds issued tokens stay valid.
+            secret_file: Path of the file keeping the generated signing key.
+        """
+        self.key = secret.encode("utf-8") if secret else load_secret(secret_file)
+        self.ttl = ttl
+
+    def issue(self, login: str) -> str:
+        """Create a token for a signed in user.
+
+        Args:
+            login: Username of the signed in user.
+
+        Returns:
+            Signed session token, valid for ttl seconds.
+        """
+        payload = f"{login}:{int(time.time()) + self.ttl}"
+        return f"{payload}:{self._sign(payload)}"
+
+    def verify(self, login: str, token: str) -> bool:
+        """Check that a token was issued to the user and has not expired.
+
+        Args:
+            login: Username the token is presented for.
+            token: Session token received from the client.
+
+        Returns:
+            True if the token is valid for the user, False otherwise.
+        """
+        try:
+            payload, signature = token.rsplit(":", 1)
+            token_login, expires_at = payload.rsplit(":", 1)
+            expires_at = int(expires_at)
+        except ValueError:
+            return False
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return False
+        return token_login == login and expires_at > time.time()
+
+    def _sign(self, payload: str) -> str:
+        return hmac.new(self.key, payload.encode("utf-8"), hashlib.sha256).hexdigest()
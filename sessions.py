@@ -0,0 +1,339 @@
+"""Session module keeping track of connected clients.
+
+This module provides the ClientSession class, holding the state of a single
+client connection, and the SessionRegistry class, an in-memory presence
+index mapping signed in users to their live connections, so messages can be
+pushed to them and online users listed without querying the database.
+
+Frames for a client are queued and written by a thread of its session, so
+threads sending replies or pushes never block on a client reading slowly.
+Queues are bounded, and a client whose queue stays above its high water
+mark is not read from until the queue drains. Messages still queued when
+writing fails or the connection is closed are handed back to the server,
+so pushed messages can be stored instead of lost.
+
+The IdleReaper class closes connections of clients which stopped sending
+anything, including heartbeats, for longer than the connection timeout.
+"""
+
+import math
+import socket
+import threading
+import time
+from bisect import bisect_right, insort
+from collections import deque
+from protocol import encode_frame, FLAG_LEGACY
+from config import config
+
+
+class OutboundQueueFull(ConnectionError):
+    """Raised when a message does not fit the outbound queue of a live client session"""
+
+
+class ClientSession:
+    """State of a single client connection.
+
+    Replies are sent by the thread serving the connection, pushed messages
+    by threads serving other clients. Once the writer thread is started,
+    frames are queued and written in order by that thread, otherwise they
+    are written right away, serialized with a lock to keep frames from
+    interleaving.
+    """
+
+    def __init__(self, conn, addr, on_undelivered=None):
+        """Initialize the session of an accepted connection.
+
+        Args:
+            conn: Socket of the client connection.
+            addr: Address of the client.
+            on_undelivered: Function called from the writer thread with queued messages
+                which were never written, once writing failed or the connection was closed.
+        """
+        self.conn = conn
+        self.addr = addr
+        self.on_undelivered = on_undelivered
+        self.login = None
+        # Replies use uncompressed JSON until the client negotiates otherwise
+        self.wire_format = "json"
+        self.compression = None
+        # Clients sending bare JSON cannot receive unrequested messages
+        self.legacy = False
+        self.send_lock = threading.Lock()
+        self.last_seen = time.monotonic()
+        # (frame, message) pairs waiting for the writer thread, and total size of the frames in bytes
+        self.outbound = deque()
+        self.queued_bytes = 0
+        self.queue_changed = threading.Condition()
+        # Time the queue went above the high water mark, None while below the low water mark
+        self.congested_since = None
+        self.closed = False
+        self.writer = None
+
+    def touch(self):
+        """Record activity of the client, keeping its session from expiring."""
+        self.last_seen = time.monotonic()
+
+    def start_writer(self):
+        """Start the thread writing queued frames, later messages are queued instead of sent right away."""
+        self.writer = threading.Thread(target=self._write_frames, daemon=True)
+        self.writer.start()
+
+    def send(self, message, legacy: bool = False):
+        """Encode message for this client and send or queue it.
+
+        Args:
+            message: The message to send.
+            legacy: Whether to send bare JSON to a client which does not use frames.
+
+        Raises:
+            OutboundQueueFull: If the outbound queue is full, the session stays open.
+            ConnectionError: If the session is closed.
+            OSError: If the message could not be sent.
+        """
+        flags = FLAG_LEGACY if legacy else 0
+        payload = message.encode_message("json" if legacy else self.wire_format)
+        frame = encode_frame(payload, flags, self.compression)
+        if self.writer is None:
+            with self.send_lock:
+                self.conn.sendall(frame)
+            return
+
+        with self.queue_changed:
+            if self.closed:
+                raise ConnectionError("Client session is closed")
+            # A single frame larger than the limit still goes through an empty queue
+            if self.outbound and self.queued_bytes + len(frame) > config.network.OUTBOUND_QUEUE_LIMIT:
+                raise OutboundQueueFull("Outbound queue of client is full")
+            self.outbound.append((frame, message))
+            self.queued_bytes += len(frame)
+            if self.congested_since is None and self.queued_bytes >= config.network.OUTBOUND_HIGH_WATER:
+                self.congested_since = time.monotonic()
+            self.queue_changed.notify_all()
+
+    def wait_writable(self, grace: float) -> bool:
+        """Wait until the outbound queue drains below the low water mark.
+
+        Called before reading the next request, so a client not reading its
+        replies stops being served instead of growing its queue.
+
+        Args:
+            grace: Seconds the queue may stay above the high water mark.
+
+        Returns:
+            True if requests of the client can be read, False if the client stayed
+            congested for the whole grace period or the session was closed.
+        """
+        with self.queue_changed:
+            if self.congested_since is not None:
+                deadline = self.congested_since + grace
+                self.queue_changed.wait_for(
+                    lambda: self.congested_since is None or self.closed,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                )
+            return self.congested_since is None and not self.closed
+
+    def close(self, timeout: float = 0.0):
+        """Stop queueing frames and wait for already queued ones to be written.
+
+        Args:
+            timeout: Seconds to wait for the queue to drain, after which the
+                connection is shut down, and messages still queued are handed
+                to on_undelivered.
+        """
+        with self.queue_changed:
+            self.closed = True
+            self.queue_changed.notify_all()
+        if self.writer is None or self.writer is threading.current_thread():
+            return
+        self.writer.join(timeout)
+        if self.writer.is_alive():
+            # Unblocks the writer stuck sending to a client which is not reading
+            self.disconnect()
+            self.writer.join()
+
+    def _write_frames(self):
+        """Write queued frames in order until the session is closed and its queue drained."""
+        while True:
+            with self.queue_changed:
+                self.queue_changed.wait_for(lambda: self.outbound or self.closed)
+                if not self.outbound:
+                    return
+                frame, _ = self.outbound[0]
+            try:
+                self.conn.sendall(frame)
+            except OSError as e:
+                print(f"[ERROR] Sending to {self.addr} failed: {e}")
+                with self.queue_changed:
+                    self.closed = True
+                    # A frame failing part way is counted as not written, the client cannot decode it
+                    undelivered = [message for _, message in self.outbound]
+                    self.outbound.clear()
+                    self.queued_bytes = 0
+                    self.queue_changed.notify_all()
+                # Wakes the thread reading requests of the client
+                self.disconnect()
+                if self.on_undelivered is not None:
+                    self.on_undelivered(undelivered)
+                return
+            with self.queue_changed:
+                self.outbound.popleft()
+                self.queued_bytes -= len(frame)
+                if self.congested_since is not None and self.queued_bytes <= config.network.OUTBOUND_LOW_WATER:
+                    self.congested_since = None
+                self.queue_changed.notify_all()
+
+    def stop_reading(self):
+        """Shut the receiving side down, so the client is served until its current request is answered."""
+        try:
+            self.conn.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass
+
+    def disconnect(self):
+        """Shut the connection down, waking threads reading from or writing to it."""
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class IdleReaper:
+    """Timer wheel closing sessions idle for longer than the timeout.
+
+    Sessions sit in the wheel slot of the tick their timeout may run out
+    at. Every tick only the sessions of the current slot are checked:
+    idle ones are disconnected, active ones moved to the slot of their new
+    deadline. Client activity itself only updates the session timestamp,
+    so it costs nothing here, and a tick does not scan every connection.
+    """
+
+    def __init__(self, timeout: float, tick: float = 1.0):
+        self.timeout = timeout
+        self.tick = tick
+        # One revolution covers the whole timeout, so every deadline has its own slot
+        self.slots = [set() for _ in range(math.ceil(timeout / tick) + 1)]
+        self.position = 0
+        # session -> index of the slot holding it
+        self.slot_of = {}
+        self.lock = threading.Lock()
+
+    def add(self, session: ClientSession):
+        """Start watching a session for inactivity."""
+        with self.lock:
+            self._schedule(session, time.monotonic())
+
+    def remove(self, session: ClientSession):
+        """Stop watching a closed session."""
+        with self.lock:
+            slot = self.slot_of.pop(session, None)
+            if slot is not None:
+                self.slots[slot].discard(session)
+
+    def advance(self) -> list:
+        """Move the wheel by one tick, collecting sessions whose timeout ran out.
+
+        Returns:
+            Expired sessions, no longer watched, whose connections should be closed.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.position = (self.position + 1) % len(self.slots)
+            due = self.slots[self.position]
+            self.slots[self.position] = set()
+            expired = []
+            for session in due:
+                if now - session.last_seen >= self.timeout:
+                    del self.slot_of[session]
+                    expired.append(session)
+                else:
+                    self._schedule(session, now)
+        return expired
+
+    def run(self):
+        """Advance the wheel every tick, disconnecting idle sessions, until the process exits."""
+        while True:
+            time.sleep(self.tick)
+            for session in self.advance():
+                print(f"[ERROR] Closing idle connection: {session.addr}")
+                session.disconnect()
+
+    def _schedule(self, session: ClientSession, now: float):
+        remaining = session.last_seen + self.timeout - now
+        ticks = min(len(self.slots) - 1, max(1, math.ceil(remaining / self.tick)))
+        slot = (self.position + ticks) % len(self.slots)
+        self.slots[slot].add(session)
+        self.slot_of[session] = slot
+
+
+class SessionRegistry:
+    """Thread-safe registry of signed in users and their live sessions.
+
+    A user signed in from several connections has all of them registered.
+    Online checks are dictionary lookups, and a sorted list of online
+    logins, updated only when a user comes online or goes offline, serves
+    paginated listings.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # login -> set of ClientSession
+        self.sessions = {}
+        # Logins of online users, in sorted order
+        self.online = []
+
+    def register(self, login: str, session: ClientSession):
+        """Bind a session to the user who signed in on it."""
+        with self.lock:
+            self._remove(session)
+            session.login = login
+            session.touch()
+            user_sessions = self.sessions.get(login)
+            if user_sessions is None:
+                user_sessions = self.sessions[login] = set()
+                insort(self.online, login)
+            user_sessions.add(session)
+
+    def unregister(self, session: ClientSession):
+        """Remove a closed session from the registry."""
+        with self.lock:
+            self._remove(session)
+
+    def get_sessions(self, login: str) -> list:
+        """Get live sessions of a user, empty if the user is offline."""
+        with self.lock:
+            return list(self.sessions.get(login, ()))
+
+    def is_online(self, login: str) -> bool:
+        # A single dictionary lookup is atomic, so no lock is taken
+        return login in self.sessions
+
+    def online_count(self) -> int:
+        return len(self.online)
+
+    def list_online(self, after: str | None = None, limit: int = 50) -> tuple[list, str | None]:
+        """Get a page of online users, in alphabetical order.
+
+        Args:
+            after: Login the previous page ended with, None for the first page.
+            limit: Maximum number of logins on the page.
+
+        Returns:
+            Tuple of (logins, cursor), where cursor is passed as after to get
+            the next page, or None if this is the last page.
+        """
+        with self.lock:
+            start = bisect_right(self.online, after) if after is not None else 0
+            page = self.online[start:start + limit]
+            more = start + limit < len(self.online)
+        return page, (page[-1] if more and page else None)
+
+    def _remove(self, session: ClientSession):
+        if session.login is None:
+            return
+        user_sessions = self.sessions.get(session.login)
+        if user_sessions is not None:
+            user_sessions.discard(session)
+            if not user_sessions:
+                del self.sessions[session.login]
+                self.online.pop(bisect_right(self.online, session.login) - 1)
+        session.login = None
@@ -0,0 +1,245 @@
+"""Test suite for AsyncClient class"""
+
+import asyncio
+import unittest
+from async_client import AsyncClient
+from message import Message
+from protocol import FRAME_HEADER, encode_frame, decode_payload
+
+
+class DummyServer:
+    """In-process server answering frames in order, like the chat server does"""
+
+    def __init__(self, inbox=None):
+        self.inbox = inbox or []
+        # Credential kinds of received authentication requests, in order
+        self.sign_ins = []
+        self.pings = 0
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle_client(self, reader, writer):
+        compression = None
+        try:
+            while True:
+                length, flags = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                payload = decode_payload(flags, await reader.readexactly(length))
+                message = Message()
+                message.decode_message(payload)
+
+                if message.header == "Handshake":
+                    reply = Message("Handshake_answer", {"format": "json", "compression": "zlib"}, "Server", None)
+                elif message.header == "Authentication":
+                    self.sign_ins.append("token" if "token" in message.text else "password")
+                    answer = {"is_registered": True, "login_successfull": True, "session_token": "token"}
+                    reply = Message("Authentication_answer", answer, "Server", None)
+                elif message.header == "Ping":
+                    self.pings += 1
+                    reply = Message("Pong", "Pong", "Server", message.sender)
+                elif message.text == "push":
+                    # Pushed message arriving before the reply to the request
+                    push = Message("New_message", {"Sender": "sender", "Text": "Hi"}, "Server", message.sender)
+                    writer.write(encode_frame(push.encode_message(), compression=compression))
+                    reply = Message("Command", {"echo": message.text}, "Server", message.sender)
+                elif message.text == "shutdown":
+                    # Stopping server telling clients to spread reconnects, then closing the connection
+                    notice = Message("Shutdown", {"retry_after": 0.1}, "Server", None)
+                    writer.write(encode_frame(notice.encode_message(), compression=compression))
+                    await writer.drain()
+                    break
+                elif message.text == "garbled":
+                    # Reply which is valid JSON but not a message
+                    writer.write(encode_frame(b"[1, 2]"))
+                    await writer.drain()
+                    continue
+                elif message.text == "slow":
+                    # Request keeping the server busy, frames sent meanwhile wait for it
+                    await asyncio.sleep(0.2)
+                    reply = Message("Command", {"echo": message.text}, "Server", message.sender)
+                elif message.text == "hang":
+                    # Server which stopped answering without closing the connection
+                    await asyncio.sleep(1)
+                    break
+                elif message.text == "drop":
+                    # Simulates a server restart, dropping the connection without a reply
+                    break
+                elif message.text == "inbox":
+                    reply = Message("Inbox_message", self.inbox, "Server", message.sender)
+                else:
+                    reply = Message("Command", {"echo": message.text}, "Server", message.sender)
+
+                writer.write(encode_frame(reply.encode_message(), compression=compression))
+                await writer.drain()
+                if reply.header == "Handshake_answer":
+                    compression = "zlib"
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+
+class TestAsyncClient(unittest.TestCase):
+    """Test suite for AsyncClient class"""
+
+    def run_with_server(self, scenario, inbox=None, server=None):
+        """Run a client scenario coroutine against a dummy server"""
+        async def run():
+            dummy_server = server or DummyServer(inbox)
+            await dummy_server.start()
+            try:
+                async with AsyncClient("127.0.0.1", dummy_server.port) as client:
+                    return await scenario(client)
+            finally:
+                await dummy_server.stop()
+
+        return asyncio.run(run())
+
+    def test_handshake(self):
+        """Test that connecting negotiates wire format and compression with the server."""
+        async def scenario(client):
+            return client.wire_format, client.compression
+
+        self.assertEqual(self.run_with_server(scenario), ("json", "zlib"))
+
+    def test_pipelined_requests(self):
+        """Test that many requests in flight on one connection get their own replies."""
+        async def scenario(client):
+            return await asyncio.gather(*(client.command(f"command {i}") for i in range(200)))
+
+        replies = self.run_with_server(scenario)
+        self.assertEqual([reply.text["echo"] for reply in replies], [f"command {i}" for i in range(200)])
+
+    def test_compressed_inbox(self):
+        """Test that compressed inbox replies are decompressed transparently."""
+        inbox = [
+            {"Sender": "sender", "Text": "A" * 200, "Datetime": "2025-01-01 12:00:00"}
+            for _ in range(10)
+        ]
+
+        async def scenario(client):
+            return await client.fetch_inbox()
+
+        self.assertEqual(self.run_with_server(scenario, inbox), inbox)
+
+    def test_pushed_messages_are_not_replies(self):
+        """Test that pushed messages are queued separately and do not take the place of replies."""
+        async def scenario(client):
+            reply = await client.command("push")
+            push = await asyncio.wait_for(client.receive_push(), timeout=1)
+            return reply, push
+
+        reply, push = self.run_with_server(scenario)
+        self.assertEqual(reply.text["echo"], "push")
+        self.assertEqual(push.header, "New_message")
+        self.assertEqual(push.text["Text"], "Hi")
+
+    def test_request_fails_when_connection_lost(self):
+        """Test that requests waiting for replies fail once the server disconnects."""
+        async def scenario(client):
+            client.writer.transport.abort()
+            with self.assertRaises(ConnectionError):
+                await client.command("help")
+
+        client = AsyncClient("127.0.0.1", 1, reconnect=False)
+        with self.assertRaises(ConnectionError):
+            asyncio.run(client.command("help"))
+
+    def test_reconnect_resumes_session(self):
+        """Test that a dropped connection is reopened, resumed with the token, and safe requests repeated."""
+        server = DummyServer()
+
+        async def scenario(client):
+            await client.authenticate("test_user", "password")
+            dropped, repeated, message = await asyncio.gather(
+                client.command("drop"),
+                client.command("info"),
+                client.send_message("receiver", "Hello"),
+                return_exceptions=True,
+            )
+            after = await client.command("uptime")
+            return client.reconnects, dropped, repeated, message, after
+
+        reconnects, dropped, repeated, message, after = self.run_with_server(scenario, server=server)
+        self.assertEqual(reconnects, 1)
+        self.assertIsInstance(dropped, ConnectionError)
+        self.assertIsInstance(message, ConnectionError)
+        self.assertEqual(repeated.text["echo"], "info")
+        self.assertEqual(after.text["echo"], "uptime")
+        self.assertEqual(server.sign_ins, ["password", "token"])
+
+    def test_undecodable_reply(self):
+        """Test that a reply which cannot be decoded fails waiting requests instead of hanging them."""
+        async def scenario(client):
+            garbled = await asyncio.gather(client.command("garbled"), return_exceptions=True)
+            after = await client.command("info")
+            return garbled[0], after
+
+        garbled, after = self.run_with_server(scenario)
+        self.assertIsInstance(garbled, ConnectionError)
+        self.assertEqual(after.text["echo"], "info")
+
+    def test_server_shutdown_notice(self):
+        """Test that a shutdown notice is queued as a push and its reconnect window used once."""
+        async def scenario(client):
+            stopped = await asyncio.gather(client.command("shutdown"), return_exceptions=True)
+            notice = await client.receive_push()
+            after = await client.command("info")
+            return stopped[0], notice, after, client.reconnects, client.reconnect_window
+
+        stopped, notice, after, reconnects, window = self.run_with_server(scenario)
+        self.assertIsInstance(stopped, ConnectionError)
+        self.assertEqual(notice.header, "Shutdown")
+        self.assertEqual(after.text["echo"], "info")
+        self.assertEqual(reconnects, 1)
+        self.assertIsNone(window)
+
+    def test_heartbeat(self):
+        """Test that idle connections send pings, whose replies are not taken for other replies."""
+        server = DummyServer()
+
+        async def run():
+            await server.start()
+            try:
+                async with AsyncClient("127.0.0.1", server.port, heartbeat_interval=0.05) as client:
+                    await asyncio.sleep(0.3)
+                    return await client.command("info")
+            finally:
+                await server.stop()
+
+        reply = asyncio.run(run())
+        self.assertGreaterEqual(server.pings, 2)
+        self.assertEqual(reply.text["echo"], "info")
+
+    def test_heartbeat_tolerates_busy_server(self):
+        """Test that a server answering slowly keeps the connection, and a silent one loses it."""
+        server = DummyServer()
+
+        async def run():
+            await server.start()
+            try:
+                async with AsyncClient("127.0.0.1", server.port, heartbeat_interval=0.1) as client:
+                    await asyncio.sleep(0.15)
+                    slow = await client.command("slow")
+                    busy_reconnects = client.reconnects
+                    hung = await asyncio.gather(client.command("hang"), return_exceptions=True)
+                    return slow, busy_reconnects, hung[0], client.reconnects
+            finally:
+                await server.stop()
+
+        slow, busy_reconnects, hung, reconnects = asyncio.run(run())
+        self.assertEqual(slow.text["echo"], "slow")
+        self.assertEqual(busy_reconnects, 0)
+        self.assertIsInstance(hung, ConnectionError)
+        self.assertEqual(reconnects, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 """Test suite for Client class"""
 
+import asyncio
 import unittest
 from unittest.mock import patch
 from client import Client
@@ -55,6 +56,16 @@ class TestClient(unittest.TestCase):
         self.assertEqual(message.header, "Command")
         self.assertEqual(message.text, "inbox")
 
+        # Test online command, next page is only available after a page with a cursor
+        message = self.client.check_input_command("!online")
+        self.assertEqual(message.text, "online")
+        self.assertIsInstance(self.client.check_input_command("!online next"), ErrorMessage)
+        self.client.check_return_msg(
+            Message("Online_users", {"users": ["alice"], "next": "alice", "total": 2}, "Server", "test_user")
+        )
+        message = self.client.check_input_command("!online next")
+        self.assertEqual(message.text, "online alice")
+
     @patch("builtins.input", side_effect=["recipient", "Hello world"])
     def test_input_validation(self, mock_input):
         """Test client-side validation for message length, username length, and password requirements."""
@@ -84,6 +95,12 @@ class TestClient(unittest.TestCase):
             in message.text
         )
 
+        # Test broadcast is sent as a command with the message text
+        mock_input.side_effect = ["Hello everyone"]
+        message = self.client.check_input_command("!broadcast")
+        self.assertEqual(message.header, "Command")
+        self.assertEqual(message.text, "broadcast Hello everyone")
+
     def test_error_message_creation(self):
         """Test that invalid commands generate proper ErrorMessage objects instead of sending invalid requests."""
         connection = Connection()
@@ -101,26 +118,25 @@ class TestClient(unittest.TestCase):
         # Test with valid account type 'admin'
         # mock_input.return_value = "admin"
 
-        # Create a dummy connection object that implements send and recv
-        class DummyConnection:
-            def send(self, message):
-                pass
+        # Create a dummy client API that answers every update successfully
+        class DummyApi:
+            def __init__(self):
+                self.updates = []
 
-            def recv(self, size):
-                # Create a mock successful response
-                response_msg = Message(
-                    "Account_type_update", {"update_status": True}, "Server", "Client"
-                )
-                return response_msg.encode_message()
+            async def set_account_type(self, login, password, acc_type):
+                self.updates.append(acc_type)
+                return True
 
-        dummy_connection = DummyConnection()
-        result = self.client.set_account_type("password123", dummy_connection)
+        self.client.api = DummyApi()
+        result = asyncio.run(self.client.set_account_type("password123"))
         self.assertTrue(result)
 
         # Test with invalid account type
         # mock_input.return_value = "superuser"  # Not in VALID_ACCOUNT_TYPES
-        result = self.client.set_account_type("password123", dummy_connection)
+        result = asyncio.run(self.client.set_account_type("password123"))
         self.assertFalse(result)
+        # Invalid account types are not sent to the server
+        self.assertEqual(self.client.api.updates, ["admin"])
 
     def test_authentication_process(self):
         """Check if registration/authentication process is working correctly from the client perspective,
@@ -27,6 +27,8 @@ class TestConnection(unittest.TestCase):
         self.assertIsInstance(server_socket, socket.socket)
         self.assertEqual(server_socket.family, socket.AF_INET)
         self.assertEqual(server_socket.type, socket.SOCK_STREAM)
+        # Dead peers are detected with TCP keepalive probes
+        self.assertEqual(server_socket.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE), 1)
         server_socket.close()
 
     def test_socket_creation_failure(self):
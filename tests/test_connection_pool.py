@@ -0,0 +1,319 @@
+"""Test suite for ConnectionPool class"""
+
+import unittest
+import gc
+import os
+import sqlite3
+import time
+import threading
+from config import config
+from connection_pool import ConnectionPool, PoolClosedError, PoolTimeoutError
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test suite for ConnectionPool class"""
+
+    def setUp(self):
+        """Setting up for testing ConnectionPool methods"""
+        self.original_db_path = ConnectionPool.DB_FILE
+        ConnectionPool.DB_FILE = config.tests.TEST_DB_FILE
+        self.pool = ConnectionPool()
+
+    def tearDown(self):
+        self.pool.close_all_connections()
+        ConnectionPool.DB_FILE = self.original_db_path
+        try:
+            os.remove(config.tests.TEST_DB_FILE)
+        except OSError:
+            pass
+
+    def exhaust_pool(self):
+        """Check out every idle connection and stop the pool from growing"""
+        connections = [self.pool.get_connection() for _ in range(len(self.pool.open_connections))]
+        self.pool.max_connections = self.pool.used_connection
+        return connections
+
+    def test_initial_allocation(self):
+        """Test that the pool starts with the minimum number of idle connections."""
+        self.assertEqual(len(self.pool.open_connections), self.pool.min_connections)
+        self.assertEqual(self.pool.used_connection, 0)
+        self.assertEqual(len(self.pool.checked_out), 0)
+
+    def test_lifo_checkout_order(self):
+        """Test that the most recently returned connection is handed out first."""
+        first_conn, first_cursor = self.pool.get_connection()
+        second_conn, second_cursor = self.pool.get_connection()
+        self.assertIn(first_conn, self.pool.checked_out)
+        self.assertEqual(self.pool.used_connection, 2)
+
+        self.pool.return_connection(second_conn, second_cursor)
+        self.pool.return_connection(first_conn, first_cursor)
+
+        conn, cursor = self.pool.get_connection()
+        self.assertIs(conn, first_conn)
+        self.pool.return_connection(conn, cursor)
+
+    def test_double_return_is_ignored(self):
+        """Test that returning the same connection twice does not duplicate it in the pool."""
+        conn, cursor = self.pool.get_connection()
+        self.pool.return_connection(conn, cursor)
+        self.pool.return_connection(conn, cursor)
+
+        self.assertEqual(len(self.pool.open_connections), self.pool.min_connections)
+        self.assertEqual(self.pool.used_connection, 0)
+
+    def test_pool_grows_when_empty(self):
+        """Test that a new batch of connections is allocated once the idle stack is empty."""
+        connections = [self.pool.get_connection() for _ in range(self.pool.min_connections + 1)]
+        self.assertEqual(self.pool.used_connection, self.pool.min_connections + 1)
+        self.assertGreater(len(self.pool.open_connections), 0)
+
+        for conn, cursor in connections:
+            self.pool.return_connection(conn, cursor)
+        self.assertEqual(self.pool.used_connection, 0)
+
+    def test_close_failing_connection(self):
+        """Test that a failing connection is dropped from the pool and frees its slot."""
+        conn, cursor = self.pool.get_connection()
+        self.pool.close_failing_connection(conn, cursor)
+
+        self.assertNotIn(conn, self.pool.checked_out)
+        self.assertEqual(self.pool.used_connection, 0)
+
+    def test_close_idle_connections(self):
+        """Test that only extra connections idle longer than the timeout are closed."""
+        connections = [self.pool.get_connection() for _ in range(self.pool.min_connections + 3)]
+        for conn, cursor in connections:
+            self.pool.return_connection(conn, cursor)
+        total = len(self.pool.open_connections)
+
+        # Recently returned connections are kept
+        self.assertEqual(self.pool.close_idle_connections(), 0)
+
+        self.pool.idle_timeout = 0
+        time.sleep(0.01)
+        closed = self.pool.close_idle_connections()
+        self.assertEqual(closed, total - self.pool.min_connections)
+        self.assertEqual(len(self.pool.open_connections), self.pool.min_connections)
+
+    def test_background_reaper(self):
+        """Test that the reaper thread shrinks the pool without explicit cleanup calls."""
+        self.pool.close_all_connections()
+        self.pool = ConnectionPool(idle_timeout=0, cleanup_interval=0.05)
+        self.assertTrue(self.pool.reaper_thread.is_alive())
+
+        connections = [self.pool.get_connection() for _ in range(self.pool.min_connections + 1)]
+        for conn, cursor in connections:
+            self.pool.return_connection(conn, cursor)
+
+        time.sleep(0.3)
+        self.assertEqual(len(self.pool.open_connections), self.pool.min_connections)
+
+        self.pool.close_all_connections()
+        self.assertIsNone(self.pool.reaper_thread)
+
+    def test_checkout_timeout(self):
+        """Test that checkout gives up with PoolTimeoutError once the pool is exhausted."""
+        connections = self.exhaust_pool()
+
+        start_time = time.monotonic()
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.get_connection(timeout=0.1)
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.1)
+        self.assertEqual(len(self.pool.waiters), 0)
+
+        for conn, cursor in connections:
+            self.pool.return_connection(conn, cursor)
+
+    def test_waiters_are_served_in_order(self):
+        """Test that returned connections are handed to waiting threads first come, first served."""
+        connections = self.exhaust_pool()
+        conn, cursor = connections.pop()
+        served = []
+
+        def wait_for_connection(name):
+            db_conn, db_cursor = self.pool.get_connection(timeout=2)
+            served.append(name)
+            self.pool.return_connection(db_conn, db_cursor)
+
+        threads = []
+        for name in ("first", "second", "third"):
+            thread = threading.Thread(target=wait_for_connection, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Make sure threads join the queue in a known order
+            while len(self.pool.waiters) < len(threads):
+                time.sleep(0.005)
+
+        self.pool.return_connection(conn, cursor)
+        for thread in threads:
+            thread.join(timeout=2)
+
+        self.assertEqual(served, ["first", "second", "third"])
+        for db_conn, db_cursor in connections:
+            self.pool.return_connection(db_conn, db_cursor)
+        self.assertEqual(self.pool.used_connection, 0)
+
+    def test_close(self):
+        """Test that a closed pool fails waiters, refuses checkouts and closes returned connections."""
+        connections = self.exhaust_pool()
+        errors = []
+
+        def wait_for_connection():
+            try:
+                self.pool.get_connection(timeout=5)
+            except PoolClosedError as e:
+                errors.append(e)
+
+        waiting_thread = threading.Thread(target=wait_for_connection)
+        waiting_thread.start()
+        while not self.pool.waiters:
+            time.sleep(0.005)
+
+        start_time = time.monotonic()
+        self.pool.close()
+        waiting_thread.join(timeout=2)
+        self.assertLess(time.monotonic() - start_time, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(self.pool.waiters), 0)
+        self.assertIsNone(self.pool.reaper_thread)
+
+        with self.assertRaises(PoolClosedError):
+            self.pool.get_connection()
+
+        conn, cursor = connections.pop()
+        self.pool.return_connection(conn, cursor)
+        self.assertEqual(len(self.pool.open_connections), 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1;")
+
+        for db_conn, db_cursor in connections:
+            self.pool.return_connection(db_conn, db_cursor)
+        self.assertEqual(self.pool.used_connection, 0)
+
+    def test_connection_context_manager(self):
+        """Test that the context manager returns connections and closes failing ones."""
+        with self.pool.connection() as (conn, cursor):
+            cursor.execute("SELECT 1;")
+            self.assertIn(conn, self.pool.checked_out)
+        self.assertNotIn(conn, self.pool.checked_out)
+        self.assertEqual(self.pool.used_connection, 0)
+
+        with self.assertRaises(ValueError):
+            with self.pool.connection() as (conn, cursor):
+                raise ValueError("Simulated failure")
+        self.assertNotIn(conn, self.pool.checked_out)
+        self.assertNotIn(conn, [entry[0] for entry in self.pool.open_connections])
+
+    def test_leak_detection_in_debug_mode(self):
+        """Test that debug mode records the checkout stack of long-held connections."""
+        self.pool.debug = True
+        conn, cursor = self.pool.get_connection()
+        connections = self.exhaust_pool()
+
+        leaks = self.pool.find_leaked_connections(threshold=0)
+        self.assertEqual(len(leaks), self.pool.used_connection)
+        held_for, stack = leaks[0]
+        self.assertGreaterEqual(held_for, 0)
+        self.assertIn("test_leak_detection_in_debug_mode", stack)
+
+        with self.assertRaises(PoolTimeoutError) as context:
+            self.pool.get_connection(timeout=0.05)
+        self.assertIn("test_leak_detection_in_debug_mode", str(context.exception))
+
+        self.pool.return_connection(conn, cursor)
+        for db_conn, db_cursor in connections:
+            self.pool.return_connection(db_conn, db_cursor)
+        self.assertEqual(self.pool.find_leaked_connections(threshold=0), [])
+
+    def test_metrics_snapshot(self):
+        """Test that checkouts, hold times, peak usage and churn are recorded in metrics."""
+        connections = [self.pool.get_connection() for _ in range(self.pool.min_connections + 1)]
+        conn, cursor = connections.pop()
+        self.pool.close_failing_connection(conn, cursor)
+        for conn, cursor in connections:
+            self.pool.return_connection(conn, cursor)
+
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics["in_use"], 0)
+        self.assertEqual(metrics["peak_in_use"], self.pool.min_connections + 1)
+        self.assertEqual(metrics["checkouts"], self.pool.min_connections + 1)
+        self.assertEqual(metrics["connections_created"], self.pool.min_connections + self.pool.growth_step)
+        self.assertEqual(metrics["connections_closed"], 1)
+        self.assertEqual(metrics["failure_closes"], 1)
+        self.assertEqual(metrics["wait_time"]["count"], self.pool.min_connections + 1)
+        self.assertEqual(metrics["hold_time"]["count"], self.pool.min_connections + 1)
+
+        self.pool.close_all_connections()
+        metrics = self.pool.get_metrics()
+        self.assertEqual(metrics["connections_closed"], metrics["connections_created"])
+
+    def test_adaptive_sizing_grows_under_load(self):
+        """Test that adaptive resize raises and pre-warms the floor after a demand peak."""
+        connections = [self.pool.get_connection() for _ in range(self.pool.min_connections + 2)]
+        peak = self.pool.used_connection
+        self.pool.window_slow_checkouts = 1
+        growth_step = self.pool.growth_step
+
+        self.pool.adjust_pool_size()
+
+        self.assertEqual(self.pool.growth_step, min(growth_step * 2, config.pool.ADAPTIVE_MAX_GROWTH_STEP))
+        self.assertEqual(
+            self.pool.min_connections,
+            min(peak + self.pool.growth_step, config.pool.ADAPTIVE_MAX_FLOOR),
+        )
+        self.assertGreaterEqual(len(self.pool.open_connections), self.pool.min_connections)
+
+        for conn, cursor in connections:
+            self.pool.return_connection(conn, cursor)
+
+    def test_adaptive_sizing_shrinks_when_idle(self):
+        """Test that adaptive resize lowers the floor and lets idle connections be released."""
+        self.pool.min_connections = 20
+        self.pool.adjust_pool_size()
+        self.assertEqual(self.pool.min_connections, 10)
+        self.assertEqual(self.pool.growth_step, max(config.pool.GROWTH_STEP // 2, 1))
+
+        # Repeated idle windows converge on the lower bound
+        for _ in range(10):
+            self.pool.adjust_pool_size()
+        self.assertEqual(self.pool.min_connections, config.pool.ADAPTIVE_MIN_FLOOR)
+
+        self.pool.idle_timeout = 0
+        time.sleep(0.01)
+        self.pool.close_idle_connections()
+        self.assertEqual(len(self.pool.open_connections), config.pool.ADAPTIVE_MIN_FLOOR)
+
+    def test_thread_affinity(self):
+        """Test that in thread-affine mode each thread keeps its own connection until it exits."""
+        self.pool.thread_affinity = True
+        conn, cursor = self.pool.get_connection()
+        self.pool.return_connection(conn, cursor)
+
+        # The connection stays bound to this thread and counted as used
+        self.assertIs(self.pool.get_connection()[0], conn)
+        self.assertEqual(self.pool.used_connection, 1)
+
+        other_thread_connections = []
+
+        def worker():
+            db_conn, db_cursor = self.pool.get_connection()
+            self.pool.return_connection(db_conn, db_cursor)
+            other_thread_connections.append(db_conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        gc.collect()
+
+        self.assertIsNot(other_thread_connections[0], conn)
+        # Connection of the finished thread is reclaimed by the pool
+        self.assertNotIn(other_thread_connections[0], self.pool.checked_out)
+        self.assertEqual(self.pool.used_connection, 1)
+
+        self.pool.release_thread_connection()
+        self.assertEqual(self.pool.used_connection, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
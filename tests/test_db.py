@@ -187,10 +187,12 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(
             db.check_value(check_user_acc_type_query, ("testUser1",))[0][0], "admin"
         )
+        self.assertTrue(db.check_account_type_in_db("admin"))
         self.assertTrue(db.modify_db("testUser1", "account_type", "user"))
         self.assertEqual(
             db.check_value(check_user_acc_type_query, ("testUser1",))[0][0], "user"
         )
+        self.assertFalse(db.check_account_type_in_db("admin"))
 
         # Invalid operations
         with self.assertRaises(ValueError):
@@ -241,6 +243,62 @@ class TestDatabase(unittest.TestCase):
             else:
                 self.assertRaises(OverflowError)
 
+    def test_group_operations(self):
+        """Test creating groups, managing members and storing group messages in many inboxes."""
+        db = Database()
+        self.assertTrue(db.create_group("testGroup", "testUser1"))
+        self.assertFalse(db.create_group("testGroup", "testUser2"))
+        self.assertEqual(db.get_group("testGroup"), {"owner": "testUser1", "members": ["testUser1"]})
+        self.assertIsNone(db.get_group("Non Existing Group"))
+
+        self.assertTrue(db.add_group_member("testGroup", "testUser2"))
+        self.assertCountEqual(db.get_group("testGroup")["members"], ["testUser1", "testUser2"])
+        self.assertTrue(db.remove_group_member("testGroup", "testUser2"))
+        self.assertFalse(db.remove_group_member("testGroup", "testUser2"))
+
+        # Groups cannot grow beyond the member limit
+        conn = sqlite3.connect(Database.DB_FILE)
+        conn.executemany(
+            "INSERT INTO users (username, password, account_type) VALUES (?, 'password', 'user')",
+            [(f"member{i}",) for i in range(config.database.MAX_GROUP_MEMBERS)],
+        )
+        conn.commit()
+        conn.close()
+        for i in range(config.database.MAX_GROUP_MEMBERS - 1):
+            self.assertTrue(db.add_group_member("testGroup", f"member{i}"))
+        self.assertFalse(db.add_group_member("testGroup", "testUser2"))
+
+        # Full inboxes and unknown users are reported, others get the message
+        for i in range(config.database.MAX_INBOX_SIZE):
+            db.add_msg_to_db("testUser2", "testUser1", f"Test Message{i}")
+        not_stored = db.add_msgs_to_inboxes(["testUser1", "testUser2", "Non Existing User"], "testUser1", "Group Message")
+        self.assertEqual(not_stored, ["testUser2", "Non Existing User"])
+        self.assertEqual(db.check_user_inbox("testUser1"), 1)
+        self.assertEqual(db.read_msg_from_inbox("testUser1")[0]["Text"], "Group Message")
+
+        with self.assertRaises(Exception):
+            db.add_msgs_to_inboxes(["testUser1"], "Non Existing Sender", "Group Message")
+
+
+    def test_broadcast_message(self):
+        """Test storing a broadcast in chunks, skipping the sender, skipped users and full inboxes."""
+        db = Database()
+        for i in range(config.database.MAX_INBOX_SIZE):
+            db.add_msg_to_db("testUser2", "testUser1", f"Test Message{i}")
+        self.assertEqual(db.get_account_type("testUser1"), "admin")
+        self.assertIsNone(db.get_account_type("Non Existing User"))
+
+        # One user per chunk, only the user with empty name has room in the inbox
+        self.assertEqual(db.broadcast_message("testUser1", "Broadcast", chunk_size=1), 1)
+        self.assertEqual(db.check_user_inbox("testUser1"), 0)
+        self.assertEqual(db.read_msg_from_inbox("")[0]["Text"], "Broadcast")
+
+        self.assertEqual(db.broadcast_message("testUser1", "Broadcast", skip=[""]), 0)
+        self.assertEqual(db.check_user_inbox(""), 0)
+
+        with self.assertRaises(Exception):
+            db.broadcast_message("Non Existing Sender", "Broadcast")
+
 
 class TestDbHelper(unittest.TestCase):
     """Test suite for DbHelper class"""
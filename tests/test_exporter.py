@@ -0,0 +1,77 @@
+"""Test suite for metrics exporter module"""
+
+import os
+import unittest
+import urllib.error
+import urllib.request
+from config import config
+from connection_pool import ConnectionPool
+from db import Database
+from exporter import CONTENT_TYPE, format_labels, render_metrics, start_exporter
+from server import Server
+
+
+class TestExporter(unittest.TestCase):
+    """Test suite for the Prometheus metrics exporter"""
+
+    def setUp(self):
+        self.original_db_path = Database.DB_FILE
+        Database.DB_FILE = config.tests.TEST_DB_FILE
+        ConnectionPool.DB_FILE = config.tests.TEST_DB_FILE
+        self.server = Server()
+        self.server.metrics.record_request("Message", 0.003)
+
+    def tearDown(self):
+        self.server.push_executor.shutdown(wait=False)
+        self.server.db_helper.db.CONNECTION_POOL.close_all_connections()
+        Database.DB_FILE = self.original_db_path
+        ConnectionPool.DB_FILE = self.original_db_path
+        try:
+            os.remove(config.tests.TEST_DB_FILE)
+        except OSError:
+            pass
+
+    def test_format_labels(self):
+        """Test that label values are quoted and special characters escaped."""
+        self.assertEqual(format_labels({}), "")
+        self.assertEqual(format_labels({"header": "Message"}), '{header="Message"}')
+        self.assertEqual(format_labels({"a": 'x"y\\z\n'}), '{a="x\\"y\\\\z\\n"}')
+
+    def test_render_metrics(self):
+        """Test that server, Argon2 and connection pool metrics are rendered."""
+        lines = render_metrics(self.server).splitlines()
+
+        self.assertIn("# TYPE chat_request_duration_seconds histogram", lines)
+        self.assertIn('chat_request_duration_seconds_count{header="Message"} 1', lines)
+        self.assertIn('chat_request_duration_seconds_bucket{header="Message",le="+Inf"} 1', lines)
+        self.assertIn("chat_argon2_in_progress 0", lines)
+        self.assertIn("chat_connections_active 0", lines)
+        self.assertIn("chat_pool_connections_in_use 0", lines)
+        self.assertIn("# TYPE chat_pool_checkouts_total counter", lines)
+        self.assertTrue(any(line.startswith("chat_pool_wait_seconds_count ") for line in lines))
+
+        # Every family is described once
+        type_lines = [line for line in lines if line.startswith("# TYPE")]
+        self.assertEqual(len(type_lines), len(set(type_lines)))
+
+    def test_metrics_endpoint(self):
+        """Test that metrics are served over HTTP at /metrics only."""
+        httpd = start_exporter(self.server, "127.0.0.1", 0)
+        try:
+            url = f"http://127.0.0.1:{httpd.server_address[1]}"
+            with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.headers["Content-Type"], CONTENT_TYPE)
+                self.assertIn('header="Message"', response.read().decode("utf-8"))
+
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(f"{url}/other", timeout=5)
+            self.assertEqual(context.exception.code, 404)
+            context.exception.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Test suite for the load generator"""
+
+import asyncio
+import time
+import unittest
+from loadgen import LoadGenerator, LoadStats, SimulatedUser, parse_mix
+
+
+class TestLoadGenerator(unittest.TestCase):
+    """Test suite for load generator mix parsing and reporting"""
+
+    def test_parse_mix(self):
+        """Test that operation weights are parsed and invalid mixes rejected."""
+        self.assertEqual(
+            parse_mix("login=1, send=4"),
+            {"register": 0.0, "login": 1.0, "send": 4.0, "inbox": 0.0},
+        )
+        with self.assertRaises(ValueError):
+            parse_mix("logout=1")
+        with self.assertRaises(ValueError):
+            parse_mix("send=-1")
+        with self.assertRaises(ValueError):
+            parse_mix("send=0")
+
+    def test_report(self):
+        """Test that the report holds throughput, error rate and percentiles per operation."""
+        stats = LoadStats()
+        for _ in range(9):
+            stats.record("send", 0.004, True)
+        stats.record("send", 0.2, False)
+
+        report = stats.report(elapsed=2.0)
+        send_line = next(line for line in report.splitlines() if line.startswith("send"))
+        self.assertEqual(send_line.split()[1:4], ["10", "5.0", "10.0%"])
+        self.assertNotIn("inbox", report)
+        self.assertIn("Total: 10 operations in 2.0s, 5.0 ops/s, 10.0% errors", report)
+
+    def test_open_loop_schedule(self):
+        """Test that slow replies neither lower the sending rate nor hide queueing from latencies."""
+        generator = LoadGenerator(mix=parse_mix("send=1"))
+        user = SimulatedUser(generator, "test_user")
+
+        async def slow_send():
+            await asyncio.sleep(0.1)
+            return True
+
+        user.send = slow_send
+        start = time.monotonic()
+        asyncio.run(user.run(start, start + 0.5, rate=100.0))
+
+        snapshot = generator.stats.latency["send"].snapshot()
+        # A closed loop waiting for every reply would send about 5 requests
+        self.assertGreater(snapshot["count"], 25)
+        self.assertGreaterEqual(snapshot["p50"], 0.1)
+        self.assertEqual(generator.stats.errors["send"], 0)
+
+    def test_register_during_login(self):
+        """Test that a login sent while a registration is in progress does not switch users under it."""
+        generator = LoadGenerator(mix=parse_mix("register=1,login=1"))
+        user = SimulatedUser(generator, "old_user")
+        signed_in = []
+
+        async def authenticate(login, password):
+            signed_in.append(login)
+            await asyncio.sleep(0.01)
+            return {"is_registered": login != "new_user", "login_successfull": True}
+
+        async def set_account_type(login, password, acc_type):
+            await asyncio.sleep(0.01)
+            # The server changes the account of the user signed in last
+            return signed_in[-1] == login
+
+        user.client.authenticate = authenticate
+        user.client.set_account_type = set_account_type
+
+        async def scenario():
+            register = asyncio.create_task(user.register("new_user"))
+            await asyncio.sleep(0.005)
+            return await asyncio.gather(register, user.login())
+
+        self.assertEqual(asyncio.run(scenario()), [True, True])
+        self.assertEqual(signed_in, ["new_user", "new_user"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,8 @@ import os
 
 # Add parent directory to path to import message module
 # sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from message import Message, ErrorMessage
+from datetime import datetime
+from message import Message, ErrorMessage, JsonCodec, negotiate_format, get_json_serializer, orjson
 from config import config
 
 
@@ -47,6 +48,21 @@ class TestMessage(unittest.TestCase):
         self.assertEqual(new_message.sender, "TestUser1")
         self.assertEqual(new_message.receiver, "TestUser2")
 
+    def test_slot_based_messages(self):
+        """Test that messages are compact slot-based records decodable from memoryview buffers."""
+        message = Message("Command", "help", "TestUser1", "127.0.0.1")
+        error_msg = ErrorMessage("User not found", "server")
+        self.assertFalse(hasattr(message, "__dict__"))
+        self.assertFalse(hasattr(error_msg, "__dict__"))
+        with self.assertRaises(AttributeError):
+            message.extra_field = "value"
+
+        buffer = bytearray(message.encode_message())
+        decoded = Message()
+        self.assertTrue(decoded.decode_message(memoryview(buffer)))
+        self.assertEqual(decoded.text, "help")
+        self.assertEqual(decoded.receiver, "127.0.0.1")
+
     def test_error_message_creation(self):
         """Test ErrorMessage class specialized behavior."""
         error_msg = ErrorMessage("User not found", "server")
@@ -84,8 +100,47 @@ class TestMessage(unittest.TestCase):
 
         # Test with valid JSON but missing required fields
         incomplete_json = json.dumps({"Header": "test"})
-        with self.assertRaises(KeyError):
-            message.decode_message(incomplete_json)
+        self.assertFalse(message.decode_message(incomplete_json))
+
+    def test_non_message_json_rejected(self):
+        """Test that JSON which is not a message object is rejected instead of raising."""
+        message = Message()
+        self.assertFalse(message.decode_message(b"[1,2]"))
+        self.assertFalse(message.decode_message(b'{"Header":"x"}'))
+        self.assertFalse(message.decode_message(b"[" * 100000 + b"]" * 100000))
+        self.assertFalse(message.decode_message(b"\xff"))
+
+    def test_format_negotiation(self):
+        """Test that the most preferred common wire format is picked, with JSON as fallback."""
+        self.assertEqual(negotiate_format(["binary", "json"]), "json")
+        self.assertEqual(negotiate_format(["binary"]), "json")
+        self.assertEqual(negotiate_format(["json"]), "json")
+        self.assertEqual(negotiate_format(["unknown"]), "json")
+        self.assertEqual(negotiate_format([]), "json")
+
+    def test_json_backends_produce_compatible_output(self):
+        """Test that every available JSON backend encodes datetimes the same and decodes bytes."""
+        backends = ["json"] + (["orjson"] if orjson is not None else [])
+        inbox = [{"Sender": "TestUser1", "Text": "Hello", "Datetime": datetime(2025, 1, 2, 3, 4, 5)}]
+
+        for backend in backends:
+            codec = JsonCodec(get_json_serializer(backend))
+            encoded_bytes = codec.encode("Inbox_message", inbox, "127.0.0.1", "TestUser2")
+            self.assertIsInstance(encoded_bytes, bytes)
+
+            header, text, sender, receiver = codec.decode(memoryview(encoded_bytes))
+            self.assertEqual(header, "Inbox_message")
+            self.assertEqual(text[0]["Datetime"], "2025-01-02T03:04:05")
+            self.assertEqual(receiver, "TestUser2")
+
+    def test_unknown_json_backend(self):
+        """Test that requesting an unknown JSON backend fails loudly."""
+        with self.assertRaises(ValueError):
+            get_json_serializer("simplejson")
+        if orjson is None:
+            with self.assertRaises(ValueError):
+                get_json_serializer("orjson")
+        self.assertEqual(get_json_serializer("auto").name, "orjson" if orjson else "json")
 
 
 if __name__ == "__main__":
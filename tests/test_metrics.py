@@ -0,0 +1,86 @@
+"""Test suite for metrics module"""
+
+import threading
+import unittest
+from metrics import Histogram, ServerMetrics
+
+
+class TestHistogram(unittest.TestCase):
+    """Test suite for Histogram class"""
+
+    def test_empty_histogram(self):
+        """Test that an empty histogram reports zeroes instead of failing."""
+        histogram = Histogram()
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 0)
+        self.assertEqual(snapshot["mean"], 0.0)
+        self.assertEqual(snapshot["p99"], 0.0)
+
+    def test_observe_and_percentiles(self):
+        """Test that values land in correct buckets and percentiles are estimated from them."""
+        histogram = Histogram(buckets=(0.1, 0.5, 1.0))
+        for value in (0.05, 0.05, 0.05, 0.3, 0.7, 3.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [3, 1, 1, 1])
+        self.assertEqual(histogram.count, 6)
+        self.assertAlmostEqual(histogram.total, 4.15)
+        self.assertEqual(histogram.max, 3.0)
+        self.assertEqual(histogram.percentile(50), 0.1)
+        self.assertEqual(histogram.percentile(80), 1.0)
+        # Values above the highest bucket are reported as the observed maximum
+        self.assertEqual(histogram.percentile(100), 3.0)
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {0.1: 3, 0.5: 4, 1.0: 5})
+
+    def test_snapshot_during_observe(self):
+        """Test that a snapshot taken in the middle of an observation has count matching its buckets."""
+        histogram = Histogram(buckets=(0.1, 0.5))
+        histogram.observe(0.05)
+        # Another thread counted a value in its bucket, but did not update the count yet
+        histogram.counts[0] += 1
+
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {0.1: 2, 0.5: 2})
+        self.assertEqual(snapshot["count"], 2)
+
+
+class TestServerMetrics(unittest.TestCase):
+    """Test suite for ServerMetrics class"""
+
+    def test_merged_snapshot(self):
+        """Test that metrics of all threads are merged, with shards of finished threads folded together."""
+        metrics = ServerMetrics(rate_window=0)
+
+        def serve_client():
+            for _ in range(3):
+                metrics.record_request("Message", 0.002)
+
+        for _ in range(2):
+            thread = threading.Thread(target=serve_client)
+            thread.start()
+            thread.join()
+        metrics.record_request("Command", 0.0004)
+        # Shards of both finished client threads were folded when this thread recorded
+        self.assertEqual(len(metrics.shards), 1)
+        self.assertEqual(metrics.retired.requests["Message"].count, 6)
+
+        with metrics.hashing():
+            in_progress = metrics.snapshot()["argon2"]["in_progress"]
+        self.assertEqual(in_progress, 1)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["requests"]["Message"]["count"], 6)
+        self.assertEqual(snapshot["requests"]["Message"]["p50"], 0.002)
+        self.assertEqual(snapshot["requests"]["Command"]["count"], 1)
+        self.assertGreater(snapshot["requests"]["Message"]["rate"], 0)
+        self.assertEqual(snapshot["argon2"]["count"], 1)
+        self.assertEqual(snapshot["argon2"]["in_progress"], 0)
+
+        # Rates are measured from the previous point once the window passed
+        self.assertEqual(metrics.snapshot()["requests"]["Message"]["rate"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
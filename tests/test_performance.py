@@ -9,6 +9,7 @@ import string
 import socket
 import os
 import resource
+from datetime import datetime
 from asciichartpy import plot
 from db import Database, DbHelper
 from server import Server
@@ -16,7 +17,7 @@ from client import Client
 from connection import Connection
 from config import config
 from connection_pool import ConnectionPool
-from message import Message
+from message import Message, JsonCodec, get_json_serializer, orjson
 
 
 class TestPerformance(unittest.TestCase):
@@ -158,6 +159,43 @@ class TestPerformance(unittest.TestCase):
         print("-------------------------")
 
 
+    def test_json_backend_throughput(self):
+        """Compare JSON backends on encode/decode throughput and bytes on the wire for inbox replies."""
+        inbox = [
+            {
+                "Sender": f"testUser{i}",
+                "Text": "".join(random.choices(string.ascii_letters + " ", k=100)),
+                "Datetime": datetime(2025, 1, 1, 12, 0, 0),
+            }
+            for i in range(config.database.MAX_INBOX_SIZE)
+        ]
+        message = Message("Inbox_message", inbox, config.network.HOST, "testUser1")
+        iterations = 5000
+        results = {}
+
+        for backend in ["json"] + (["orjson"] if orjson is not None else []):
+            codec = JsonCodec(get_json_serializer(backend))
+            fields = (message.header, message.text, message.sender, message.receiver)
+            start_time = time.perf_counter()
+            for _ in range(iterations):
+                encoded_message = codec.encode(*fields)
+            encoding_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            for _ in range(iterations):
+                decoded = codec.decode(encoded_message)
+            decoding_time = time.perf_counter() - start_time
+
+            results[backend] = decoded
+            print(f"[{backend}] Encoded size: {len(encoded_message)} bytes")
+            print(f"[{backend}] Encoding: {iterations/encoding_time:.0f} messages per second")
+            print(f"[{backend}] Decoding: {iterations/decoding_time:.0f} messages per second")
+        print("-------------------------")
+
+        # Backends are interchangeable on the wire
+        self.assertEqual(len(set(map(repr, results.values()))), 1)
+
+
     def test_database_query_performance(self):
         """Test database operations with large numbers of users and messages."""
         # Create a database instance
@@ -211,7 +249,6 @@ class TestPerformance(unittest.TestCase):
         user_pool = [f"stressTestUser{i}" for i in range(30)]
         threads = []
         self.current_no_of_connections = []
-        self.max_no_of_connections = 0
         self.sending_requests = 0
         self.reading_requests = 0
 
@@ -222,22 +259,11 @@ class TestPerformance(unittest.TestCase):
             """Logging the behaviour and state of connection pool and other modules"""
             while not stop_event.is_set():
                 print(f"Time since test start: {int(time.time() - start_time)}")
-                available_connections = len(db.CONNECTION_POOL.open_connections)
-                used_connections = db.CONNECTION_POOL.used_connection
-
-                self.current_no_of_connections.append(available_connections + used_connections)
-                
-                if self.max_no_of_connections < available_connections + used_connections: 
-                    self.max_no_of_connections = available_connections + used_connections
+                pool_metrics = db.CONNECTION_POOL.get_metrics()
+                self.current_no_of_connections.append(pool_metrics["idle"] + pool_metrics["in_use"])
 
                 time.sleep(1)
 
-        def connection_cleanup():
-            while not stop_event.is_set():
-                db.CONNECTION_POOL.check_for_cleanup()
-                time.sleep(10)
-
-
         def sim_user_behaviour():
             username = random.choice(user_pool)
             while not stop_event.is_set():
@@ -280,9 +306,6 @@ class TestPerformance(unittest.TestCase):
         logging_thread = threading.Thread(target=logging)
         logging_thread.start()
 
-        cleaning_thread = threading.Thread(target=connection_cleanup)
-        cleaning_thread.start()
-
         for _ in range(num_threads):
             t = threading.Thread(target=sim_user_behaviour)
             threads.append(t)
@@ -308,7 +331,12 @@ class TestPerformance(unittest.TestCase):
             thread.join(timeout=10)
 
         print("###\n# LOGGING\n###")
-        print(f"Maximum number of connections at one time: {self.max_no_of_connections}")
+        pool_metrics = db.CONNECTION_POOL.get_metrics()
+        print(f"Maximum number of connections in use at one time: {pool_metrics['peak_in_use']}")
+        print(f"Connections created/closed: {pool_metrics['connections_created']}/{pool_metrics['connections_closed']}")
+        print(f"Failing connections closed: {pool_metrics['failure_closes']}")
+        print(f"Checkout wait time p50/p99: {pool_metrics['wait_time']['p50']:.4f}s/{pool_metrics['wait_time']['p99']:.4f}s")
+        print(f"Connection hold time p50/p99: {pool_metrics['hold_time']['p50']:.4f}s/{pool_metrics['hold_time']['p99']:.4f}s")
         print(f"Number of 'send message' requests: {self.sending_requests}")
         print(f"Number of 'read message' requests: {self.reading_requests}")
         print()
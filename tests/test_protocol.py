@@ -0,0 +1,114 @@
+"""Test suite for protocol module"""
+
+import unittest
+import socket
+import zlib
+from config import config
+from protocol import (
+    FrameReader,
+    FrameError,
+    pack_frame,
+    encode_frame,
+    decode_payload,
+    negotiate_compression,
+    FLAG_COMPRESSED,
+    FLAG_LEGACY,
+    FRAME_HEADER,
+)
+
+
+class DummySocket:
+    """Socket replacement returning prepared chunks from recv"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv(self, size):
+        return self.chunks.pop(0) if self.chunks else b""
+
+
+class TestFrameReader(unittest.TestCase):
+    """Test suite for FrameReader class"""
+
+    def test_frames_split_and_merged_across_packets(self):
+        """Test that frames are reassembled regardless of how packets split the stream."""
+        stream = pack_frame(b'{"a": 1}') + pack_frame(b"zlib", FLAG_COMPRESSED)
+        reader = FrameReader(DummySocket([stream[:3], stream[3:12], stream[12:]]))
+
+        self.assertEqual(reader.read_frame(), (0, b'{"a": 1}'))
+        self.assertEqual(reader.read_frame(), (FLAG_COMPRESSED, b"zlib"))
+        self.assertIsNone(reader.read_frame())
+
+    def test_legacy_json_messages(self):
+        """Test that bare JSON from peers without framing is still accepted and answered bare."""
+        reader = FrameReader(DummySocket([b'{"Header": "Command"}']))
+        self.assertEqual(reader.read_frame(), (FLAG_LEGACY, b'{"Header": "Command"}'))
+        self.assertEqual(pack_frame(b"{}", FLAG_LEGACY), b"{}")
+
+    def test_frames_larger_than_buffer(self):
+        """Test that the reusable buffer grows for frames which do not fit it, using recv_into on real sockets."""
+        sender, receiver = socket.socketpair()
+        try:
+            large_payload = b"x" * (config.network.BUFFER_SIZE * 3)
+            sender.sendall(pack_frame(b"small") + pack_frame(large_payload) + pack_frame(b"after"))
+            reader = FrameReader(receiver)
+
+            self.assertEqual(reader.read_frame(), (0, b"small"))
+            flags, payload = reader.read_frame()
+            self.assertIsInstance(payload, memoryview)
+            self.assertEqual(payload, large_payload)
+            self.assertEqual(reader.read_frame(), (0, b"after"))
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_oversized_frame_rejected(self):
+        """Test that frames announcing more than the maximum frame size are refused."""
+        header = FRAME_HEADER.pack(config.network.MAX_FRAME_SIZE + 1, 0)
+        reader = FrameReader(DummySocket([header]))
+        with self.assertRaises(FrameError):
+            reader.read_frame()
+
+
+class TestCompression(unittest.TestCase):
+    """Test suite for frame compression"""
+
+    def test_large_payloads_compressed(self):
+        """Test that only payloads above the threshold are compressed, and only when agreed."""
+        large_payload = b'{"Text": "repeated inbox content"}' * 100
+        small_payload = b'{"Text": "short"}'
+
+        frame = encode_frame(large_payload, 0, "zlib")
+        length, flags = FRAME_HEADER.unpack_from(frame)
+        self.assertEqual(flags, FLAG_COMPRESSED)
+        self.assertLess(length, len(large_payload))
+        self.assertEqual(decode_payload(flags, frame[FRAME_HEADER.size:]), large_payload)
+
+        self.assertEqual(encode_frame(small_payload, 0, "zlib"), pack_frame(small_payload))
+        self.assertEqual(encode_frame(large_payload, 0, None), pack_frame(large_payload))
+        self.assertEqual(encode_frame(large_payload, FLAG_LEGACY, "zlib"), large_payload)
+
+    def test_decompression_limits(self):
+        """Test that corrupted, truncated or oversized compressed payloads are rejected."""
+        with self.assertRaises(FrameError):
+            decode_payload(FLAG_COMPRESSED, b"not compressed")
+
+        compressed = zlib.compress(b"A" * 5000 + bytes(range(256)) * 20)
+        with self.assertRaises(FrameError):
+            decode_payload(FLAG_COMPRESSED, compressed[:-10])
+        with self.assertRaises(FrameError):
+            decode_payload(FLAG_COMPRESSED, compressed + b"extra")
+
+        bomb = zlib.compress(b"\0" * (config.network.MAX_FRAME_SIZE + 1))
+        with self.assertRaises(FrameError):
+            decode_payload(FLAG_COMPRESSED, bomb)
+
+    def test_compression_negotiation(self):
+        """Test that compression is used only if the peer supports a common method."""
+        self.assertEqual(negotiate_compression(["zlib"]), "zlib")
+        self.assertIsNone(negotiate_compression(["brotli"]))
+        self.assertIsNone(negotiate_compression([]))
+
+
+if __name__ == "__main__":
+    unittest.main()
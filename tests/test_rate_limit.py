@@ -0,0 +1,62 @@
+"""Test suite for token bucket rate limiting"""
+
+import unittest
+from unittest.mock import patch
+from rate_limit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test suite for RateLimiter class"""
+
+    def setUp(self):
+        self.limiter = RateLimiter([("Message", 2.0, 3)], max_buckets=2)
+
+    @patch("rate_limit.time.monotonic", return_value=100.0)
+    def test_burst_and_refill(self, mock_time):
+        """Test that a burst of requests is allowed, then requests pass at the refill rate."""
+        results = [self.limiter.allow("alice", "Message") for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+        # Half a second refills one token at two tokens per second
+        mock_time.return_value = 100.5
+        self.assertTrue(self.limiter.allow("alice", "Message"))
+        self.assertFalse(self.limiter.allow("alice", "Message"))
+
+        # Buckets never hold more tokens than the burst size
+        mock_time.return_value = 200.0
+        results = [self.limiter.allow("alice", "Message") for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    @patch("rate_limit.time.monotonic", return_value=100.0)
+    def test_delay(self, mock_time):
+        """Test that the delay until the next allowed request is reported without taking tokens."""
+        self.assertEqual(self.limiter.delay("alice", "Message"), 0.0)
+        for _ in range(3):
+            self.limiter.allow("alice", "Message")
+        self.assertEqual(self.limiter.delay("alice", "Message"), 0.5)
+        self.assertEqual(self.limiter.delay("alice", "Message"), 0.5)
+
+        mock_time.return_value = 100.25
+        self.assertEqual(self.limiter.delay("alice", "Message"), 0.25)
+        self.assertEqual(self.limiter.delay("alice", "Handshake"), 0.0)
+
+    @patch("rate_limit.time.monotonic", return_value=100.0)
+    def test_separate_buckets_and_eviction(self, mock_time):
+        """Test that identities and headers are limited separately, and idle buckets are evicted."""
+        for _ in range(3):
+            self.limiter.allow("alice", "Message")
+        self.assertFalse(self.limiter.allow("alice", "Message"))
+        self.assertTrue(self.limiter.allow("bob", "Message"))
+        # Headers without a limit are never throttled or tracked
+        self.assertTrue(self.limiter.allow("alice", "Handshake"))
+        self.assertEqual(len(self.limiter.buckets), 2)
+
+        # Alice used her bucket least recently, so it is evicted for a new one
+        self.limiter.allow("bob", "Message")
+        self.assertTrue(self.limiter.allow("carol", "Message"))
+        self.assertNotIn(("alice", "Message"), self.limiter.buckets)
+        self.assertEqual(len(self.limiter.buckets), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
 """Test suite for Server class"""
 
 import unittest
+import socket
+import threading
 import time
 import sqlite3
 import os
+from unittest.mock import patch
 from datetime import datetime, timedelta
 from server import Server, UserAuthenticator
 from config import config
@@ -11,6 +14,25 @@ from message import Message
 from connection import Connection
 from db import DbHelper, Database
 from connection_pool import ConnectionPool
+from protocol import FrameReader, encode_frame
+from sessions import ClientSession, OutboundQueueFull
+from rate_limit import RateLimiter
+from tests.test_sessions import StalledSocket
+
+
+class DummySocket:
+    """Socket double collecting sent bytes and replaying them on receive"""
+
+    def __init__(self):
+        self.sent = bytearray()
+
+    def sendall(self, data):
+        self.sent += data
+
+    def recv(self, size):
+        data = bytes(self.sent[:size])
+        del self.sent[:size]
+        return data
 
 
 class TestServer(unittest.TestCase):
@@ -145,6 +167,11 @@ class TestServer(unittest.TestCase):
         response = self.server.process_message(auth_message, self.connection)
         self.assertEqual(response.header, "Authentication_answer")
 
+        # Test heartbeat message
+        ping_message = Message("Ping", "Ping", "test_user", self.server.server_host)
+        response = self.server.process_message(ping_message, self.connection)
+        self.assertEqual(response.header, "Pong")
+
         # Test invalid header
         invalid_message = Message(
             "InvalidHeader", "test", "test_user", self.server.server_host
@@ -173,12 +200,72 @@ class TestServer(unittest.TestCase):
         self.assertEqual(response.header, "Command")
         self.assertIn("Server version", response.text)
 
+        # Test online command, listing signed in users page by page
+        for login in ("onlineUser1", "onlineUser2"):
+            self.server.sessions.register(login, ClientSession(DummySocket(), ("127.0.0.1", 0)))
+        online_msg = Message("Command", "online", "test_user", self.server.server_host)
+        response = self.server.handle_command(online_msg, self.connection)
+        self.assertEqual(response.header, "Online_users")
+        self.assertEqual(response.text["users"], ["onlineUser1", "onlineUser2"])
+        self.assertEqual(response.text["total"], 2)
+        self.assertIsNone(response.text["next"])
+
+        online_msg.text = "online onlineUser1"
+        response = self.server.handle_command(online_msg, self.connection)
+        self.assertEqual(response.text["users"], ["onlineUser2"])
+
         # Test stop command
         stop_msg = Message("Command", "stop", "test_user", self.server.server_host)
         response = self.server.handle_command(stop_msg, self.connection)
         self.assertEqual(response.header, "Stop")
         self.assertEqual(response.text, "Stop")
 
+    def test_handshake_handling(self):
+        """Test that the server agrees on the best wire format offered by the client."""
+        handshake_msg = Message("Handshake", {"formats": ["binary", "json"]}, "test_user", "Server")
+        response = self.server.process_message(handshake_msg, self.connection)
+        self.assertEqual(response.header, "Handshake_answer")
+        self.assertEqual(response.text["format"], "json")
+        self.assertIsNone(response.text["compression"])
+
+        handshake_msg = Message("Handshake", {"formats": ["binary"]}, "test_user", "Server")
+        self.assertEqual(self.server.process_message(handshake_msg, self.connection).text["format"], "json")
+
+        handshake_msg = Message(
+            "Handshake", {"formats": ["xml"], "compression": ["zlib"]}, "test_user", "Server"
+        )
+        response = self.server.process_message(handshake_msg, self.connection)
+        self.assertEqual(response.text["format"], "json")
+        self.assertEqual(response.text["compression"], "zlib")
+
+    def test_cached_command_replies(self):
+        """Test that static replies are reused from cache and encoded per receiver."""
+        first = self.server.handle_command(
+            Message("Command", "info", "test_user", "Server"), self.connection
+        )
+        second = self.server.handle_command(
+            Message("Command", "info", "other_user", "Server"), self.connection
+        )
+        self.assertIs(first.templates, second.templates)
+
+        for response in (first, second):
+            expected = Message(
+                response.header, response.text, response.sender, response.receiver
+            ).encode_message()
+            self.assertEqual(response.encode_message(), expected)
+
+        decoded = Message()
+        decoded.decode_message(second.encode_message())
+        self.assertEqual(decoded.receiver, "other_user")
+        self.assertEqual(decoded.text["Server version"], config.server.SERVER_VERSION)
+
+        # Uptime replies are rebuilt once their time-to-live expires
+        uptime_msg = Message("Command", "uptime", "test_user", "Server")
+        cached = self.server.handle_command(uptime_msg, self.connection)
+        self.assertIs(self.server.handle_command(uptime_msg, self.connection).templates, cached.templates)
+        self.server.response_cache.entries["uptime"] = (0,) + self.server.response_cache.entries["uptime"][1:]
+        self.assertIsNot(self.server.handle_command(uptime_msg, self.connection).templates, cached.templates)
+
     def test_uptime_calc(self):
         """Test uptime calculation accuracy and proper formatting of time components."""
         days, hours, minutes, seconds = self.server.calc_uptime()
@@ -211,14 +298,32 @@ class TestServer(unittest.TestCase):
         response = self.server.handle_authentication(auth_msg, self.connection)
         self.assertTrue(response.text["is_registered"])
 
+        # Test resuming the session with the issued token instead of the password
+        token = response.text["session_token"]
+        resume_msg = Message(
+            "Authentication", {"login": "new_test_user", "token": token}, "Authenticator", "Server"
+        )
+        response = self.server.process_message(resume_msg, self.connection)
+        self.assertTrue(response.text["login_successfull"])
+
+        resume_msg.text = {"login": "testUser1", "token": token}
+        response = self.server.process_message(resume_msg, self.connection)
+        self.assertFalse(response.text["login_successfull"])
+        self.assertNotIn("session_token", response.text)
+
     def test_message_sending_validation(self):
         """Test message sending with various scenarios including valid and invalid recipients and empty/full inboxes."""
         # First register a test receiver
         self.server.db_helper.register_new_user("test_receiver", "password_hash")
 
-        # Test sending message to valid recipient
         msg = Message("Message", "Test message content", "testUser1", "test_receiver")
-        response = self.server.handle_sending_message(msg, self.connection)
+        sender = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        response = self.server.handle_sending_message(msg, self.connection, sender)
+        self.assertEqual(response.text, "Sign in to send messages")
+
+        # Test sending message to valid recipient
+        self.server.sessions.register("testUser1", sender)
+        response = self.server.handle_sending_message(msg, self.connection, sender)
         self.assertEqual(response.header, "Status")
         # Should be True for successful message sending
         self.assertTrue(response.text)
@@ -227,10 +332,384 @@ class TestServer(unittest.TestCase):
         msg = Message(
             "Message", "Test message content", "testUser1", "non_existent_user"
         )
-        response = self.server.handle_sending_message(msg, self.connection)
+        response = self.server.handle_sending_message(msg, self.connection, sender)
         self.assertEqual(response.header, "Error")
         self.assertEqual(response.text, "Receiver not existing in database")
 
+    def test_push_delivery(self):
+        """Test that messages to signed in receivers are pushed, and stored for offline ones."""
+        session = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        auth_msg = Message("Authentication", {"login": "push_user", "password": "push_pass"}, "Authenticator", "Server")
+        self.server.process_message(auth_msg, self.connection, session)
+        self.assertEqual(session.login, "push_user")
+        self.assertTrue(self.server.sessions.is_online("push_user"))
+        sender = ClientSession(DummySocket(), ("127.0.0.1", 50001))
+        self.server.sessions.register("testUser1", sender)
+
+        # Messages come from the signed in user, whoever the client claims to be
+        msg = Message("Message", "Pushed message", "testUser2", "push_user")
+        response = self.server.process_message(msg, self.connection, sender)
+        self.assertEqual(response.header, "Status")
+        self.assertTrue(response.text)
+
+        flags, payload = FrameReader(session.conn).read_frame()
+        pushed = Message()
+        pushed.decode_message(payload)
+        self.assertEqual(pushed.header, "New_message")
+        self.assertEqual(pushed.text["Sender"], "testUser1")
+        self.assertEqual(pushed.text["Text"], "Pushed message")
+        # Pushed messages are not stored in the inbox
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "EMPTY")
+
+        # Offline receivers get the message in their inbox
+        self.server.sessions.unregister(session)
+        response = self.server.process_message(msg, self.connection, sender)
+        self.assertTrue(response.text)
+        self.assertEqual(session.conn.sent, b"")
+
+        # Inboxes are read by their signed in owner only
+        inbox_msg = Message("Command", "inbox", "push_user", "Server")
+        response = self.server.process_message(inbox_msg, self.connection)
+        self.assertEqual(response.text, "Sign in to read your inbox")
+        response = self.server.process_message(inbox_msg, self.connection, sender)
+        self.assertEqual(response.text, "Inbox empty")
+        self.server.sessions.register("push_user", session)
+        response = self.server.process_message(inbox_msg, self.connection, session)
+        self.assertEqual(response.header, "Inbox_message")
+        self.assertEqual(response.text[0]["Sender"], "testUser1")
+        self.assertEqual(response.text[0]["Text"], "Pushed message")
+
+    def test_undelivered_push_stored(self):
+        """Test that pushes still queued when a connection is closed are stored in the inbox."""
+        auth_msg = Message("Authentication", {"login": "push_user", "password": "push_pass"}, "Authenticator", "Server")
+        sign_in_session = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        self.server.process_message(auth_msg, self.connection, sign_in_session)
+        self.server.sessions.unregister(sign_in_session)
+        session = ClientSession(StalledSocket(), ("127.0.0.1", 50001), on_undelivered=self.server.store_undelivered)
+        session.start_writer()
+        self.server.sessions.register("push_user", session)
+
+        sender = ClientSession(DummySocket(), ("127.0.0.1", 50002))
+        self.server.sessions.register("testUser1", sender)
+        msg = Message("Message", "Queued message", "testUser1", "push_user")
+        self.assertTrue(self.server.process_message(msg, self.connection, sender).text)
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "EMPTY")
+
+        # Client never read the push before its connection was closed
+        session.close(timeout=0.05)
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "Queued message")
+
+    def test_congested_push_stored(self):
+        """Test that pushes to a client with a full outbound queue go to the inbox and keep it signed in."""
+        auth_msg = Message("Authentication", {"login": "push_user", "password": "push_pass"}, "Authenticator", "Server")
+        conn = StalledSocket()
+        session = ClientSession(conn, ("127.0.0.1", 50000))
+        session.start_writer()
+        self.server.process_message(auth_msg, self.connection, session)
+        # Large messages first, then small ones fill what is left of the queue
+        for size in (config.network.OUTBOUND_HIGH_WATER, 0):
+            filler = Message("New_message", "x" * size, "Server", "push_user")
+            with self.assertRaises(OutboundQueueFull):
+                while True:
+                    session.send(filler)
+
+        sender = ClientSession(DummySocket(), ("127.0.0.1", 50001))
+        self.server.sessions.register("testUser1", sender)
+        msg = Message("Message", "Pushed message", "testUser1", "push_user")
+        self.assertTrue(self.server.process_message(msg, self.connection, sender).text)
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "Pushed message")
+        self.assertEqual(session.login, "push_user")
+        self.assertTrue(self.server.sessions.is_online("push_user"))
+        conn.released.set()
+        session.close(timeout=5)
+
+    def test_push_after_executor_shutdown(self):
+        """Test that pushes after the drain deadline shut down the push executor go to the inbox."""
+        auth_msg = Message("Authentication", {"login": "push_user", "password": "push_pass"}, "Authenticator", "Server")
+        self.server.process_message(auth_msg, self.connection, ClientSession(DummySocket(), ("127.0.0.1", 50000)))
+        self.server.sessions.register("push_user", ClientSession(DummySocket(), ("127.0.0.1", 50001)))
+        sender = ClientSession(DummySocket(), ("127.0.0.1", 50002))
+        self.server.sessions.register("testUser1", sender)
+
+        self.server.push_executor.shutdown(wait=False, cancel_futures=True)
+        msg = Message("Message", "Late message", "testUser1", "push_user")
+        self.assertTrue(self.server.process_message(msg, self.connection, sender).text)
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "Late message")
+
+    def test_group_messaging(self):
+        """Test group management and fan-out of group messages to online and offline members."""
+        owner = ClientSession(DummySocket(), ("127.0.0.1", 50001))
+        member = ClientSession(DummySocket(), ("127.0.0.1", 50002))
+        create_msg = Message("Group", {"action": "create", "group": "testGroup"}, "testUser1", "Server")
+        response = self.server.process_message(create_msg, self.connection, owner)
+        self.assertEqual(response.text, "Sign in to use groups")
+
+        self.server.sessions.register("testUser1", owner)
+        self.server.sessions.register("testUser2", member)
+        self.assertTrue(self.server.process_message(create_msg, self.connection, owner).text)
+        response = self.server.process_message(create_msg, self.connection, owner)
+        self.assertEqual(response.text, "Group name already taken")
+
+        # Claiming to be the owner does not make a member one
+        add_msg = Message("Group", {"action": "add", "group": "testGroup", "member": "testUser2"}, "testUser1", "Server")
+        response = self.server.process_message(add_msg, self.connection, member)
+        self.assertEqual(response.text, "Only the group owner can add members")
+        self.assertTrue(self.server.process_message(add_msg, self.connection, owner).text)
+
+        members_msg = Message("Group", {"action": "members", "group": "testGroup"}, "testUser2", "Server")
+        response = self.server.process_message(members_msg, self.connection, member)
+        self.assertEqual(response.header, "Group_members")
+        self.assertEqual(response.text["owner"], "testUser1")
+        self.assertCountEqual(response.text["members"], ["testUser1", "testUser2"])
+
+        # Online member gets the message pushed, offline member stored in the inbox
+        self.server.process_message(
+            Message("Authentication", {"login": "push_user", "password": "push_pass"}, "Authenticator", "Server"),
+            self.connection,
+        )
+        add_msg.text = {"action": "add", "group": "testGroup", "member": "push_user"}
+        self.server.process_message(add_msg, self.connection, owner)
+        session = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        self.server.sessions.register("push_user", session)
+        # Member signed out, so the message is stored in the inbox
+        self.server.sessions.unregister(member)
+
+        group_msg = Message("Group_message", "Hello group", "testUser1", "testGroup")
+        response = self.server.process_message(group_msg, self.connection, owner)
+        self.assertEqual(response.header, "Status")
+        self.assertEqual(response.text, {"pushed": 1, "stored": 1, "inbox_full": []})
+
+        flags, payload = FrameReader(session.conn).read_frame()
+        pushed = Message()
+        pushed.decode_message(payload)
+        self.assertEqual(pushed.text["Group"], "testGroup")
+        self.assertEqual(pushed.text["Text"], "Hello group")
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("testUser2")[0]["Text"], "Hello group")
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "EMPTY")
+
+        # Members who left cannot send to the group
+        self.server.sessions.register("testUser2", member)
+        leave_msg = Message("Group", {"action": "leave", "group": "testGroup"}, "testUser2", "Server")
+        self.assertTrue(self.server.process_message(leave_msg, self.connection, member).text)
+        group_msg.sender = "testUser2"
+        response = self.server.process_message(group_msg, self.connection, member)
+        self.assertEqual(response.text, "You are not a member of this group")
+
+    def test_broadcast(self):
+        """Test that admins broadcast to all users, pushing to online and storing for offline ones."""
+        self.server.process_message(
+            Message("Authentication", {"login": "push_user", "password": "push_pass"}, "Authenticator", "Server"),
+            self.connection,
+        )
+        receiver_session = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        self.server.sessions.register("push_user", receiver_session)
+        admin_session = ClientSession(DummySocket(), ("127.0.0.1", 50001))
+        broadcast_msg = Message("Command", "broadcast Server maintenance", "testUser1", "Server")
+
+        # Admin rights need a signed in sender
+        response = self.server.process_message(broadcast_msg, self.connection, admin_session)
+        self.assertEqual(response.text, "Sign in to broadcast messages")
+        self.server.sessions.register("testUser2", admin_session)
+        broadcast_msg.sender = "testUser2"
+        response = self.server.process_message(broadcast_msg, self.connection, admin_session)
+        self.assertEqual(response.text, "Only admins can broadcast messages")
+
+        self.server.sessions.register("testUser1", admin_session)
+        broadcast_msg.sender = "testUser1"
+        response = self.server.process_message(broadcast_msg, self.connection, admin_session)
+        self.assertEqual(response.header, "Status")
+        # Pushed to push_user, stored for testUser2 and the user with empty name
+        self.assertEqual(response.text, {"pushed": 1, "stored": 2})
+
+        flags, payload = FrameReader(receiver_session.conn).read_frame()
+        pushed = Message()
+        pushed.decode_message(payload)
+        self.assertEqual(pushed.text["Text"], "Server maintenance")
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("testUser2")[0]["Text"], "Server maintenance")
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("push_user")[0]["Text"], "EMPTY")
+        self.assertEqual(self.server.db_helper.get_msg_from_inbox("testUser1")[0]["Text"], "EMPTY")
+
+    def test_rate_limiting(self):
+        """Test that requests over the limit get an error reply without reaching handlers."""
+        self.server.address_limiter = RateLimiter([("Authentication", 0.001, 2), ("Message", 0.001, 1)])
+        self.server.user_limiter = RateLimiter([("Message", 0.001, 2)])
+        auth_msg = Message("Authentication", {"login": "limited_user", "password": "limited_pass"}, "Authenticator", "Server")
+        session = ClientSession(DummySocket(), ("10.0.0.1", 50000))
+        for _ in range(2):
+            response = self.server.process_message(auth_msg, self.connection, session)
+            self.assertEqual(response.header, "Authentication_answer")
+
+        self.server.db_helper = None
+        response = self.server.process_message(auth_msg, self.connection, session)
+        self.assertEqual(response.header, "Error")
+        self.assertEqual(response.text, "Too many Authentication requests, try again later")
+        self.server.db_helper = DbHelper()
+
+        # Sign ins to the same login from another address are not affected
+        other = ClientSession(DummySocket(), ("10.0.0.2", 50000))
+        self.assertEqual(self.server.process_message(auth_msg, self.connection, other).header, "Authentication_answer")
+
+        # Signed in users are limited by login, whatever sender they claim, on top of their address
+        msg = Message("Message", "Hello", "testUser1", "testUser2")
+        self.server.process_message(msg, self.connection, session)
+        msg.sender = "testUser2"
+        response = self.server.process_message(msg, self.connection, session)
+        self.assertEqual(response.text, "Too many Message requests, try again later")
+        self.server.process_message(msg, self.connection, other)
+        self.server.address_limiter = RateLimiter([])
+        response = self.server.process_message(msg, self.connection, other)
+        self.assertEqual(response.text, "Too many Message requests, try again later")
+
+        # Exempt addresses are only limited per user
+        self.server.address_limiter = RateLimiter([("Authentication", 0.001, 1)])
+        self.server.rate_limit_exempt = frozenset({"10.0.0.3"})
+        exempt = ClientSession(DummySocket(), ("10.0.0.3", 50000))
+        for _ in range(3):
+            self.assertEqual(self.server.process_message(auth_msg, self.connection, exempt).header, "Authentication_answer")
+
+    def test_account_type_changes(self):
+        """Test that account types are changed only by signed in users, confirmed with their password."""
+        self.server.user_limiter = RateLimiter([])
+        first = ClientSession(DummySocket(), ("127.0.0.1", 50001))
+        second = ClientSession(DummySocket(), ("127.0.0.1", 50002))
+
+        def acc_type(session, login, password, account_type):
+            text = {"login": login, "password": password, "acc_type": account_type}
+            return self.server.process_message(Message("Acc_type", text, "Client", "Server"), self.connection, session)
+
+        self.assertEqual(acc_type(first, "acc_user1", "pass1", "user").text, "Sign in to change account types")
+        for session, login, password in ((first, "acc_user1", "pass1"), (second, "acc_user2", "pass2")):
+            auth_msg = Message("Authentication", {"login": login, "password": password}, "Authenticator", "Server")
+            self.server.process_message(auth_msg, self.connection, session)
+
+        self.assertEqual(acc_type(first, "acc_user1", "wrong", "user").text, "Wrong password")
+        self.assertTrue(acc_type(first, "acc_user1", "pass1", "user").text["update_status"])
+        response = acc_type(first, "acc_user2", "pass1", "user")
+        self.assertEqual(response.text, "Only admins can change account types of other users")
+        self.assertEqual(acc_type(first, "acc_user1", "pass1", "admin").text, "Only admins can grant admin rights")
+
+        # Without any admin, the first one makes themselves admin, and then manages others
+        self.db.modify_db("testUser1", "account_type", "user")
+        self.assertTrue(acc_type(first, "acc_user1", "pass1", "admin").text["update_status"])
+        self.assertEqual(acc_type(second, "acc_user2", "pass2", "admin").text, "Only admins can grant admin rights")
+        self.assertTrue(acc_type(first, "acc_user2", "pass1", "admin").text["update_status"])
+        self.assertEqual(self.server.db_helper.get_account_type("acc_user2"), "admin")
+
+    def test_failed_login_backoff(self):
+        """Test that failed sign ins slow down later ones to the login without refusing them."""
+        self.server.login_failures = RateLimiter([("Authentication", 0.001, 1)])
+        auth_msg = Message("Authentication", {"login": "backoff_user", "password": "right_pass"}, "Authenticator", "Server")
+        wrong_msg = Message("Authentication", {"login": "backoff_user", "password": "wrong_pass"}, "Authenticator", "Server")
+        with patch("server.time.sleep") as mock_sleep:
+            self.assertTrue(self.server.process_message(auth_msg, self.connection).text["login_successfull"])
+            self.assertFalse(self.server.process_message(wrong_msg, self.connection).text["login_successfull"])
+            mock_sleep.assert_not_called()
+
+            # The failure used up the login budget, so the right password still works, only later
+            self.assertTrue(self.server.process_message(auth_msg, self.connection).text["login_successfull"])
+            mock_sleep.assert_called_once_with(config.security.LOGIN_BACKOFF_MAX)
+
+    def test_malformed_frames(self):
+        """Test that undecodable requests are answered with errors and the client stays connected."""
+        server_side, client_side = socket.socketpair()
+        client_side.settimeout(5)
+        client_thread = threading.Thread(
+            target=self.server.handle_client, args=(server_side, ("127.0.0.1", 50000), self.connection)
+        )
+        client_thread.start()
+
+        client_side.sendall(
+            encode_frame(b"[1,2]")
+            + encode_frame(b'{"Header":"x"}')
+            + encode_frame(b"\xff\xfe")
+            + encode_frame(Message(["Command"], "info", "test_user", "Server").encode_message())
+            + encode_frame(Message("Command", "info", ["test_user"], "Server").encode_message())
+            + encode_frame(Message("Command", "bogus", "test_user", "Server").encode_message())
+            + encode_frame(Message("Command", "info", "test_user", "Server").encode_message())
+        )
+        reader = FrameReader(client_side)
+        replies = []
+        for _ in range(7):
+            reply = Message()
+            reply.decode_message(reader.read_frame()[1])
+            replies.append((reply.header, reply.text))
+
+        self.assertEqual(replies[:3], [("Error", "Invalid message format")] * 3)
+        self.assertEqual(replies[3], ("Error", "Invalid ['Command'] message: Header has invalid type"))
+        self.assertEqual(replies[4], ("Error", "Invalid Command message: Sender has invalid type"))
+        self.assertEqual(replies[5], ("Error", "Unknown command: bogus"))
+        self.assertEqual(replies[6][0], "Command")
+        client_side.close()
+        client_thread.join(timeout=5)
+        self.assertFalse(client_thread.is_alive())
+
+    def test_graceful_drain(self):
+        """Test that stopping answers the request in progress, notifies clients and closes connections."""
+        server_side, client_side = socket.socketpair()
+        client_side.settimeout(5)
+        client_thread = threading.Thread(
+            target=self.server.handle_client, args=(server_side, ("127.0.0.1", 50000), self.connection)
+        )
+        self.server.client_threads.add(client_thread)
+        client_thread.start()
+
+        client_side.sendall(encode_frame(Message("Command", "info", "test_user", "Server").encode_message()))
+        reader = FrameReader(client_side)
+        headers = []
+        while True:
+            frame = reader.read_frame()
+            if frame is None:
+                break
+            reply = Message()
+            reply.decode_message(frame[1])
+            headers.append(reply.header)
+            if reply.header == "Command":
+                # Reply received, so the client is connected and idle
+                self.server.drain(deadline=5)
+
+        self.assertEqual(headers, ["Command", "Shutdown"])
+        self.assertFalse(client_thread.is_alive())
+        self.assertEqual(self.server.client_sessions, set())
+        self.assertEqual(len(self.server.db_helper.db.CONNECTION_POOL.open_connections), 0)
+        self.assertTrue(self.server.db_helper.db.CONNECTION_POOL.closed)
+        client_side.close()
+        # The shared database lost its pool, so later tests get a new one
+        Database._instance = None
+
+    def test_stats_command(self):
+        """Test that signed in admins get load statistics."""
+        session = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        stats_msg = Message("Command", "stats", "testUser1", "Server")
+        response = self.server.process_message(stats_msg, self.connection, session)
+        self.assertEqual(response.text, "Only admins can view server statistics")
+
+        self.server.sessions.register("testUser1", session)
+        self.server.metrics.record_request("Message", 0.003)
+        response = self.server.process_message(stats_msg, self.connection, session)
+        self.assertEqual(response.header, "Stats")
+        self.assertEqual(response.text["requests"]["Message"]["count"], 1)
+        self.assertEqual(response.text["connections"]["signed_in_users"], 1)
+        self.assertIn("in_use", response.text["pool"])
+        self.assertIn("in_progress", response.text["argon2"])
+
+        # Statistics survive encoding
+        decoded = Message()
+        decoded.decode_message(response.encode_message())
+        self.assertEqual(decoded.text["requests"]["Message"]["count"], 1)
+
+    def test_admin_stop(self):
+        """Test that only a signed in admin stops the server with the stop command."""
+        session = ClientSession(DummySocket(), ("127.0.0.1", 50000))
+        stop_msg = Message("Command", "stop", "testUser2", "Server")
+        self.server.sessions.register("testUser2", session)
+        self.assertEqual(self.server.process_message(stop_msg, self.connection, session).header, "Stop")
+        self.assertFalse(self.server.stopping.is_set())
+
+        self.server.sessions.register("testUser1", session)
+        stop_msg.sender = "testUser1"
+        self.assertEqual(self.server.process_message(stop_msg, self.connection, session).header, "Stop")
+        self.assertTrue(self.server.stopping.is_set())
+
     def test_error_message_handling(self):
         """Test that invalid message headers and malformed requests generate proper error responses."""
         # Test invalid message header
@@ -244,6 +723,15 @@ class TestServer(unittest.TestCase):
         self.assertEqual(response.sender, self.server.server_host)
         self.assertEqual(response.receiver, "test_sender")
 
+        # Test malformed request body, rejected before reaching the database
+        malformed_msg = Message("Acc_type", {"login": "testUser2"}, "Client", "Server")
+        self.server.db_helper = None
+        response = self.server.process_message(malformed_msg, self.connection)
+
+        self.assertEqual(response.header, "Error")
+        self.assertEqual(response.text, "Invalid Acc_type message: Text.password is missing")
+        self.server.db_helper = DbHelper()
+
 
 class TestUserAuthenticator(unittest.TestCase):
     """Test suite for UserAuthenticator class"""
@@ -0,0 +1,51 @@
+"""Test suite for session token module"""
+
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+from session_tokens import SessionTokens, load_secret
+
+
+class TestSessionTokens(unittest.TestCase):
+    """Test suite for SessionTokens class"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.secret_file = os.path.join(self.temp_dir.name, "session_secret")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_issue_and_verify(self):
+        """Test that tokens are valid for their user only, and only until they expire."""
+        tokens = SessionTokens(secret="secret", ttl=60)
+        token = tokens.issue("alice")
+        self.assertTrue(tokens.verify("alice", token))
+        self.assertFalse(tokens.verify("bob", token))
+        self.assertFalse(tokens.verify("alice", token[:-1] + "0"))
+        self.assertFalse(tokens.verify("alice", "garbage"))
+        self.assertFalse(SessionTokens(secret="other").verify("alice", token))
+
+        with patch("session_tokens.time.time", return_value=10**10):
+            self.assertFalse(tokens.verify("alice", token))
+
+    def test_generated_secret_survives_restart(self):
+        """Test that without a configured secret, tokens stay valid for a restarted server."""
+        token = SessionTokens(secret="", secret_file=self.secret_file).issue("alice")
+        restarted = SessionTokens(secret="", secret_file=self.secret_file)
+        self.assertTrue(restarted.verify("alice", token))
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.secret_file).st_mode), 0o600)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["session_secret"])
+
+    def test_empty_secret_file(self):
+        """Test that an empty secret file is reported instead of used as a key."""
+        open(self.secret_file, "wb").close()
+        with self.assertRaises(ValueError):
+            load_secret(self.secret_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""Test suite for client sessions and the presence registry"""
+
+import threading
+import unittest
+from sessions import ClientSession, OutboundQueueFull, SessionRegistry, IdleReaper
+from message import Message
+from config import config
+
+
+class StalledSocket:
+    """Socket double whose sends block until released, like a client not reading"""
+
+    def __init__(self):
+        self.sent = []
+        self.released = threading.Event()
+        self.is_shut_down = False
+
+    def sendall(self, data):
+        self.released.wait(5)
+        if self.is_shut_down:
+            raise BrokenPipeError("Connection shut down")
+        self.sent.append(data)
+
+    def shutdown(self, how):
+        self.is_shut_down = True
+        self.released.set()
+
+
+class TestSessionRegistry(unittest.TestCase):
+    """Test suite for SessionRegistry class"""
+
+    def setUp(self):
+        self.registry = SessionRegistry()
+
+    def new_session(self, login):
+        session = ClientSession(None, ("127.0.0.1", 0))
+        self.registry.register(login, session)
+        return session
+
+    def test_user_with_several_sessions(self):
+        """Test that a user stays online until the last of their sessions is removed."""
+        first = self.new_session("alice")
+        second = self.new_session("alice")
+        self.assertTrue(self.registry.is_online("alice"))
+        self.assertEqual(self.registry.online_count(), 1)
+
+        self.registry.unregister(first)
+        self.assertTrue(self.registry.is_online("alice"))
+        self.registry.unregister(second)
+        self.assertFalse(self.registry.is_online("alice"))
+        self.assertEqual(self.registry.online, [])
+
+        # Signing in as someone else moves the session to the new user
+        session = self.new_session("alice")
+        self.registry.register("bob", session)
+        self.assertEqual(self.registry.online, ["bob"])
+
+    def test_paginated_listing(self):
+        """Test that online users are listed alphabetically, page by page."""
+        for login in ("dave", "alice", "carol", "erin", "bob"):
+            self.new_session(login)
+
+        page, cursor = self.registry.list_online(limit=2)
+        self.assertEqual((page, cursor), (["alice", "bob"], "bob"))
+        page, cursor = self.registry.list_online(cursor, limit=2)
+        self.assertEqual((page, cursor), (["carol", "dave"], "dave"))
+        page, cursor = self.registry.list_online(cursor, limit=2)
+        self.assertEqual((page, cursor), (["erin"], None))
+
+        # Users going offline between pages do not shift later pages
+        self.registry.unregister(self.registry.get_sessions("alice")[0])
+        self.assertEqual(self.registry.list_online("bob", limit=2)[0], ["carol", "dave"])
+
+
+class TestIdleReaper(unittest.TestCase):
+    """Test suite for IdleReaper class"""
+
+    def test_idle_sessions_expire(self):
+        """Test that idle sessions are collected within the timeout, and active ones kept."""
+        reaper = IdleReaper(timeout=3, tick=1)
+        idle = ClientSession(None, ("127.0.0.1", 1))
+        active = ClientSession(None, ("127.0.0.1", 2))
+        closed = ClientSession(None, ("127.0.0.1", 3))
+        for session in (idle, active, closed):
+            reaper.add(session)
+        reaper.remove(closed)
+
+        expired = []
+        # Every tick ages sessions by a second, only the active one keeps sending
+        for _ in range(len(reaper.slots) * 2):
+            for session in (idle, active):
+                session.last_seen -= 1
+            active.touch()
+            expired += reaper.advance()
+        self.assertEqual(expired, [idle])
+        self.assertEqual(list(reaper.slot_of), [active])
+
+
+class TestClientSession(unittest.TestCase):
+    """Test suite for outbound queues of ClientSession class"""
+
+    def setUp(self):
+        self.conn = StalledSocket()
+        self.undelivered = []
+        self.session = ClientSession(self.conn, ("127.0.0.1", 0), on_undelivered=self.undelivered.extend)
+        self.session.start_writer()
+        # Every message is above the high water mark on its own
+        self.message = Message("New_message", "x" * config.network.OUTBOUND_HIGH_WATER, "Server", "alice")
+
+    def test_backpressure(self):
+        """Test that a client not reading is not read from, and the queue size is bounded."""
+        self.session.send(self.message)
+        self.assertFalse(self.session.wait_writable(grace=0.05))
+
+        frames = config.network.OUTBOUND_QUEUE_LIMIT // self.session.queued_bytes
+        for _ in range(frames - 1):
+            self.session.send(self.message)
+        with self.assertRaises(OutboundQueueFull):
+            self.session.send(self.message)
+        self.assertFalse(self.session.closed)
+
+        # Reading resumes once the client catches up
+        self.conn.released.set()
+        self.assertTrue(self.session.wait_writable(grace=5))
+        self.session.close(timeout=5)
+        self.assertEqual(len(self.conn.sent), frames)
+
+    def test_close_stalled_session(self):
+        """Test that closing hands back messages a stalled client did not read within the timeout."""
+        self.session.send(self.message)
+        self.session.send(self.message)
+        self.session.close(timeout=0.05)
+        self.assertTrue(self.conn.is_shut_down)
+        self.assertFalse(self.session.writer.is_alive())
+        self.assertEqual(self.conn.sent, [])
+        self.assertEqual(self.undelivered, [self.message, self.message])
+        with self.assertRaises(ConnectionError):
+            self.session.send(self.message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Test suite for message schema validation"""
+
+import unittest
+from message import Message
+from validation import compile_field, validate_message
+
+
+class TestValidation(unittest.TestCase):
+    """Test suite for compiled message validators"""
+
+    def test_compiled_field_checks(self):
+        """Test that compiled fields check type, length, choices and nested keys."""
+        validator = compile_field(
+            {
+                "type": dict,
+                "fields": {"name": {"type": str, "min_length": 1, "max_length": 3}},
+                "optional": {"tags": {"type": list, "items": {"type": str}}},
+            },
+            "Text",
+        )
+        self.assertIsNone(validator({"name": "abc"}))
+        self.assertIsNone(validator({"name": "abc", "tags": ["x"]}))
+        self.assertEqual(validator("abc"), "Text has invalid type")
+        self.assertEqual(validator({}), "Text.name is missing")
+        self.assertEqual(validator({"name": ""}), "Text.name is too short")
+        self.assertEqual(validator({"name": "abcd"}), "Text.name is too long")
+        self.assertEqual(validator({"name": "a", "tags": [1]}), "Text.tags item has invalid type")
+
+        choice = compile_field({"type": str, "choices": ("admin", "user")}, "Acc_type")
+        self.assertIsNone(choice("admin"))
+        self.assertEqual(choice("root"), "Acc_type has invalid value")
+
+    def test_message_validation(self):
+        """Test that requests are checked against the schema of their header."""
+        valid = Message("Authentication", {"login": "test_user", "password": "pass"}, "Authenticator", "Server")
+        self.assertIsNone(validate_message(valid))
+
+        missing = Message("Authentication", {"password": "pass"}, "Authenticator", "Server")
+        self.assertEqual(validate_message(missing), "Text.login is missing")
+
+        wrong_type = Message("Authentication", {"login": "test_user", "password": 1234}, "Authenticator", "Server")
+        self.assertEqual(validate_message(wrong_type), "Text.password has invalid type")
+
+        acc_type = Message(
+            "Acc_type", {"login": "test_user", "password": "pass", "acc_type": ["admin"]}, "Client", "Server"
+        )
+        self.assertEqual(validate_message(acc_type), "Text.acc_type has invalid type")
+
+        message = Message("Message", "Hello", "test_user", None)
+        self.assertEqual(validate_message(message), "Receiver has invalid type")
+
+        # Headers without a schema are left to the server routing, but must be strings
+        self.assertIsNone(validate_message(Message("Unknown", None, "test_user", None)))
+        self.assertEqual(validate_message(Message(["Command"], None, None, None)), "Header has invalid type")
+
+        # Every header, known or not, needs a string sender
+        for header in ("Command", "Ping", "Unknown"):
+            self.assertEqual(validate_message(Message(header, "help", ["test_user"], None)), "Sender has invalid type")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+"""Validation module for incoming message payloads.
+
+This module describes the expected shape of every request header as a
+schema, and compiles each schema once into a validator function. The
+server runs the validator right after decoding, so malformed requests
+are turned away before any database or password hashing work is done.
+
+Schema fields are dictionaries with the following keys, all optional:
+    type: Expected Python type, or tuple of types.
+    min_length / max_length: Length bounds for strings and lists.
+    choices: Collection of allowed values.
+    fields: Schemas of required dictionary keys.
+    optional: Schemas of dictionary keys which may be missing.
+    items: Schema of every list element.
+"""
+
+from config import config
+
+
+def compile_field(schema: dict, name: str):
+    """Compile a field schema into a validator function.
+
+    Only checks present in the schema are compiled in, so validating a
+    value does not interpret the schema again.
+
+    Args:
+        schema: Field schema, see module docstring for the supported keys.
+        name: Field name used in error descriptions.
+
+    Returns:
+        Function taking a value and returning an error description, or None if the value is valid.
+    """
+    checks = []
+
+    expected_type = schema.get("type")
+    if expected_type is not None:
+        def check_type(value):
+            # bool is a subclass of int, but never a valid number in messages
+            if not isinstance(value, expected_type) or (
+                isinstance(value, bool) and expected_type is int
+            ):
+                return f"{name} has invalid type"
+        checks.append(check_type)
+
+    min_length = schema.get("min_length")
+    if min_length is not None:
+        def check_min_length(value):
+            if len(value) < min_length:
+                return f"{name} is too short"
+        checks.append(check_min_length)
+
+    max_length = schema.get("max_length")
+    if max_length is not None:
+        def check_max_length(value):
+            if len(value) > max_length:
+                return f"{name} is too long"
+        checks.append(check_max_length)
+
+    choices = schema.get("choices")
+    if choices is not None:
+        choices = frozenset(choices)
+
+        def check_choices(value):
+            if value not in choices:
+                return f"{name} has invalid value"
+        checks.append(check_choices)
+
+    fields = {
+        key: compile_field(field, f"{name}.{key}")
+        for key, field in schema.get("fields", {}).items()
+    }
+    optional = {
+        key: compile_field(field, f"{name}.{key}")
+        for key, field in schema.get("optional", {}).items()
+    }
+    if fields or optional:
+        def check_fields(value):
+            for key, validator in fields.items():
+                if key not in value:
+                    return f"{name}.{key} is missing"
+                error = validator(value[key])
+                if error:
+                    return error
+            for key, validator in optional.items():
+                if key in value:
+                    error = validator(value[key])
+                    if error:
+                        return error
+        checks.append(check_fields)
+
+    if "items" in schema:
+        item_validator = compile_field(schema["items"], f"{name} item")
+
+        def check_items(value):
+            for item in value:
+                error = item_validator(item)
+                if error:
+                    return error
+        checks.append(check_items)
+
+    def validate(value):
+        for check in checks:
+            error = check(value)
+            if error:
+                return error
+        return None
+
+    return validate
+
+
+def compile_schema(schema: dict):
+    """Compile a message schema into a validator function.
+
+    Args:
+        schema: Dictionary mapping message attributes (text, sender, receiver) to field schemas.
+
+    Returns:
+        Function taking a Message and returning an error description, or None if the message is valid.
+    """
+    validators = [
+        (attribute, compile_field(field, attribute.capitalize()))
+        for attribute, field in schema.items()
+    ]
+
+    def validate(message):
+        for attribute, validator in validators:
+            error = validator(getattr(message, attribute))
+            if error:
+                return error
+        return None
+
+    return validate
+
+
+USERNAME = {
+    "type": str,
+    "min_length": config.security.MIN_USERNAME_LENGTH,
+    "max_length": config.security.MAX_USERNAME_LENGTH,
+}
+PASSWORD = {
+    "type": str,
+    "min_length": 1,
+    "max_length": config.security.MAX_PASSWORD_LENGTH,
+}
+GROUP_NAME = {
+    "type": str,
+    "min_length": 3,
+    "max_length": config.database.MAX_GROUP_NAME_LENGTH,
+}
+NAME_LIST = {
+    "type": list,
+    "max_length": 16,
+    "items": {"type": str},
+}
+# Username of a signed in client, or the name of a client component, e.g. "Authenticator".
+# Senders are used in replies and as rate limit keys, so every request has a valid one
+SENDER = {
+    "type": str,
+    "max_length": config.security.MAX_USERNAME_LENGTH,
+}
+
+# Expected shape of requests, by message header
+SCHEMAS = {
+    "Command": {
+        "text": {"type": str, "min_length": 1, "max_length": config.message.MAX_MESSAGE_LENGTH},
+        "sender": SENDER,
+    },
+    "Ping": {
+        "text": {"type": str, "max_length": 16},
+        "sender": SENDER,
+    },
+    "Handshake": {
+        "text": {
+            "type": dict,
+            "optional": {"formats": NAME_LIST, "compression": NAME_LIST},
+        },
+        "sender": SENDER,
+    },
+    "Authentication": {
+        "text": {
+            "type": dict,
+            "fields": {"login": USERNAME},
+            # Either password, or session token of a resumed session
+            "optional": {"password": PASSWORD, "token": {"type": str, "max_length": 256}},
+        },
+        "sender": SENDER,
+    },
+    "Acc_type": {
+        "text": {
+            "type": dict,
+            "fields": {
+                "login": USERNAME,
+                "password": PASSWORD,
+                "acc_type": {"type": str, "choices": config.message.VALID_ACCOUNT_TYPES},
+            },
+        },
+        "sender": SENDER,
+    },
+    "Message": {
+        "text": {"type": str, "min_length": 1, "max_length": config.message.MAX_MESSAGE_LENGTH},
+        "sender": {"type": str, "min_length": 1},
+        "receiver": {"type": str, "min_length": 1, "max_length": config.security.MAX_USERNAME_LENGTH},
+    },
+    "Group": {
+        "text": {
+            "type": dict,
+            "fields": {
+                "action": {"type": str, "choices": ("create", "add", "leave", "members")},
+                "group": GROUP_NAME,
+            },
+            "optional": {"member": USERNAME},
+        },
+        "sender": {"type": str, "min_length": 1},
+    },
+    "Group_message": {
+        "text": {"type": str, "min_length": 1, "max_length": config.message.MAX_MESSAGE_LENGTH},
+        "sender": {"type": str, "min_length": 1},
+        "receiver": GROUP_NAME,
+    },
+}
+
+# Schemas compiled once at import
+VALIDATORS = {header: compile_schema(schema) for header, schema in SCHEMAS.items()}
+# Requests with headers the server does not know are answered with an error sent to their sender
+UNKNOWN_HEADER_VALIDATOR = compile_schema({"sender": SENDER})
+
+
+def validate_message(message) -> str | None:
+    """Check a decoded message against the schema of its header.
+
+    Args:
+        message: The decoded Message to check.
+
+    Returns:
+        Description of the first problem found, or None if the message is valid.
+        Messages with unknown headers only have their sender checked.
+    """
+    if not isinstance(message.header, str):
+        return "Header has invalid type"
+    validator = VALIDATORS.get(message.header, UNKNOWN_HEADER_VALIDATOR)
+    return validator(message)